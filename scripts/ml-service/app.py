@@ -122,15 +122,15 @@ def index():
             },
             "churn": {
                 "status": "active",
-                "endpoints": ["/churn/customer/<id>", "/churn/predict", "/churn/at-risk"]
+                "endpoints": ["/churn/customer/<id>", "/churn/predict", "/churn/at-risk", "/churn/events", "/churn/segments", "/churn/snapshots", "/churn/delta"]
             },
             "pricing": {
                 "status": "active",
-                "endpoints": ["/pricing/recommend", "/pricing/batch-update", "/pricing/elasticity"]
+                "endpoints": ["/pricing/recommend", "/pricing/batch-update", "/pricing/simulate", "/pricing/optimize", "/pricing/competitors", "/pricing/decisions", "/pricing/elasticity"]
             },
             "contractors": {
                 "status": "active",
-                "endpoints": ["/contractors/match", "/contractors/predict"]
+                "endpoints": ["/contractors/match", "/contractors/predict", "/contractors/index", "/contractors/bookings"]
             },
             "market": {
                 "status": "active",
@@ -193,13 +193,35 @@ def docs():
                     "customer_id": "Customer identifier",
                     "last_order_date": "ISO date of last order",
                     "orders_12m": "Number of orders in 12 months",
-                    "total_spent_12m": "Total spent in 12 months"
+                    "total_spent_12m": "Total spent in 12 months",
+                    "asOf": "Optional ISO reference date (default: now)"
                 },
                 "response": "Churn probability with risk factors"
             },
+            "POST /churn/events": {
+                "description": "Ingest order events into the churn feature store (JSON or application/x-ndjson)",
+                "body": {
+                    "events": [{"customerId": "", "orderDate": "ISO date", "amount": 0}]
+                },
+                "response": "Ingested/dropped/invalid counts; /churn/customer/<id> then scores from stored features"
+            },
             "GET /churn/at-risk": {
-                "description": "Get list of at-risk customers",
-                "params": {"minProbability": 0.6, "limit": 50}
+                "description": "Get list of at-risk customers (POST customers as JSON or an application/x-ndjson stream)",
+                "params": {"minProbability": 0.6, "limit": 50, "chunkSize": 10000, "workers": "Processes for batch scoring (default 1)", "asOf": "Optional ISO reference date", "format": "rows | columns (parallel arrays) | ndjson (streamed lines)"}
+            },
+            "POST /churn/segments": {
+                "description": "Churn statistics grouped by segment (JSON or application/x-ndjson customers)",
+                "params": {"by": "Comma-separated fields, e.g. region,customer_type,tenure", "asOf": "Optional ISO reference date", "chunkSize": 10000},
+                "response": "Per segment: count, meanProbability, riskLevels histogram ('tenure' buckets tenure_months or first_order_date)"
+            },
+            "POST /churn/snapshots": {
+                "description": "Score customers and store the run as a snapshot (JSON or application/x-ndjson)",
+                "params": {"runId": "Optional run id (default: timestamp)", "asOf": "Optional ISO reference date", "chunkSize": 10000},
+                "response": "Snapshot metadata with risk level counts; GET lists stored snapshots"
+            },
+            "GET /churn/delta": {
+                "description": "Customers whose risk level changed between two snapshots",
+                "params": {"from": "Run id (default: second latest)", "to": "Run id (default: latest)", "levels": "e.g. HIGH,CRITICAL", "escalationsOnly": False, "limit": 100}
             },
             
             # Dynamic Pricing
@@ -210,21 +232,79 @@ def docs():
                     "basePrice": "Current base price",
                     "cost": "Product cost",
                     "currentStock": "Inventory level",
-                    "demandIndex": "Demand ratio (current/average)"
+                    "demandIndex": "Demand ratio (current/average)",
+                    "asOf": "Optional ISO reference date for seasonality",
+                    "monteCarlo": "Optional true or {samples: 1000, seed, demandCv: 0.25, elasticityCv: 0.25, percentiles: [5, 50, 95]}"
+                },
+                "response": "Recommended price with factors (plus demand/revenue/profit percentiles with monteCarlo)"
+            },
+            "POST /pricing/batch-update": {
+                "description": "Catalog-wide price recommendations in one vectorized pass",
+                "body": {
+                    "products": [{"product_id": "", "base_price": 0, "cost": 0, "category": ""}],
+                    "constraints": "Optional constraints override",
+                    "includeReasons": "Add per-product factor reasons (default false)",
+                    "changedOnly": "Reprice only products whose inputs changed since the last changedOnly batch; return only changed prices",
+                    "monteCarlo": "Optional Monte Carlo percentiles per product (as in /pricing/recommend)",
+                    "asOf": "Optional ISO reference date for seasonality"
+                }
+            },
+            "POST /pricing/simulate": {
+                "description": "What-if demand/revenue/profit curves over a grid of candidate prices",
+                "body": {
+                    "products": [{"productId": "", "basePrice": 0, "cost": 0, "category": "", "avgDailySales": 0}],
+                    "minChange": -0.25,
+                    "maxChange": 0.25,
+                    "step": 0.01
                 },
-                "response": "Recommended price with factors"
+                "response": "Shared changes axis (%), per-product price/demand/revenue/profit arrays and best revenue/profit change"
+            },
+            "POST /pricing/optimize": {
+                "description": "Maximize expected revenue or profit across the catalog under category margin targets",
+                "body": {
+                    "products": [{"product_id": "", "base_price": 0, "cost": 0, "category": "", "avg_daily_sales": 0}],
+                    "objective": "revenue | profit",
+                    "categoryMinMargin": {"xi_mang": 0.18},
+                    "minRevenue": "Optional floor on total expected daily revenue",
+                    "constraints": "Per-product bounds (min_margin, max_price_change)"
+                },
+                "response": "Optimal prices, per-category margins vs targets and totals vs current prices"
+            },
+            "POST /pricing/competitors": {
+                "description": "Ingest scraped competitor prices (JSON or application/x-ndjson)",
+                "body": {
+                    "observations": [{"productId": "", "price": 0, "observedAt": "ISO datetime (default: now)", "weight": 1}]
+                },
+                "response": "Ingested/dropped/invalid/evicted counts; recommend and batch-update use the decayed average when competitorPrice is absent"
+            },
+            "GET /pricing/competitors/<product_id>": {
+                "description": "Time-decayed competitor price summary (half-life 7 days, observations kept 30 days)",
+                "params": {"asOf": "Optional ISO reference date"}
+            },
+            "GET /pricing/decisions": {
+                "description": "Logged /pricing/batch-update recommendations (inputs, factors, final price), newest first",
+                "params": {"productId": "Comma-separated product ids", "from": "ISO datetime (inclusive)", "to": "ISO datetime (exclusive)", "limit": 100}
             },
             
             # Contractor Matching
             "POST /contractors/match": {
                 "description": "Find matching contractors for a project",
                 "body": {
-                    "project": {"title": "", "description": "", "requirements": [], "city": "", "district": ""},
-                    "contractors": [{"id": "", "skills": [], "bio": "", "avgRating": 0}],
-                    "limit": 10
+                    "project": {"title": "", "description": "", "requirements": [], "city": "", "district": "", "startDate": "", "endDate": ""},
+                    "contractors": [{"id": "", "skills": [], "bio": "", "avgRating": 0, "lat": 0, "lon": 0}],
+                    "limit": 10,
+                    "radiusKm": "Optional search radius in km, 0 < radiusKm <= 2000 (needs project lat/lon)",
+                    "filters": {"minRating": 0, "verifiedOnly": False, "requiredSkills": []},
+                    "explain": True
                 },
                 "response": "Ranked list of matching contractors"
             },
+            "POST /contractors/bookings": {
+                "description": "Add booked intervals for registered contractors",
+                "body": {
+                    "bookings": [{"contractorId": "", "start": "YYYY-MM-DD", "end": "YYYY-MM-DD"}]
+                }
+            },
             
             # Market Trends
             "GET /market/trends": {
@@ -0,0 +1,398 @@
+#!/usr/bin/env python3
+"""
+Parallel Churn Scoring
+Chunked at-risk scans on a process pool with shared-memory input columns
+
+The parent process turns the customers into fixed-width NumPy columns
+(numbers, booleans, and dates/ids as fixed-width bytes) and copies each
+column once into multiprocessing.shared_memory. Each task attaches to
+those blocks, copies out its [start, end) slice, scores it with
+ChurnPredictor.predict_columns() and returns only the slice's top-k
+candidates and level counts, which the parent merges. Only the final top-k
+is rescored, as a ChurnBatchResult.
+
+One process pool of CHURN_MAX_WORKERS processes (default: all cores) is
+started on the first parallel scan and shared by every later scan; a scan's
+`workers` only caps how many of its slices run at once.
+
+Usage:
+    python churn_batch.py customers.csv --workers 8 --limit 100
+    python churn_batch.py --synthetic 2000000 --workers 8
+"""
+
+import os
+import atexit
+import heapq
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from datetime import date, datetime
+from multiprocessing import shared_memory
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from churn_prediction import PANDAS_AVAILABLE, ChurnPredictor, is_null_date, spend_sketch_path
+from service_clock import resolve_as_of
+
+if PANDAS_AVAILABLE:
+    import pandas as pd
+
+# Below this many customers the pool start-up costs more than it saves
+MIN_PARALLEL_ROWS = 50000
+
+# Size of the shared pool; larger `workers` requests are clamped to it
+MAX_WORKERS = int(os.environ.get('CHURN_MAX_WORKERS', 0)) or os.cpu_count() or 1
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ProcessPoolExecutor:
+    """The shared scan pool, started on first use"""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = ProcessPoolExecutor(MAX_WORKERS)
+            atexit.register(shutdown_pool)
+        return _pool
+
+
+def shutdown_pool():
+    """Stop the shared pool (the next parallel scan starts a new one)"""
+    global _pool
+    with _pool_lock:
+        pool, _pool = _pool, None
+    if pool is not None:
+        pool.shutdown(cancel_futures=True)
+
+
+def encode_text(text: np.ndarray, encoding: str = 'utf-8', errors: str = 'strict') -> np.ndarray:
+    """
+    Unicode array -> fixed-width bytes array
+    
+    All-ASCII input (the usual ids and ISO dates) is narrowed from UCS-4
+    code points to bytes with one cast; anything else goes through
+    np.char.encode().
+    """
+    text = np.ascontiguousarray(text, dtype=str)
+    width = text.dtype.itemsize // 4
+    if not len(text) or width == 0:
+        return np.zeros(len(text), dtype='S1')
+    codes = text.view(np.uint32).reshape(len(text), width)
+    if codes.max() < 128:
+        return codes.astype(np.uint8).view(f'S{width}').ravel()
+    return np.char.encode(text, encoding, errors)
+
+
+def encode_columns(predictor: ChurnPredictor, data) -> Dict[str, np.ndarray]:
+    """
+    Fixed-width columns for shared memory
+    
+    Text is stored as bytes (UTF-8 ids, ASCII dates) to keep the blocks
+    small. last_order_date is ISO text plus a `last_order_missing` flag
+    (datetime64 values are written as ISO text, NaT/NaN as missing), and
+    values that are neither strings nor datetimes as an unparseable
+    marker, so workers reproduce predict()'s 180/90-day fallbacks.
+    
+    Ids and all-string date columns are encoded with whole-array casts;
+    only date columns mixing strings with datetimes or other objects are
+    walked row by row.
+    """
+    if isinstance(data, list):
+        data = predictor.columns_from_records(data)
+    elif hasattr(data, 'to_dict') and hasattr(data, 'columns'):
+        data = {c: data[c].to_numpy() for c in data.columns}
+    
+    n = len(next(iter(data.values()))) if data else 0
+    columns = {}
+    for field, default in predictor.FEATURE_DEFAULTS.items():
+        if field in ('customer_id', 'last_order_date'):
+            continue
+        dtype = bool if isinstance(default, bool) else np.float64
+        values = data.get(field)
+        columns[field] = np.full(n, default, dtype=dtype) if values is None else np.asarray(values, dtype=dtype)
+    
+    ids = data.get('customer_id')
+    columns['customer_id'] = encode_text(
+        np.full(n, 'unknown') if ids is None else np.asarray(ids, dtype=object).astype(str)
+    )
+    
+    dates = data.get('last_order_date')
+    if dates is None:
+        columns['last_order_date'] = np.zeros(n, dtype='S1')
+        columns['last_order_missing'] = np.ones(n, dtype=bool)
+        return columns
+    dates = np.asarray(dates) if getattr(dates, 'dtype', None) is not None else np.asarray(dates, dtype=object)
+    if dates.dtype.kind == 'M':
+        # datetime64[ns] etc.: ISO text at microsecond precision
+        missing = np.isnat(dates)
+        text = np.datetime_as_string(dates.astype('datetime64[us]'))
+        text[missing] = ''
+        columns['last_order_date'] = encode_text(text, 'ascii', 'replace')
+        columns['last_order_missing'] = missing
+        return columns
+    if PANDAS_AVAILABLE and pd.api.types.infer_dtype(dates, skipna=True) in ('string', 'empty'):
+        # Strings and None/NaN/NaT only
+        missing = np.asarray(pd.isna(dates), dtype=bool)
+        text = np.where(missing, '', dates).astype(str)
+        columns['last_order_date'] = encode_text(text, 'ascii', 'replace')
+        columns['last_order_missing'] = missing
+        return columns
+    
+    text, missing = [], np.zeros(n, dtype=bool)
+    for i, value in enumerate(dates):
+        if isinstance(value, np.datetime64) and not np.isnat(value):
+            value = value.astype('datetime64[us]').item()
+        if is_null_date(value):
+            text.append('')
+            missing[i] = True
+        elif isinstance(value, str):
+            text.append(value)
+        elif isinstance(value, (datetime, date)):
+            text.append(value.isoformat())
+        elif not value:
+            text.append('')
+            missing[i] = True
+        else:
+            text.append('\x00')  # unparseable -> 90 days
+    columns['last_order_date'] = encode_text(np.array(text, dtype=str), 'ascii', 'replace')
+    columns['last_order_missing'] = missing
+    return columns
+
+
+def _score_rows(
+    predictor: ChurnPredictor,
+    columns: Dict[str, np.ndarray],
+    start: int,
+    min_probability: float,
+    limit: int,
+    today: datetime
+) -> Dict:
+    """Score encoded rows starting at `start`: top-k (probability, -row) pairs and level counts"""
+    end = start + len(columns['customer_id'])
+    data = {name: values for name, values in columns.items() if name != 'last_order_missing'}
+    data['customer_id'] = np.char.decode(data['customer_id'], 'utf-8').astype(object)
+    dates = np.char.decode(data['last_order_date'], 'ascii').astype(object)
+    dates[columns['last_order_missing']] = None
+    data['last_order_date'] = dates
+    
+    scores = predictor.predict_columns(data, today, update_sketch=False)
+    probabilities = scores['churn_probability']
+    at_risk = np.nonzero(probabilities >= min_probability)[0]
+    levels = scores['risk_level'][at_risk]
+    
+    # Highest probability first, earlier rows winning ties
+    top = at_risk[np.lexsort((at_risk, -probabilities[at_risk]))[:max(limit, 0)]]
+    return {
+        'top': [(float(probabilities[i]), -(start + int(i))) for i in top],
+        'counts': {
+            'scanned': end - start,
+            'at_risk': len(at_risk),
+            'critical': int(np.count_nonzero(levels == 'CRITICAL')),
+            'high': int(np.count_nonzero(levels == 'HIGH')),
+            'medium': int(np.count_nonzero(levels == 'MEDIUM'))
+        }
+    }
+
+
+def _score_slice(
+    blocks: Dict,
+    predictor: ChurnPredictor,
+    start: int,
+    end: int,
+    min_probability: float,
+    limit: int,
+    today: datetime
+) -> Dict:
+    """Pool task: copy rows [start, end) out of the shared blocks and score them"""
+    columns = {}
+    for name, (shm_name, dtype, shape) in blocks.items():
+        shm = shared_memory.SharedMemory(name=shm_name)
+        try:
+            columns[name] = np.ndarray(shape, dtype=dtype, buffer=shm.buf)[start:end].copy()
+        finally:
+            shm.close()
+    return _score_rows(predictor, columns, start, min_probability, limit, today)
+
+
+def _score_shared(
+    predictor: ChurnPredictor,
+    columns: Dict[str, np.ndarray],
+    bounds: List[Tuple[int, int]],
+    workers: int,
+    min_probability: float,
+    limit: int,
+    today: datetime
+) -> List[Dict]:
+    """Score slices on the shared pool, at most `workers` in flight"""
+    blocks, handles = {}, []
+    try:
+        for name, values in columns.items():
+            shm = shared_memory.SharedMemory(create=True, size=max(values.nbytes, 1))
+            handles.append(shm)
+            np.ndarray(values.shape, dtype=values.dtype, buffer=shm.buf)[:] = values
+            blocks[name] = (shm.name, values.dtype.str, values.shape)
+        
+        pool = get_pool()
+        futures = []
+        try:
+            for i, (start, end) in enumerate(bounds):
+                if i >= workers:
+                    futures[i - workers].result()
+                futures.append(pool.submit(
+                    _score_slice, blocks, predictor, start, end, min_probability, limit, today
+                ))
+            return [f.result() for f in futures]
+        except BrokenProcessPool:
+            shutdown_pool()
+            raise
+        finally:
+            # Workers must be done with the blocks before they are unlinked
+            for f in futures:
+                f.cancel()
+            for f in futures:
+                if not f.cancelled():
+                    f.exception()
+    finally:
+        for shm in handles:
+            shm.close()
+            shm.unlink()
+
+
+def parallel_scan_at_risk(
+    predictor: ChurnPredictor,
+    customers,
+    min_probability: float = 0.6,
+    limit: int = 50,
+    chunk_size: int = 50000,
+    workers: Optional[int] = None,
+    as_of=None
+) -> Dict:
+    """
+    At-risk scan split across a process pool
+    
+    Every chunk is ranked against the predictor's frozen spend sketch, as
+    in scan_at_risk(), so results do not depend on the worker count or
+    chunk size.
+    
+    Args:
+        predictor: Scoring engine (model and spend sketch are sent to workers)
+        customers: List of customer dicts, DataFrame or dict of columns
+        workers: Slices scored at once (default and maximum: MAX_WORKERS);
+            small inputs and workers=1 run in-process
+    
+    Returns:
+        Same shape as ChurnPredictor.scan_at_risk()
+    
+    Raises:
+        ValueError: If chunk_size or workers < 1
+    """
+    if chunk_size < 1:
+        raise ValueError("chunkSize must be a positive integer")
+    if workers is not None and workers < 1:
+        raise ValueError("workers must be a positive integer")
+    today = resolve_as_of(as_of)
+    records = customers if isinstance(customers, list) else None
+    columns = encode_columns(predictor, customers)
+    n = len(columns['customer_id'])
+    workers = min(workers or MAX_WORKERS, MAX_WORKERS)
+    
+    bounds = [(start, min(start + chunk_size, n)) for start in range(0, n, chunk_size)]
+    if workers == 1 or n < MIN_PARALLEL_ROWS:
+        results = [
+            _score_rows(
+                predictor, {name: values[s:e] for name, values in columns.items()},
+                s, min_probability, limit, today
+            )
+            for s, e in bounds
+        ]
+    else:
+        results = _score_shared(predictor, columns, bounds, workers, min_probability, limit, today)
+    
+    population = {'scanned': 0, 'at_risk': 0, 'critical': 0, 'high': 0, 'medium': 0}
+    for result in results:
+        for key, value in result['counts'].items():
+            population[key] += value
+    
+    top = heapq.nlargest(max(limit, 0), (entry for r in results for entry in r['top']))
+    
+    def record(row: int) -> Dict:
+        if records is not None:
+            return dict(records[row])
+        customer = {
+            field: columns[field][row].item()
+            for field in predictor.FEATURE_DEFAULTS
+        }
+        customer['customer_id'] = customer['customer_id'].decode('utf-8')
+        customer['last_order_date'] = (
+            None if columns['last_order_missing'][row]
+            else customer['last_order_date'].decode('ascii')
+        )
+        return customer
+    
+    at_risk = predictor.explain_batch([record(-neg_row) for _, neg_row in top], today)
+    counts = at_risk.level_counts()
+    return {
+        'total_at_risk': len(at_risk),
+        'customers': at_risk,
+        'summary': {
+            'critical': counts['CRITICAL'],
+            'high': counts['HIGH'],
+            'medium': counts['MEDIUM']
+        },
+        'population': population
+    }
+
+
+def main():
+    """Batch scoring CLI"""
+    import argparse
+    import json
+    
+    parser = argparse.ArgumentParser(description="Parallel Churn Scoring")
+    parser.add_argument("data", nargs="?", help="CSV/Parquet/NDJSON file of customers")
+    parser.add_argument("--synthetic", type=int, help="Score N synthetic customers instead")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--chunk-size", type=int, default=50000)
+    parser.add_argument("--min-probability", type=float, default=0.6)
+    parser.add_argument("--limit", type=int, default=50)
+    parser.add_argument("--as-of", type=str, help="Reference date (default: now)")
+    parser.add_argument("--model", type=str, help="Trained churn model artifact")
+    parser.add_argument("--spend-sketch", type=str, help="Spend sketch artifact (default: next to --model)")
+    
+    args = parser.parse_args()
+    
+    import pandas as pd
+    if args.synthetic:
+        from train_churn_model import synthetic_dataset
+        customers = synthetic_dataset(args.synthetic, args.as_of).drop(columns=['churned'])
+    elif args.data and args.data.endswith(('.ndjson', '.jsonl')):
+        customers = pd.read_json(args.data, lines=True)
+    elif args.data:
+        from train_churn_model import load_dataset
+        customers = load_dataset(args.data)
+    else:
+        parser.error("data file or --synthetic is required")
+    
+    sketch = args.spend_sketch or (args.model and spend_sketch_path(args.model))
+    predictor = ChurnPredictor(sketch or None, model=args.model)
+    start = time.perf_counter()
+    result = parallel_scan_at_risk(
+        predictor, customers, args.min_probability, args.limit,
+        args.chunk_size, args.workers, args.as_of
+    )
+    elapsed = time.perf_counter() - start
+    
+    print(json.dumps({
+        'population': result['population'],
+        'summary': result['summary'],
+        'seconds': round(elapsed, 3),
+        'rowsPerSecond': round(result['population']['scanned'] / elapsed) if elapsed else None,
+        'customers': result['customers'].to_columns()
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
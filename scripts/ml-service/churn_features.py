@@ -0,0 +1,534 @@
+#!/usr/bin/env python3
+"""
+Churn Feature Store
+Incremental per-customer RFM aggregates built from order events
+
+Callers of /churn/predict used to precompute orders_12m, total_spent_12m,
+recent_3m_spent and previous_3m_spent upstream for every request. This
+store ingests append-only order events (NDJSON or a SQLite orders table)
+and keeps those aggregates current:
+
+- Each customer keeps only the days it ordered on within the last 365
+  days of its head day: (day, order count, amount) entries in shared
+  NumPy pools, chained per customer (about 20 bytes per order day instead
+  of a dense 365-day row).
+- Running 12-month / recent-90-day / previous-90-day totals are updated
+  as events arrive and as the customer's head day moves forward, so a
+  lookup for the current day is O(1).
+- Lookups for an explicit past/future as-of date are answered from the
+  entries without touching the running totals.
+- The NDJSON event log is compacted into one snapshot line per customer
+  once it holds several times more lines than there are customers.
+"""
+
+import json
+import os
+import sqlite3
+import threading
+from datetime import date, datetime
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from service_clock import now, resolve_as_of
+
+
+WINDOW_DAYS = 365
+RECENT_DAYS = 90       # recent_3m_spent window
+PREVIOUS_DAYS = 180    # recent + previous_3m_spent windows
+
+# Arrays grow by a fixed number of rows / order-day entries at a time
+GROWTH_ROWS = 16384
+GROWTH_ENTRIES = 65536
+
+# Log lines that replace a customer's events after compaction
+SNAPSHOT_TYPE = 'customer_snapshot'
+
+# Compact the event log once it exceeds COMPACT_FACTOR lines per customer
+# (and at least COMPACT_MIN_LINES lines)
+COMPACT_FACTOR = 4
+COMPACT_MIN_LINES = 100000
+
+# Engagement fields copied from events onto the customer profile
+ENGAGEMENT_FIELDS = {
+    'has_reviews': 'hasReviews',
+    'avg_rating_given': 'avgRatingGiven',
+    'support_tickets': 'supportTickets',
+    'complaint_ratio': 'complaintRatio'
+}
+
+
+def to_day(value) -> int:
+    """Date-like value -> proleptic day ordinal (ValueError if invalid)"""
+    if isinstance(value, (int, np.integer)) and not isinstance(value, bool):
+        return int(value)
+    if isinstance(value, (date, datetime)):
+        return value.toordinal()
+    if not value:
+        raise ValueError("Missing order date")
+    return resolve_as_of(value).toordinal()
+
+
+def iter_ndjson(lines: Iterable) -> Iterable[Optional[Dict]]:
+    """
+    Decode NDJSON lines (str or bytes; blank lines are skipped)
+    
+    Undecodable lines yield None, which ingest() counts as invalid, so a
+    bad line never aborts a stream after earlier lines were applied.
+    """
+    for line in lines:
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if line.strip():
+                yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def parse_event(event: Dict) -> Dict:
+    """
+    Normalize an order event (camelCase or snake_case keys)
+    
+    Returns:
+        {'customer_id', 'day', 'amount', 'is_order', 'profile'}
+    
+    Raises:
+        ValueError: If the customer id or order date/amount is invalid
+    """
+    customer_id = event.get('customerId', event.get('customer_id'))
+    if customer_id in (None, ''):
+        raise ValueError("Missing customerId")
+    
+    profile = {}
+    for field, camel in ENGAGEMENT_FIELDS.items():
+        value = event.get(camel, event.get(field))
+        if value is not None:
+            profile[field] = value
+    
+    if event.get('type') == SNAPSHOT_TYPE:
+        raise ValueError(f"Reserved event type: {SNAPSHOT_TYPE}")
+    is_order = event.get('type', 'order') == 'order'
+    day = None
+    amount = 0.0
+    if is_order:
+        day = to_day(event.get('orderDate', event.get('order_date', event.get('date'))))
+        amount = float(event.get('amount', event.get('total', 0)) or 0)
+        if amount < 0:
+            raise ValueError("Negative order amount")
+    
+    return {
+        'customer_id': str(customer_id),
+        'day': day,
+        'amount': amount,
+        'is_order': is_order,
+        'profile': profile
+    }
+
+
+class OrderEventStore:
+    """
+    In-memory RFM feature store fed by order events
+    
+    Customer r's order days are a chain of pool entries starting at
+    first[r] (linked through entry_next, newest first), each holding that
+    day's order count and amount while the day is within WINDOW_DAYS of
+    the row's head day. Running totals per row cover the windows ending
+    at the head day and are adjusted entry by entry when the head
+    advances (entries leaving the 12-month window are freed on the way).
+    
+    Events older than the window of their customer are counted as dropped.
+    When log_path is set every accepted event is appended to that NDJSON
+    file, the file is replayed on startup, and compact() (run
+    automatically as the log grows) rewrites it as one snapshot line per
+    customer.
+    """
+    
+    def __init__(self, log_path: Optional[str] = None, initial_capacity: int = 1024):
+        self.positions = {}  # customer_id -> row
+        self.customer_ids = []
+        self.profiles = []  # per-row engagement fields
+        self.head = np.zeros(initial_capacity, dtype=np.int64)
+        self.last_order = np.full(initial_capacity, -1, dtype=np.int64)
+        self.orders_12m = np.zeros(initial_capacity, dtype=np.int64)
+        self.spent_12m = np.zeros(initial_capacity, dtype=np.float64)
+        self.recent_spent = np.zeros(initial_capacity, dtype=np.float64)
+        self.previous_spent = np.zeros(initial_capacity, dtype=np.float64)
+        self.first = np.full(initial_capacity, -1, dtype=np.int32)
+        self.entry_day = np.zeros(0, dtype=np.int32)
+        self.entry_count = np.zeros(0, dtype=np.int32)
+        self.entry_amount = np.zeros(0, dtype=np.float64)
+        self.entry_next = np.zeros(0, dtype=np.int32)
+        self._free = -1  # head of the free entry chain
+        self.log_path = log_path
+        self.log_lines = 0  # lines currently in log_path
+        self._sqlite_offsets = {}  # (db_path, table) -> last ingested rowid
+        self._lock = threading.RLock()
+        
+        if log_path and os.path.exists(log_path):
+            with open(log_path, encoding='utf-8') as f:
+                self._replay(iter_ndjson(f))
+    
+    def __len__(self) -> int:
+        return len(self.customer_ids)
+    
+    def __contains__(self, customer_id) -> bool:
+        return str(customer_id) in self.positions
+    
+    def _row(self, customer_id: str, day: Optional[int]) -> int:
+        row = self.positions.get(customer_id)
+        if row is not None:
+            return row
+        
+        row = len(self.customer_ids)
+        if row == len(self.head):
+            self._grow()
+        self.positions[customer_id] = row
+        self.customer_ids.append(customer_id)
+        self.profiles.append({})
+        self.head[row] = day if day is not None else now().toordinal()
+        return row
+    
+    def _grow(self):
+        """Add GROWTH_ROWS rows to every per-row array"""
+        fill = {'last_order': -1, 'first': -1}
+        for name in ('head', 'last_order', 'orders_12m', 'spent_12m',
+                     'recent_spent', 'previous_spent', 'first'):
+            old = getattr(self, name)
+            new = np.full(len(old) + GROWTH_ROWS, fill.get(name, 0), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+    
+    def _allocate_entry(self) -> int:
+        """Take an entry off the free chain, adding GROWTH_ENTRIES when it is empty"""
+        if self._free < 0:
+            size = len(self.entry_day)
+            for name in ('entry_day', 'entry_count', 'entry_amount', 'entry_next'):
+                old = getattr(self, name)
+                new = np.zeros(size + GROWTH_ENTRIES, dtype=old.dtype)
+                new[:size] = old
+                setattr(self, name, new)
+            self.entry_next[size:] = np.arange(size + 1, size + GROWTH_ENTRIES + 1)
+            self.entry_next[-1] = -1
+            self._free = size
+        
+        entry = self._free
+        self._free = int(self.entry_next[entry])
+        return entry
+    
+    def _entries(self, row: int) -> List[int]:
+        """Entry indexes of a row's order days (newest first)"""
+        entries = []
+        entry = int(self.first[row])
+        while entry >= 0:
+            entries.append(entry)
+            entry = int(self.entry_next[entry])
+        return entries
+    
+    def _advance(self, row: int, day: int):
+        """Move a row's head to `day`, shifting entries out of each window"""
+        head = int(self.head[row])
+        if day <= head:
+            return
+        
+        previous_entry = -1
+        for entry in self._entries(row):
+            age = head - int(self.entry_day[entry])
+            new_age = age + day - head
+            amount = self.entry_amount[entry]
+            if new_age >= WINDOW_DAYS:
+                # Out of the 12-month window: unlink and free the entry
+                self.orders_12m[row] -= self.entry_count[entry]
+                self.spent_12m[row] -= amount
+                nxt = self.entry_next[entry]
+                if previous_entry < 0:
+                    self.first[row] = nxt
+                else:
+                    self.entry_next[previous_entry] = nxt
+                self.entry_next[entry] = self._free
+                self._free = entry
+            else:
+                previous_entry = entry
+            
+            self.recent_spent[row] += amount * ((new_age < RECENT_DAYS) - (age < RECENT_DAYS))
+            self.previous_spent[row] += amount * (
+                (RECENT_DAYS <= new_age < PREVIOUS_DAYS) - (RECENT_DAYS <= age < PREVIOUS_DAYS)
+            )
+        
+        if self.first[row] < 0:
+            # Nothing left in any window: reset drift from the subtractions
+            self.orders_12m[row] = 0
+            self.spent_12m[row] = 0
+            self.recent_spent[row] = 0
+            self.previous_spent[row] = 0
+        self.head[row] = day
+    
+    def _add_order(self, row: int, day: int, amount: float, count: int = 1) -> bool:
+        if day > self.head[row]:
+            self._advance(row, day)
+        age = int(self.head[row]) - day
+        if age >= WINDOW_DAYS:
+            return False
+        
+        for entry in self._entries(row):
+            if self.entry_day[entry] == day:
+                break
+        else:
+            entry = self._allocate_entry()
+            self.entry_day[entry] = day
+            self.entry_count[entry] = 0
+            self.entry_amount[entry] = 0
+            self.entry_next[entry] = self.first[row]
+            self.first[row] = entry
+        
+        self.entry_count[entry] += count
+        self.entry_amount[entry] += amount
+        self.orders_12m[row] += count
+        self.spent_12m[row] += amount
+        if age < RECENT_DAYS:
+            self.recent_spent[row] += amount
+        elif age < PREVIOUS_DAYS:
+            self.previous_spent[row] += amount
+        if day > self.last_order[row]:
+            self.last_order[row] = day
+        return True
+    
+    def ingest(self, events: Iterable[Dict], log: bool = True) -> Dict:
+        """
+        Apply order events
+        
+        Args:
+            events: Dicts with customerId, orderDate, amount and optional
+                type ('order' by default; other types only update the
+                engagement fields hasReviews, avgRatingGiven,
+                supportTickets, complaintRatio)
+            log: Append accepted events to log_path
+        
+        Returns:
+            Counts of ingested, dropped (older than the window) and
+            invalid events
+        """
+        stats = {'ingested': 0, 'dropped': 0, 'invalid': 0}
+        
+        with self._lock:
+            # Opened under the lock so compact() never swaps the file mid-batch
+            log_file = open(self.log_path, 'a', encoding='utf-8') if log and self.log_path else None
+            try:
+                for event in events:
+                    try:
+                        parsed = parse_event(event)
+                    except (TypeError, ValueError, AttributeError):
+                        stats['invalid'] += 1
+                        continue
+                    
+                    row = self._row(parsed['customer_id'], parsed['day'])
+                    self.profiles[row].update(parsed['profile'])
+                    if parsed['is_order'] and not self._add_order(row, parsed['day'], parsed['amount']):
+                        stats['dropped'] += 1
+                        continue
+                    
+                    stats['ingested'] += 1
+                    if log_file:
+                        log_file.write(json.dumps(event, ensure_ascii=False, default=str) + '\n')
+                        self.log_lines += 1
+            finally:
+                if log_file:
+                    log_file.close()
+            
+            if log_file and self.log_lines > max(COMPACT_FACTOR * len(self), COMPACT_MIN_LINES):
+                self.compact()
+        
+        return stats
+    
+    def _replay(self, records: Iterable[Optional[Dict]]):
+        """Rebuild state from log records (snapshot lines and events)"""
+        def events():
+            for record in records:
+                self.log_lines += 1
+                if isinstance(record, dict) and record.get('type') == SNAPSHOT_TYPE:
+                    try:
+                        self._restore(record)
+                    except (TypeError, ValueError, AttributeError, KeyError):
+                        pass  # torn snapshot line
+                else:
+                    yield record
+        
+        self.ingest(events(), log=False)
+    
+    def _snapshot(self, row: int) -> Dict:
+        """Log line recreating a row: head/last order day, order days, engagement fields"""
+        last_order = int(self.last_order[row])
+        snapshot = {
+            'type': SNAPSHOT_TYPE,
+            'customerId': self.customer_ids[row],
+            'head': date.fromordinal(int(self.head[row])).isoformat(),
+            'lastOrderDate': date.fromordinal(last_order).isoformat() if last_order > 0 else None,
+            'days': [
+                [
+                    date.fromordinal(int(self.entry_day[e])).isoformat(),
+                    int(self.entry_count[e]),
+                    float(self.entry_amount[e])
+                ]
+                for e in reversed(self._entries(row))
+            ]
+        }
+        for field, camel in ENGAGEMENT_FIELDS.items():
+            if field in self.profiles[row]:
+                snapshot[camel] = self.profiles[row][field]
+        return snapshot
+    
+    def _restore(self, snapshot: Dict):
+        """Apply a _snapshot() line"""
+        head = to_day(snapshot['head'])
+        row = self._row(str(snapshot['customerId']), head)
+        self._advance(row, head)
+        for day, count, amount in snapshot['days']:
+            self._add_order(row, to_day(day), float(amount), int(count))
+        if snapshot.get('lastOrderDate'):
+            self.last_order[row] = max(int(self.last_order[row]), to_day(snapshot['lastOrderDate']))
+        self.profiles[row].update(parse_event({**snapshot, 'type': 'profile'})['profile'])
+    
+    def compact(self) -> Dict:
+        """
+        Rewrite log_path as one snapshot line per customer
+        
+        The snapshot is written to a temporary file and renamed over the
+        log, so a crash leaves either the old or the new log.
+        
+        Returns:
+            Log lines before and after compaction
+        
+        Raises:
+            ValueError: If the store has no log_path
+        """
+        if not self.log_path:
+            raise ValueError("No event log to compact")
+        
+        with self._lock:
+            before = self.log_lines
+            temp_path = f"{self.log_path}.{os.getpid()}.tmp"
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                for row in range(len(self.customer_ids)):
+                    f.write(json.dumps(self._snapshot(row), ensure_ascii=False, default=str) + '\n')
+            os.replace(temp_path, self.log_path)
+            self.log_lines = len(self.customer_ids)
+        
+        return {'lines_before': before, 'lines_after': self.log_lines}
+    
+    def ingest_ndjson(self, lines: Iterable) -> Dict:
+        """Ingest an NDJSON file object / iterable of lines (undecodable lines count as invalid)"""
+        return self.ingest(iter_ndjson(lines))
+    
+    def ingest_sqlite(
+        self,
+        db_path: str,
+        table: str = 'orders',
+        columns: tuple = ('customer_id', 'order_date', 'amount'),
+        batch_size: int = 10000
+    ) -> Dict:
+        """
+        Ingest rows appended to a SQLite orders table since the last call
+        
+        The table is treated as append-only: the highest rowid seen is
+        remembered per (db_path, table) and only newer rows are read.
+        """
+        for name in (table,) + tuple(columns):
+            if not name.isidentifier():
+                raise ValueError(f"Invalid SQL identifier: {name}")
+        
+        customer_col, date_col, amount_col = columns
+        query = (
+            f"SELECT rowid, {customer_col}, {date_col}, {amount_col} FROM {table} "
+            f"WHERE rowid > ? ORDER BY rowid LIMIT ?"
+        )
+        key = (os.path.abspath(db_path), table)
+        stats = {'ingested': 0, 'dropped': 0, 'invalid': 0}
+        
+        conn = sqlite3.connect(db_path)
+        try:
+            while True:
+                rows = conn.execute(query, (self._sqlite_offsets.get(key, 0), batch_size)).fetchall()
+                if not rows:
+                    break
+                
+                batch = self.ingest(
+                    {'customer_id': r[1], 'order_date': r[2], 'amount': r[3]}
+                    for r in rows
+                )
+                for k in stats:
+                    stats[k] += batch[k]
+                self._sqlite_offsets[key] = rows[-1][0]
+        finally:
+            conn.close()
+        
+        return stats
+    
+    def _window_totals(self, row: int, day: int) -> tuple:
+        """Totals for windows ending at `day` computed from the entries"""
+        entries = self._entries(row)
+        age = day - self.entry_day[entries].astype(np.int64)
+        counts, amounts = self.entry_count[entries], self.entry_amount[entries]
+        
+        in_year = (age >= 0) & (age < WINDOW_DAYS)
+        recent = in_year & (age < RECENT_DAYS)
+        previous = (age >= RECENT_DAYS) & (age < PREVIOUS_DAYS)
+        
+        ordered = in_year & (counts > 0)
+        last_order = int(day - age[ordered].min()) if ordered.any() else -1
+        if last_order < 0 and 0 <= self.last_order[row] <= day:
+            last_order = int(self.last_order[row])
+        
+        return (
+            int(counts[in_year].sum()),
+            float(amounts[in_year].sum()),
+            float(amounts[recent].sum()),
+            float(amounts[previous].sum()),
+            last_order
+        )
+    
+    def features(self, customer_id, as_of=None) -> Optional[Dict]:
+        """
+        ChurnPredictor input features for a customer (None if unknown)
+        
+        With as_of unset the row is advanced to today and its running
+        totals are returned directly; an explicit as_of is answered from
+        the entries without modifying the row (orders more than
+        WINDOW_DAYS before the row's head day are no longer kept).
+        """
+        with self._lock:
+            row = self.positions.get(str(customer_id))
+            if row is None:
+                return None
+            
+            if as_of is None:
+                day = now().toordinal()
+                self._advance(row, day)
+            else:
+                day = resolve_as_of(as_of).toordinal()
+            
+            if day == self.head[row]:
+                totals = (
+                    int(self.orders_12m[row]),
+                    float(self.spent_12m[row]),
+                    float(self.recent_spent[row]),
+                    float(self.previous_spent[row]),
+                    int(self.last_order[row])
+                )
+            else:
+                totals = self._window_totals(row, day)
+            
+            orders_12m, spent_12m, recent, previous, last_order = totals
+            return {
+                'customer_id': self.customer_ids[row],
+                'last_order_date': datetime.fromordinal(last_order) if last_order > 0 else None,
+                'orders_12m': orders_12m,
+                'total_spent_12m': round(spent_12m, 2),
+                'recent_3m_spent': round(recent, 2),
+                'previous_3m_spent': round(previous, 2),
+                **self.profiles[row]
+            }
+    
+    def all_features(self, as_of=None) -> List[Dict]:
+        """Feature dicts for every stored customer (input for predict_columns)"""
+        with self._lock:
+            return [self.features(cid, as_of) for cid in list(self.customer_ids)]
@@ -0,0 +1,131 @@
+#!/usr/bin/env python3
+"""
+Churn Model
+Trained logistic churn model artifact used by ChurnPredictor
+
+The artifact is a small JSON file written by train_churn_model.py:
+feature names, standardization (mean/scale), coefficients and intercept.
+At load time the standardization is folded into the weights, so scoring a
+batch is one matrix-vector product and a sigmoid.
+"""
+
+import json
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, Optional
+
+import numpy as np
+
+
+MODEL_TYPE = 'logistic'
+MODEL_VERSION = 1
+
+# Model inputs derived from ChurnPredictor.prepare_columns()
+FEATURES = (
+    'log_days_since_last_order',
+    'log_orders_12m',
+    'log_total_spent_12m',
+    'trend_spending',
+    'has_reviews',
+    'avg_rating_given',
+    'log_support_tickets',
+    'complaint_ratio'
+)
+
+# trend_spending is unbounded when previous spend is tiny
+TREND_CLIP = (-1.0, 3.0)
+
+
+def feature_matrix(columns: Dict[str, np.ndarray]) -> np.ndarray:
+    """
+    Build the (n, len(FEATURES)) model input from prepared columns
+    
+    Counts and amounts are log1p-compressed; negative values are treated
+    as 0.
+    """
+    def log1p(name):
+        return np.log1p(np.maximum(np.asarray(columns[name], dtype=np.float64), 0))
+    
+    return np.column_stack([
+        log1p('days_since_last_order'),
+        log1p('orders_12m'),
+        log1p('total_spent_12m'),
+        np.clip(np.asarray(columns['trend_spending'], dtype=np.float64), *TREND_CLIP),
+        np.asarray(columns['has_reviews'], dtype=np.float64),
+        np.asarray(columns['avg_rating_given'], dtype=np.float64),
+        log1p('support_tickets'),
+        np.asarray(columns['complaint_ratio'], dtype=np.float64)
+    ])
+
+
+class LogisticChurnModel:
+    """Standardized logistic regression over FEATURES"""
+    
+    def __init__(
+        self,
+        coef,
+        intercept: float,
+        mean,
+        scale,
+        metrics: Optional[Dict] = None,
+        trained_at: Optional[str] = None
+    ):
+        self.coef = np.asarray(coef, dtype=np.float64)
+        self.intercept = float(intercept)
+        self.mean = np.asarray(mean, dtype=np.float64)
+        self.scale = np.asarray(scale, dtype=np.float64)
+        self.metrics = metrics or {}
+        self.trained_at = trained_at or datetime.now().isoformat(timespec='seconds')
+        
+        if not (len(self.coef) == len(self.mean) == len(self.scale) == len(FEATURES)):
+            raise ValueError(f"Model expects {len(FEATURES)} coefficients")
+        
+        # Fold standardization into the weights: z = X @ w + b
+        self._weights = self.coef / self.scale
+        self._bias = self.intercept - float(np.dot(self.coef, self.mean / self.scale))
+    
+    def predict_proba(self, X: np.ndarray) -> np.ndarray:
+        """Churn probability for each row of a feature_matrix()"""
+        z = X @ self._weights + self._bias
+        # Numerically stable sigmoid
+        e = np.exp(-np.abs(z))
+        return np.where(z >= 0, 1 / (1 + e), e / (1 + e))
+    
+    def to_dict(self) -> Dict:
+        return {
+            'type': MODEL_TYPE,
+            'version': MODEL_VERSION,
+            'features': list(FEATURES),
+            'mean': self.mean.tolist(),
+            'scale': self.scale.tolist(),
+            'coef': self.coef.tolist(),
+            'intercept': self.intercept,
+            'trainedAt': self.trained_at,
+            'metrics': self.metrics
+        }
+    
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+    
+    @classmethod
+    def load(cls, path) -> 'LogisticChurnModel':
+        """
+        Load an artifact written by save()
+        
+        Raises:
+            ValueError: If the artifact type or feature list does not match
+        """
+        artifact = json.loads(Path(path).read_text(encoding='utf-8'))
+        if artifact.get('type') != MODEL_TYPE or tuple(artifact.get('features', ())) != FEATURES:
+            raise ValueError(f"Incompatible churn model artifact: {path}")
+        
+        return cls(
+            artifact['coef'],
+            artifact['intercept'],
+            artifact['mean'],
+            artifact['scale'],
+            metrics=artifact.get('metrics'),
+            trained_at=artifact.get('trainedAt')
+        )
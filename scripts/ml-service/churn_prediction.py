@@ -6,18 +6,211 @@ Predicts probability of customer churning based on RFM analysis and behavioral f
 API Endpoints:
     GET /churn/customer/<customer_id> - Get churn risk for single customer
     GET /churn/at-risk - Get list of at-risk customers
+        (POST a JSON body or an NDJSON stream of customers)
     POST /churn/predict - Predict churn for customer data
+    POST /churn/events - Ingest order events into the feature store
+    GET/POST /churn/snapshots - List snapshots / score and persist a run
+    GET /churn/delta - Customers whose risk level changed between runs
 """
 
+import json
 import math
-from datetime import datetime, timedelta
-from typing import Dict, List, Optional
+import os
+import re
+import heapq
+from itertools import islice
+from datetime import date, datetime
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+
+try:
+    import pandas as pd
+    PANDAS_AVAILABLE = True
+except ImportError:
+    PANDAS_AVAILABLE = False
+
+from churn_features import OrderEventStore
+from churn_model import LogisticChurnModel, feature_matrix
+from churn_snapshots import SnapshotStore, score_snapshot
+from quantile_sketch import KLLSketch
+from service_clock import now, resolve_as_of
+
+
+def spend_sketch_path(model_path) -> Path:
+    """Spend sketch artifact saved next to a churn model artifact"""
+    return Path(model_path).with_suffix('.spend_sketch.json')
+
+
+# Common ISO 8601 shapes handled by the vectorized parser (after an
+# optional Z / +HH:MM suffix): YYYY-MM-DD[(T| )HH:MM[:SS[.ffffff]]].
+# Anything else, and anything pandas rejects, goes through fromisoformat.
+ISO_FAST_LENGTHS = (10, 16, 19, 21, 22, 23, 24, 25, 26)
+ISO_MAX_LENGTH = 32
+MICROSECONDS_PER_DAY = 86400 * 10**6
+
+# Timezone suffix dropped by both parsers, so '2025-06-01-07:00' is a date
+# with an offset (not 07:00 with '-' as the time separator, as Python 3.11+
+# fromisoformat would read it)
+ISO_TZ_SUFFIX = re.compile(r'(?:Z|[+-](?:[01][0-9]|2[0-3]):[0-5][0-9])$')
+
+
+def parse_iso_datetime(value: str) -> datetime:
+    """ISO string -> naive wall-clock datetime (timezone dropped); ValueError if invalid"""
+    return datetime.fromisoformat(ISO_TZ_SUFFIX.sub('', value, count=1)).replace(tzinfo=None)
+
+
+def is_null_date(value) -> bool:
+    """True for the NaT/NaN placeholders NumPy and pandas use for missing dates"""
+    if isinstance(value, np.datetime64):
+        return bool(np.isnat(value))
+    if isinstance(value, float):
+        return math.isnan(value)
+    return PANDAS_AVAILABLE and value is pd.NaT
+
+
+def parse_last_order_dates(values) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Parse a whole column of last-order dates at once
+    
+    Strings are laid out as a fixed-width character matrix; the timezone
+    suffix is cut off (keeping wall-clock time like the scalar path) and
+    the layout checked with array comparisons, then the common ISO shapes
+    are parsed by pandas in one call. The rest fall back to
+    parse_iso_datetime() one by one. datetime64 arrays (and naive pandas
+    datetime columns) are only cast to microseconds. NaT and NaN count
+    as missing, like None.
+    
+    Args:
+        values: Sequence of ISO strings, datetimes/dates/datetime64 or
+            empty values
+        
+    Returns:
+        (datetime64[us] array with NaT where no date, missing mask for
+        empty values, invalid mask for unparseable values)
+    """
+    if getattr(values, 'dtype', None) is not None:
+        # An object cast would turn datetime64[ns] into integer nanoseconds
+        array = np.asarray(values)
+        if array.dtype.kind == 'M':
+            parsed = array.astype('datetime64[us]').ravel()
+            return parsed, np.isnat(parsed), np.zeros(len(parsed), dtype=bool)
+    
+    values = np.asarray(values, dtype=object).ravel()
+    n = len(values)
+    parsed = np.full(n, np.datetime64('NaT'), dtype='datetime64[us]')
+    missing = np.zeros(n, dtype=bool)
+    invalid = np.zeros(n, dtype=bool)
+    
+    # String length, -1 for anything else
+    lengths = np.fromiter(
+        (len(v) if isinstance(v, str) else -1 for v in values), dtype=np.int64, count=n
+    )
+    is_str = lengths >= 0
+    str_rows = np.nonzero(is_str)[0]
+    slow_rows = str_rows
+    
+    if PANDAS_AVAILABLE and len(str_rows):
+        short = is_str & (lengths <= ISO_MAX_LENGTH)
+        rows, lengths = np.nonzero(short)[0], lengths[short]
+        chars = np.array(values[rows].tolist(), dtype=f'U{ISO_MAX_LENGTH}').view(np.uint32)
+        chars = chars.reshape(len(rows), ISO_MAX_LENGTH)
+        index = np.arange(len(rows))
+        
+        def at(offset):
+            return chars[index, np.clip(lengths + offset, 0, ISO_MAX_LENGTH - 1)]
+        
+        def digit(offset):
+            value = at(offset) - ord('0')
+            return np.where(value <= 9, value, 99)  # uint32: non-digits wrap high
+        
+        # Timezone suffix: Z or +HH:MM / -HH:MM with a valid offset
+        zulu = (lengths > 0) & (at(-1) == ord('Z'))
+        offset = (
+            (lengths >= 6) & ((at(-6) == ord('+')) | (at(-6) == ord('-'))) & (at(-3) == ord(':'))
+            & (digit(-5) * 10 + digit(-4) <= 23) & (digit(-2) * 10 + digit(-1) <= 59)
+        )
+        suffix = np.where(zulu, 1, np.where(offset, 6, 0))
+        for k in range(1, 7):
+            cut = np.nonzero(suffix >= k)[0]
+            chars[cut, lengths[cut] - k] = 0
+        lengths = lengths - suffix
+        
+        # Layout: ISO separators at fixed columns, digits everywhere else
+        def column(position):
+            return chars[:, position]
+        
+        long_form = lengths > 10
+        candidate = (
+            np.isin(lengths, ISO_FAST_LENGTHS)
+            & (column(4) == ord('-')) & (column(7) == ord('-'))
+            & (~long_form | ((column(10) == ord('T')) | (column(10) == ord(' '))) & (column(13) == ord(':')))
+            & ((lengths < 19) | (column(16) == ord(':')))
+            & ((lengths <= 19) | (column(19) == ord('.')))
+        )
+        separators = np.select([lengths > 19, lengths >= 19, long_form], [6, 5, 4], 2)
+        digits = ((chars[:, :max(ISO_FAST_LENGTHS)] - ord('0')) <= 9).sum(axis=1)
+        candidate &= digits == lengths - separators
+        
+        fast = rows[candidate]
+        text = chars[candidate].view(f'U{ISO_MAX_LENGTH}').ravel()
+        stamps = pd.to_datetime(text, format='ISO8601', errors='coerce')
+        ok = ~np.isnat(stamps.to_numpy())
+        parsed[fast[ok]] = stamps[ok].to_numpy(dtype='datetime64[us]')
+        
+        done = np.zeros(n, dtype=bool)
+        done[fast[ok]] = True
+        slow_rows = str_rows[~done[str_rows]]
+    
+    # Scalar fallbacks, collected and assigned in one go
+    rows, stamps = [], []
+    for i in slow_rows.tolist():
+        try:
+            stamps.append(parse_iso_datetime(values[i]))
+            rows.append(i)
+        except ValueError:
+            invalid[i] = True
+    
+    for i in np.nonzero(~is_str)[0].tolist():
+        value = values[i]
+        if isinstance(value, np.datetime64) and not np.isnat(value):
+            value = value.astype('datetime64[us]').item()
+        if is_null_date(value):
+            missing[i] = True
+        elif isinstance(value, datetime):
+            stamps.append(value.replace(tzinfo=None))
+            rows.append(i)
+        elif isinstance(value, date):
+            stamps.append(datetime(value.year, value.month, value.day))
+            rows.append(i)
+        elif not value:
+            missing[i] = True
+        else:
+            invalid[i] = True
+    
+    if rows:
+        converted = None
+        if PANDAS_AVAILABLE:
+            try:
+                converted = pd.DatetimeIndex(stamps).to_numpy(dtype='datetime64[us]')
+            except (ValueError, OverflowError):
+                pass  # years outside pandas' nanosecond range
+        parsed[rows] = converted if converted is not None else np.array(stamps, dtype='datetime64[us]')
+    
+    return parsed, missing, invalid
+
 
 @dataclass
 class ChurnPrediction:
     """Result of churn prediction"""
+    # Explicit slots (dataclass(slots=True) needs Python 3.10)
+    __slots__ = (
+        'customer_id', 'churn_probability', 'risk_level',
+        'risk_factors', 'recommendation', 'rfm_scores'
+    )
+    
     customer_id: str
     churn_probability: float
     risk_level: str  # LOW, MEDIUM, HIGH, CRITICAL
@@ -26,6 +219,84 @@ class ChurnPrediction:
     rfm_scores: Dict
 
 
+class ChurnBatchResult:
+    """
+    Array-backed sequence of churn predictions
+    
+    Holds the predict_columns() arrays instead of one ChurnPrediction per
+    customer. Indexing/iterating builds ChurnPrediction objects (with risk
+    factors) on demand; to_columns() and iter_ndjson() serialize straight
+    from the arrays for large exports.
+    """
+    __slots__ = ('predictor', 'scores')
+    
+    RFM_FIELDS = ('recency_risk', 'frequency_risk', 'monetary_risk', 'trend_risk', 'engagement_risk')
+    
+    def __init__(self, predictor: 'ChurnPredictor', scores: Dict[str, np.ndarray]):
+        self.predictor = predictor
+        self.scores = scores
+    
+    def __len__(self) -> int:
+        return len(self.scores['churn_probability'])
+    
+    def __getitem__(self, i: int) -> ChurnPrediction:
+        scores = self.scores
+        risks = {field: float(scores[field][i]) for field in self.RFM_FIELDS}
+        level = str(scores['risk_level'][i])
+        factors = self.predictor._get_risk_factors(
+            *risks.values(),
+            {
+                'days_since_last_order': int(scores['days_since_last_order'][i]),
+                'trend_spending': float(scores['trend_spending'][i])
+            }
+        )
+        return ChurnPrediction(
+            customer_id=scores['customer_id'][i],
+            churn_probability=float(scores['churn_probability'][i]),
+            risk_level=level,
+            risk_factors=factors,
+            recommendation=self.predictor._get_recommendation(level, factors),
+            rfm_scores={field: round(value, 3) for field, value in risks.items()}
+        )
+    
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+    
+    def level_counts(self) -> Dict[str, int]:
+        """Number of predictions per risk level"""
+        levels = self.scores['risk_level']
+        return {level: int(np.count_nonzero(levels == level)) for level in ChurnPredictor.RISK_LEVELS}
+    
+    def to_columns(self) -> Dict[str, List]:
+        """Parallel camelCase arrays: customerId, churnProbability, riskLevel, recommendation"""
+        levels = self.scores['risk_level']
+        return {
+            'customerId': self.scores['customer_id'].tolist(),
+            'churnProbability': self.scores['churn_probability'].tolist(),
+            'riskLevel': levels.tolist(),
+            'recommendation': [self.predictor._get_recommendation(level, []) for level in levels.tolist()]
+        }
+    
+    def iter_ndjson(self):
+        """One compact JSON line per prediction (same fields as to_columns())"""
+        # Level and recommendation fragments are encoded once per level
+        tails = {
+            level: ',"riskLevel":"%s","recommendation":%s}\n' % (
+                level, json.dumps(self.predictor._get_recommendation(level, []), ensure_ascii=False)
+            )
+            for level in ChurnPredictor.RISK_LEVELS
+        }
+        columns = zip(
+            self.scores['customer_id'].tolist(),
+            self.scores['churn_probability'].tolist(),
+            self.scores['risk_level'].tolist()
+        )
+        for customer_id, probability, level in columns:
+            yield '{"customerId":%s,"churnProbability":%r%s' % (
+                json.dumps(customer_id, ensure_ascii=False, default=str), probability, tails[level]
+            )
+
+
 class ChurnPredictor:
     """
     Customer Churn Prediction using RFM Analysis + Behavioral Features
@@ -54,8 +325,65 @@ class ChurnPredictor:
         'CRITICAL': (0.8, 1.0)
     }
     
-    def __init__(self):
-        self.today = datetime.now()
+    # Columnar lookup tables for the _calculate_*_risk ladders
+    # (np.digitize bins -> risk per bucket, same thresholds as the scalar code)
+    RECENCY_BINS = [30, 60, 90, 120]             # right-closed: days <= bin
+    RECENCY_RISKS = [0.0, 0.2, 0.5, 0.8, 1.0]
+    FREQUENCY_BINS = [1, 3, 6, 12]               # left-closed: orders >= bin
+    FREQUENCY_RISKS = [1.0, 0.7, 0.4, 0.2, 0.0]
+    MONETARY_BINS = [0.4, 0.8, 1.2, 2.0]         # left-closed: ratio >= bin
+    MONETARY_RANK_BINS = [0.2, 0.4, 0.6, 0.8]    # left-closed: percentile >= bin
+    MONETARY_RISKS = [0.8, 0.6, 0.4, 0.2, 0.0]
+    TREND_BINS = [-0.3, -0.1, 0.1]               # right-closed: trend <= bin
+    TREND_RISKS = [1.0, 0.6, 0.3, 0.0]
+    RISK_LEVEL_BINS = [0.4, 0.6, 0.8]
+    RISK_LEVELS = ['LOW', 'MEDIUM', 'HIGH', 'CRITICAL']
+    
+    # Defaults used by predict() for missing customer fields
+    FEATURE_DEFAULTS = {
+        'customer_id': 'unknown',
+        'last_order_date': None,
+        'orders_12m': 0,
+        'total_spent_12m': 0,
+        'recent_3m_spent': 0,
+        'previous_3m_spent': 1,
+        'has_reviews': False,
+        'avg_rating_given': 0,
+        'support_tickets': 0,
+        'complaint_ratio': 0
+    }
+    
+    # Monetary risk switches from the spend/DEFAULT_AVG_SPENT ratio to the
+    # percentile rank in the spend sketch when it holds this many values
+    MONETARY_MIN_SAMPLES = 200
+    DEFAULT_AVG_SPENT = 10000000
+    
+    def __init__(self, spend_sketch: Optional[KLLSketch] = None, model=None):
+        """
+        Args:
+            spend_sketch: Distribution of total_spent_12m that monetary
+                risk is ranked against, or path to its JSON artifact
+                (written by train_churn_model.py). Scoring never updates
+                it unless asked to, so ranks do not drift with traffic.
+            model: Trained LogisticChurnModel or path to its JSON artifact
+                (see train_churn_model.py); when set it replaces the
+                weighted rule formula for churn_probability, while the
+                per-component risks are still reported for explanation
+        """
+        if isinstance(spend_sketch, (str, os.PathLike)):
+            spend_sketch = KLLSketch.load(spend_sketch)
+        self.spend_sketch = spend_sketch if spend_sketch is not None else KLLSketch()
+        if isinstance(model, (str, os.PathLike)):
+            model = LogisticChurnModel.load(model)
+        self.model = model
+    
+    @property
+    def today(self) -> datetime:
+        """Current time from the shared service clock"""
+        return now()
+    
+    def _use_spend_ranks(self, avg_spent: Optional[float]) -> bool:
+        return avg_spent is None and len(self.spend_sketch) >= self.MONETARY_MIN_SAMPLES
     
     def _calculate_recency_risk(self, days_since_last_order: int) -> float:
         """
@@ -99,17 +427,26 @@ class ChurnPredictor:
         else:  # No orders
             return 1.0
     
-    def _calculate_monetary_risk(self, total_spent_12m: float, avg_spent: float = 10000000) -> float:
+    def _calculate_monetary_risk(self, total_spent_12m: float, avg_spent: Optional[float] = None) -> float:
         """
         Calculate monetary risk based on percentile rank
         
         Args:
             total_spent_12m: Total spent in last 12 months
-            avg_spent: Average spending (for comparison)
+            avg_spent: Average spending to compare against; when omitted the
+                percentile rank from the spend sketch is used (DEFAULT_AVG_SPENT
+                when it holds fewer than MONETARY_MIN_SAMPLES values)
             
         Returns:
             Risk score 0.0 to 1.0
         """
+        if self._use_spend_ranks(avg_spent):
+            # Share of customers spending strictly less (ties rank low)
+            percentile = self.spend_sketch.rank(total_spent_12m, inclusive=False)
+            return self.MONETARY_RISKS[int(np.digitize(percentile, self.MONETARY_RANK_BINS))]
+        
+        if avg_spent is None:
+            avg_spent = self.DEFAULT_AVG_SPENT
         ratio = total_spent_12m / avg_spent if avg_spent > 0 else 0
         
         if ratio >= 2.0:  # Top 20%
@@ -249,7 +586,36 @@ class ChurnPredictor:
         }
         return recommendations.get(risk_level, "Theo dõi thêm")
     
-    def predict(self, customer_data: Dict) -> ChurnPrediction:
+    def _days_since_last_order(self, last_order, today: datetime) -> int:
+        """Days between today and the last order (90 if unparseable, 180 if missing)"""
+        if isinstance(last_order, np.datetime64) and not np.isnat(last_order):
+            last_order = last_order.astype('datetime64[us]').item()
+        if is_null_date(last_order):
+            return 180
+        if isinstance(last_order, str):
+            try:
+                last_order = parse_iso_datetime(last_order)
+            except ValueError:
+                return 90
+        elif isinstance(last_order, datetime):
+            last_order = last_order.replace(tzinfo=None)
+        elif isinstance(last_order, date):
+            last_order = datetime(last_order.year, last_order.month, last_order.day)
+        elif not last_order:
+            return 180
+        else:
+            return 90
+        
+        return (today - last_order).days
+    
+    def _days_since_last_orders(self, last_orders, today: datetime) -> np.ndarray:
+        """Vectorized _days_since_last_order over parse_last_order_dates()"""
+        parsed, missing, invalid = parse_last_order_dates(last_orders)
+        elapsed = (np.datetime64(today, 'us') - parsed).astype(np.int64)
+        days = np.floor_divide(elapsed, MICROSECONDS_PER_DAY)
+        return np.select([missing, invalid], [180, 90], days)
+    
+    def predict(self, customer_data: Dict, as_of=None) -> ChurnPrediction:
         """
         Predict churn probability for a customer
         
@@ -265,30 +631,29 @@ class ChurnPredictor:
                 - avg_rating_given: Average rating given
                 - support_tickets: Number of support tickets
                 - complaint_ratio: Complaints / total interactions
+            as_of: Reference date for recency (datetime or ISO string,
+                default: now)
                 
         Returns:
             ChurnPrediction with probability and risk analysis
         """
         customer_id = customer_data.get('customer_id', 'unknown')
+        today = resolve_as_of(as_of)
         
         # Calculate days since last order
-        last_order = customer_data.get('last_order_date')
-        if isinstance(last_order, str):
-            try:
-                last_order = datetime.fromisoformat(last_order.replace('Z', '+00:00'))
-            except:
-                last_order = self.today - timedelta(days=90)
-        elif not last_order:
-            last_order = self.today - timedelta(days=180)
-        
-        days_since_last = (self.today - last_order.replace(tzinfo=None)).days if hasattr(last_order, 'replace') else 90
-        customer_data['days_since_last_order'] = days_since_last
+        days_since_last = self._days_since_last_order(customer_data.get('last_order_date'), today)
         
         # Calculate trend
         recent_spent = customer_data.get('recent_3m_spent', 0)
         previous_spent = customer_data.get('previous_3m_spent', 1)
         trend_spending = (recent_spent - previous_spent) / previous_spent if previous_spent > 0 else -0.5
-        customer_data['trend_spending'] = trend_spending
+        
+        # Derived values for the explanations (caller's dict is left untouched)
+        customer_data = {
+            **customer_data,
+            'days_since_last_order': days_since_last,
+            'trend_spending': trend_spending
+        }
         
         # Calculate individual risks
         recency_risk = self._calculate_recency_risk(days_since_last)
@@ -310,6 +675,17 @@ class ChurnPredictor:
             self.WEIGHTS['trend'] * trend_risk +
             self.WEIGHTS['engagement'] * engagement_risk
         )
+        if self.model is not None:
+            churn_probability = float(self.model.predict_proba(feature_matrix({
+                'days_since_last_order': [days_since_last],
+                'orders_12m': [customer_data.get('orders_12m', 0)],
+                'total_spent_12m': [customer_data.get('total_spent_12m', 0)],
+                'trend_spending': [trend_spending],
+                'has_reviews': [customer_data.get('has_reviews', False)],
+                'avg_rating_given': [customer_data.get('avg_rating_given', 0)],
+                'support_tickets': [customer_data.get('support_tickets', 0)],
+                'complaint_ratio': [customer_data.get('complaint_ratio', 0)]
+            }))[0])
         
         # Ensure probability is in valid range
         churn_probability = max(0.0, min(1.0, churn_probability))
@@ -341,15 +717,187 @@ class ChurnPredictor:
             }
         )
     
-    def predict_batch(self, customers: List[Dict]) -> List[ChurnPrediction]:
+    def predict_batch(self, customers: List[Dict], as_of=None) -> List[ChurnPrediction]:
         """Predict churn for multiple customers"""
-        return [self.predict(c) for c in customers]
+        today = resolve_as_of(as_of)
+        return [self.predict(c, today) for c in customers]
+    
+    def explain_batch(self, customers, as_of=None) -> ChurnBatchResult:
+        """
+        Batch predictions without per-customer objects
+        
+        Scores like predict() and returns a ChurnBatchResult over the
+        score arrays.
+        """
+        return ChurnBatchResult(self, self.predict_columns(customers, as_of))
+    
+    def columns_from_records(self, customers: List[Dict]) -> Dict[str, np.ndarray]:
+        """Turn customer dicts into feature columns (missing/None -> predict() defaults)"""
+        columns = {}
+        for field, default in self.FEATURE_DEFAULTS.items():
+            values = [c.get(field) for c in customers]
+            columns[field] = [default if v is None else v for v in values]
+        
+        return {
+            field: np.array(values, dtype=object if field in ('customer_id', 'last_order_date') else None)
+            for field, values in columns.items()
+        }
+    
+    def prepare_columns(self, data, as_of=None) -> Dict[str, np.ndarray]:
+        """
+        Typed feature columns shared by rule-based and model scoring
+        
+        Args:
+            data: DataFrame, dict of arrays/lists keyed like predict()'s
+                customer_data, or a list of customer dicts
+            as_of: Reference date for recency (default: now)
+                
+        Returns:
+            customer_id, days_since_last_order, trend_spending and the raw
+            numeric/boolean inputs (missing columns -> FEATURE_DEFAULTS)
+        """
+        if isinstance(data, list):
+            data = self.columns_from_records(data)
+        elif hasattr(data, 'to_dict') and hasattr(data, 'columns'):
+            data = {c: data[c].to_numpy() for c in data.columns}
+        
+        n = len(next(iter(data.values()))) if data else 0
+        today = resolve_as_of(as_of)
+        
+        def column(field, dtype=float):
+            default = self.FEATURE_DEFAULTS[field]
+            if field not in data:
+                return np.full(n, default, dtype=dtype)
+            return np.asarray(data[field], dtype=dtype)
+        
+        # Dates: one vectorized parse for the whole column (passed through
+        # as-is so datetime64 columns keep their dtype)
+        last_orders = data['last_order_date'] if 'last_order_date' in data else column('last_order_date', object)
+        days = self._days_since_last_orders(last_orders, today)
+        
+        # Trend: (recent - previous) / previous, -0.5 when previous <= 0
+        recent = column('recent_3m_spent')
+        previous = column('previous_3m_spent')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            trend = np.where(previous > 0, (recent - previous) / previous, -0.5)
+        
+        return {
+            'customer_id': column('customer_id', object),
+            'days_since_last_order': days,
+            'trend_spending': trend,
+            'orders_12m': column('orders_12m'),
+            'total_spent_12m': column('total_spent_12m'),
+            'has_reviews': column('has_reviews', bool),
+            'avg_rating_given': column('avg_rating_given'),
+            'support_tickets': column('support_tickets'),
+            'complaint_ratio': column('complaint_ratio')
+        }
+    
+    def predict_columns(self, data, as_of=None, update_sketch: bool = False) -> Dict[str, np.ndarray]:
+        """
+        Columnar churn scoring for a whole population in one pass
+        
+        Every risk component is computed with np.digitize/np.where over the
+        same thresholds as the scalar ladders, so probabilities and risk
+        levels are identical to predict(). With a trained model loaded the
+        probability is one matrix-vector product over feature_matrix().
+        
+        Args:
+            data: DataFrame, dict of arrays/lists keyed like predict()'s
+                customer_data, or a list of customer dicts
+            as_of: Reference date for recency (default: now)
+            update_sketch: Add this batch's total_spent_12m to the spend
+                sketch before ranking it (for offline fitting only: request
+                paths rank against the frozen sketch)
+                
+        Returns:
+            Dictionary of arrays: customer_id, churn_probability (rounded
+            like predict()), risk_level, the five *_risk components,
+            days_since_last_order and trend_spending
+        """
+        columns = self.prepare_columns(data, as_of)
+        days = columns['days_since_last_order']
+        trend = columns['trend_spending']
+        
+        recency_risk = np.take(self.RECENCY_RISKS, np.digitize(days, self.RECENCY_BINS, right=True))
+        frequency_risk = np.take(self.FREQUENCY_RISKS, np.digitize(columns['orders_12m'], self.FREQUENCY_BINS))
+        total_spent = columns['total_spent_12m']
+        if update_sketch:
+            self.spend_sketch.update_batch(total_spent)
+        monetary_risk = self._calculate_monetary_risks(total_spent)
+        trend_risk = np.take(self.TREND_RISKS, np.digitize(trend, self.TREND_BINS, right=True))
+        engagement_risk = self._calculate_engagement_risks(
+            columns['has_reviews'],
+            columns['avg_rating_given'],
+            columns['complaint_ratio']
+        )
+        
+        if self.model is not None:
+            churn_probability = self.model.predict_proba(feature_matrix(columns))
+        else:
+            churn_probability = (
+                self.WEIGHTS['recency'] * recency_risk +
+                self.WEIGHTS['frequency'] * frequency_risk +
+                self.WEIGHTS['monetary'] * monetary_risk +
+                self.WEIGHTS['trend'] * trend_risk +
+                self.WEIGHTS['engagement'] * engagement_risk
+            )
+        churn_probability = np.clip(churn_probability, 0.0, 1.0)
+        
+        risk_level = np.take(self.RISK_LEVELS, np.digitize(churn_probability, self.RISK_LEVEL_BINS))
+        
+        # Python round() (not np.round) to match predict() to the last digit
+        rounded = np.array([round(p, 3) for p in churn_probability.tolist()])
+        
+        return {
+            'customer_id': columns['customer_id'],
+            'churn_probability': rounded,
+            'risk_level': risk_level,
+            'recency_risk': recency_risk,
+            'frequency_risk': frequency_risk,
+            'monetary_risk': monetary_risk,
+            'trend_risk': trend_risk,
+            'engagement_risk': engagement_risk,
+            'days_since_last_order': days,
+            'trend_spending': trend
+        }
+    
+    def _calculate_monetary_risks(self, total_spent_12m: np.ndarray, avg_spent: Optional[float] = None) -> np.ndarray:
+        """Vectorized _calculate_monetary_risk"""
+        if self._use_spend_ranks(avg_spent):
+            percentile = self.spend_sketch.ranks(total_spent_12m, inclusive=False)
+            return np.take(self.MONETARY_RISKS, np.digitize(percentile, self.MONETARY_RANK_BINS))
+        
+        if avg_spent is None:
+            avg_spent = self.DEFAULT_AVG_SPENT
+        ratio = total_spent_12m / avg_spent if avg_spent > 0 else np.zeros_like(total_spent_12m)
+        return np.take(self.MONETARY_RISKS, np.digitize(ratio, self.MONETARY_BINS))
+    
+    def _calculate_engagement_risks(
+        self, 
+        has_reviews: np.ndarray, 
+        avg_rating_given: np.ndarray,
+        complaint_ratio: np.ndarray
+    ) -> np.ndarray:
+        """Vectorized _calculate_engagement_risk (same order of operations)"""
+        risk = np.full(len(has_reviews), 0.5)
+        risk = np.where(has_reviews, risk - 0.2, risk)
+        rated = has_reviews & (avg_rating_given > 0)
+        risk = np.where(rated & (avg_rating_given < 3.0), risk + 0.3, risk)
+        risk = np.where(rated & (avg_rating_given >= 4.0), risk - 0.1, risk)
+        risk = np.select(
+            [complaint_ratio > 0.3, complaint_ratio > 0.1],
+            [risk + 0.3, risk + 0.1],
+            risk
+        )
+        return np.clip(risk, 0.0, 1.0)
     
     def get_at_risk_customers(
         self, 
         customers: List[Dict], 
         min_probability: float = 0.6,
-        limit: int = 50
+        limit: int = 50,
+        as_of=None
     ) -> Dict:
         """
         Get customers at risk of churning
@@ -358,60 +906,170 @@ class ChurnPredictor:
             customers: List of customer data
             min_probability: Minimum churn probability threshold
             limit: Maximum number of results
+            as_of: Reference date for recency (default: now)
             
         Returns:
             Dictionary with at-risk customers and summary
         """
-        predictions = self.predict_batch(customers)
+        return self.scan_at_risk(customers, min_probability, limit, as_of=as_of)
+    
+    def scan_at_risk(
+        self, 
+        customers: Iterable[Dict], 
+        min_probability: float = 0.6,
+        limit: int = 50,
+        chunk_size: int = 10000,
+        as_of=None
+    ) -> Dict:
+        """
+        Streaming at-risk scan with a bounded top-k heap
+        
+        Customers are consumed from any iterable in chunks and scored with
+        predict_columns(). Only the `limit` best candidates are kept (a
+        min-heap keyed on probability, earlier customers winning ties), and
+        population counts are aggregated on the fly, so peak memory is
+        O(limit + chunk_size). The final top-k is returned as a
+        ChurnBatchResult (ChurnPrediction objects are built on access).
+        
+        Returns:
+            Same shape as get_at_risk_customers(), plus 'population' counts
+            over every scanned customer
+        
+        Raises:
+            ValueError: If chunk_size < 1
+        """
+        if chunk_size < 1:
+            raise ValueError("chunkSize must be a positive integer")
+        today = resolve_as_of(as_of)
+        iterator = iter(customers)
+        heap = []  # (probability, -sequence, record)
+        population = {'scanned': 0, 'at_risk': 0, 'critical': 0, 'high': 0, 'medium': 0}
+        sequence = 0
         
-        at_risk = [p for p in predictions if p.churn_probability >= min_probability]
-        at_risk.sort(key=lambda x: x.churn_probability, reverse=True)
-        at_risk = at_risk[:limit]
+        while True:
+            chunk = list(islice(iterator, chunk_size))
+            if not chunk:
+                break
+            
+            scores = self.predict_columns(chunk, today)
+            probabilities = scores['churn_probability']
+            at_risk = np.nonzero(probabilities >= min_probability)[0]
+            
+            population['scanned'] += len(chunk)
+            population['at_risk'] += len(at_risk)
+            levels = scores['risk_level'][at_risk]
+            for level in ('CRITICAL', 'HIGH', 'MEDIUM'):
+                population[level.lower()] += int(np.count_nonzero(levels == level))
+            
+            if limit > 0:
+                for i in at_risk.tolist():
+                    entry = (probabilities[i], -(sequence + i), chunk[i])
+                    if len(heap) < limit:
+                        heapq.heappush(heap, entry)
+                    elif entry[:2] > heap[0][:2]:
+                        heapq.heapreplace(heap, entry)
+            
+            sequence += len(chunk)
         
-        # Summary
-        critical = sum(1 for p in at_risk if p.risk_level == 'CRITICAL')
-        high = sum(1 for p in at_risk if p.risk_level == 'HIGH')
-        medium = sum(1 for p in at_risk if p.risk_level == 'MEDIUM')
+        heap.sort(key=lambda e: e[:2], reverse=True)
+        at_risk = self.explain_batch([record for _, _, record in heap], today)
+        counts = at_risk.level_counts()
         
         return {
             'total_at_risk': len(at_risk),
             'customers': at_risk,
             'summary': {
-                'critical': critical,
-                'high': high,
-                'medium': medium
-            }
+                'critical': counts['CRITICAL'],
+                'high': counts['HIGH'],
+                'medium': counts['MEDIUM']
+            },
+            'population': population
         }
 
 
 # Flask Blueprint for integration
-def create_churn_blueprint():
-    """Create Flask Blueprint for churn prediction"""
-    from flask import Blueprint, request, jsonify
+def create_churn_blueprint(event_log: Optional[str] = None, snapshot_dir: Optional[str] = None):
+    """
+    Create Flask Blueprint for churn prediction
+    
+    Args:
+        event_log: NDJSON file backing the order event store
+            (default: CHURN_EVENTS_LOG env var, in-memory when unset)
+        snapshot_dir: Directory for score snapshots
+            (default: CHURN_SNAPSHOT_DIR env var, else ./snapshots)
+    
+    A trained model artifact is loaded from CHURN_MODEL_PATH when set, and
+    the spend sketch monetary risk is ranked against from
+    CHURN_SPEND_SKETCH_PATH (default: next to the model artifact). The
+    sketch is read-only here; train_churn_model.py refreshes it.
+    """
+    from flask import Blueprint, Response, request, jsonify
     
     bp = Blueprint('churn', __name__, url_prefix='/churn')
-    predictor = ChurnPredictor()
+    
+    model = None
+    model_path = os.environ.get('CHURN_MODEL_PATH')
+    if model_path:
+        try:
+            model = LogisticChurnModel.load(model_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Churn model not loaded ({e}). Using rule-based scoring.")
+    
+    spend_sketch = None
+    sketch_path = os.environ.get('CHURN_SPEND_SKETCH_PATH') or (model_path and spend_sketch_path(model_path))
+    if sketch_path:
+        try:
+            spend_sketch = KLLSketch.load(sketch_path)
+        except (OSError, ValueError, KeyError) as e:
+            print(f"⚠️ Spend sketch not loaded ({e}). Monetary risk uses the average spend ratio.")
+    predictor = ChurnPredictor(spend_sketch, model=model)
+    store = OrderEventStore(event_log or os.environ.get('CHURN_EVENTS_LOG') or None)
+    snapshots = SnapshotStore(snapshot_dir or os.environ.get('CHURN_SNAPSHOT_DIR') or None)
+    
+    def iter_ndjson(stream):
+        """Yield customer dicts from an NDJSON request body, line by line"""
+        for line in stream:
+            line = line.strip()
+            if line:
+                yield json.loads(line)
     
     @bp.route('/customer/<customer_id>', methods=['GET'])
     def get_customer_risk(customer_id):
         """Get churn risk for single customer"""
-        # In real implementation, fetch customer data from database
-        # For now, return example based on query params
+        try:
+            as_of = resolve_as_of(request.args.get('asOf'))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid asOf date"
+            }), 400
         
-        customer_data = {
-            'customer_id': customer_id,
-            'last_order_date': request.args.get('lastOrderDate'),
-            'orders_12m': int(request.args.get('orders12m', 0)),
-            'total_spent_12m': float(request.args.get('totalSpent12m', 0)),
-            'recent_3m_spent': float(request.args.get('recent3mSpent', 0)),
-            'previous_3m_spent': float(request.args.get('previous3mSpent', 1)),
-            'has_reviews': request.args.get('hasReviews', 'false').lower() == 'true',
-            'avg_rating_given': float(request.args.get('avgRating', 0)),
-            'support_tickets': int(request.args.get('supportTickets', 0)),
-            'complaint_ratio': float(request.args.get('complaintRatio', 0))
-        }
+        # Customers with ingested order events are scored from the feature
+        # store; engagement query params still override stored values
+        customer_data = store.features(customer_id, request.args.get('asOf') or None)
+        source = 'featureStore'
+        if customer_data is None:
+            source = 'request'
+            customer_data = {
+                'customer_id': customer_id,
+                'last_order_date': request.args.get('lastOrderDate'),
+                'orders_12m': int(request.args.get('orders12m', 0)),
+                'total_spent_12m': float(request.args.get('totalSpent12m', 0)),
+                'recent_3m_spent': float(request.args.get('recent3mSpent', 0)),
+                'previous_3m_spent': float(request.args.get('previous3mSpent', 1))
+            }
         
-        result = predictor.predict(customer_data)
+        if 'hasReviews' in request.args:
+            customer_data['has_reviews'] = request.args['hasReviews'].lower() == 'true'
+        for field, param, cast in (
+            ('avg_rating_given', 'avgRating', float),
+            ('support_tickets', 'supportTickets', int),
+            ('complaint_ratio', 'complaintRatio', float)
+        ):
+            if param in request.args:
+                customer_data[field] = cast(request.args[param])
+        
+        result = predictor.predict(customer_data, as_of)
         
         return jsonify({
             "success": True,
@@ -421,7 +1079,40 @@ def create_churn_blueprint():
                 "riskLevel": result.risk_level,
                 "riskFactors": result.risk_factors,
                 "recommendation": result.recommendation,
-                "rfmScores": result.rfm_scores
+                "rfmScores": result.rfm_scores,
+                "source": source
+            }
+        })
+    
+    @bp.route('/events', methods=['POST'])
+    def ingest_events():
+        """Ingest order events (JSON {"events": [...]} or an NDJSON stream)"""
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            # Malformed lines are counted as invalid instead of aborting
+            # the stream halfway through
+            stats = store.ingest_ndjson(request.stream)
+            if not any(stats.values()):
+                return jsonify({
+                    "success": False,
+                    "error": "Missing events"
+                }), 400
+        else:
+            data = request.get_json() or {}
+            events = data if isinstance(data, list) else data.get('events', [])
+            if not events:
+                return jsonify({
+                    "success": False,
+                    "error": "Missing events array"
+                }), 400
+            stats = store.ingest(events)
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "ingested": stats['ingested'],
+                "dropped": stats['dropped'],
+                "invalid": stats['invalid'],
+                "customers": len(store)
             }
         })
     
@@ -436,7 +1127,15 @@ def create_churn_blueprint():
                 "error": "Missing customer data"
             }), 400
         
-        result = predictor.predict(data)
+        try:
+            as_of = resolve_as_of(data.get('asOf', data.get('as_of')))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid asOf date"
+            }), 400
+        
+        result = predictor.predict(data, as_of)
         
         return jsonify({
             "success": True,
@@ -453,10 +1152,40 @@ def create_churn_blueprint():
     @bp.route('/at-risk', methods=['GET', 'POST'])
     def get_at_risk():
         """Get list of at-risk customers"""
-        min_prob = float(request.args.get('minProbability', 0.6))
-        limit = int(request.args.get('limit', 50))
+        try:
+            min_prob = float(request.args.get('minProbability', 0.6))
+            limit = int(request.args.get('limit', 50))
+            chunk_size = int(request.args.get('chunkSize', 10000))
+            workers = int(request.args.get('workers', 1))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "minProbability, limit, chunkSize and workers must be numbers"
+            }), 400
+        if chunk_size < 1 or workers < 1:
+            return jsonify({
+                "success": False,
+                "error": "chunkSize and workers must be positive integers"
+            }), 400
+        output = request.args.get('format', 'rows')
+        if output not in ('rows', 'columns', 'ndjson'):
+            return jsonify({
+                "success": False,
+                "error": "format must be rows, columns or ndjson"
+            }), 400
         
-        if request.method == 'POST':
+        try:
+            as_of = resolve_as_of(request.args.get('asOf'))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid asOf date"
+            }), 400
+        
+        if request.method == 'POST' and request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            # Streamed body: one customer JSON object per line
+            customers = iter_ndjson(request.stream)
+        elif request.method == 'POST':
             data = request.get_json() or {}
             customers = data.get('customers', [])
         else:
@@ -473,22 +1202,195 @@ def create_churn_blueprint():
                 for i in range(10)
             ]
         
-        result = predictor.get_at_risk_customers(customers, min_prob, limit)
+        try:
+            if workers > 1:
+                # Shared process pool over shared-memory columns (body is
+                # materialized); workers is clamped to CHURN_MAX_WORKERS
+                from churn_batch import parallel_scan_at_risk
+                result = parallel_scan_at_risk(
+                    predictor, list(customers), min_prob, limit, chunk_size, workers, as_of
+                )
+            else:
+                result = predictor.scan_at_risk(customers, min_prob, limit, chunk_size, as_of)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": f"Invalid customer data: {e}"
+            }), 400
+        
+        population = {
+            "scanned": result['population']['scanned'],
+            "atRisk": result['population']['at_risk'],
+            "critical": result['population']['critical'],
+            "high": result['population']['high'],
+            "medium": result['population']['medium']
+        }
+        
+        if output == 'ndjson':
+            # One line per customer straight from the score arrays; totals
+            # travel in headers so every body line has the same shape
+            return Response(result['customers'].iter_ndjson(), mimetype='application/x-ndjson', headers={
+                'X-Total-At-Risk': str(result['total_at_risk']),
+                'X-Population': json.dumps(population)
+            })
+        
+        columns = result['customers'].to_columns()
+        if output == 'columns':
+            customers = columns
+        else:
+            customers = [
+                {
+                    "customerId": customer_id,
+                    "churnProbability": probability,
+                    "riskLevel": level,
+                    "recommendation": recommendation
+                }
+                for customer_id, probability, level, recommendation in zip(*columns.values())
+            ]
         
         return jsonify({
             "success": True,
             "data": {
                 "totalAtRisk": result['total_at_risk'],
-                "customers": [
+                "customers": customers,
+                "summary": result['summary'],
+                "population": population
+            }
+        })
+    
+    @bp.route('/segments', methods=['POST'])
+    def get_segments():
+        """Churn statistics grouped by segment fields (JSON or NDJSON body)"""
+        from churn_segments import aggregate_segments, parse_segment_fields
+        
+        try:
+            by = parse_segment_fields(request.args.get('by', ''))
+            if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+                customers = iter_ndjson(request.stream)
+            else:
+                data = request.get_json() or {}
+                customers = data.get('customers', [])
+                by = by or parse_segment_fields(data.get('by'))
+            
+            result = aggregate_segments(
+                predictor, customers, by, request.args.get('asOf'),
+                int(request.args.get('chunkSize', 10000))
+            )
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "by": result['by'],
+                "customers": result['customers'],
+                "groups": [
+                    {
+                        "segment": g['segment'],
+                        "count": g['count'],
+                        "meanProbability": g['mean_probability'],
+                        "riskLevels": g['risk_levels']
+                    }
+                    for g in result['groups']
+                ]
+            }
+        })
+    
+    @bp.route('/snapshots', methods=['GET'])
+    def list_snapshots():
+        """List stored score snapshots (oldest first)"""
+        return jsonify({
+            "success": True,
+            "data": {"snapshots": snapshots.list()}
+        })
+    
+    @bp.route('/snapshots', methods=['POST'])
+    def create_snapshot():
+        """Score customers (JSON or NDJSON body) and persist the run"""
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            customers = iter_ndjson(request.stream)
+            run_id = request.args.get('runId')
+            as_of = request.args.get('asOf')
+        else:
+            data = request.get_json() or {}
+            customers = data.get('customers', [])
+            run_id = data.get('runId', request.args.get('runId'))
+            as_of = data.get('asOf', request.args.get('asOf'))
+        
+        try:
+            meta = score_snapshot(
+                predictor, customers, snapshots, run_id, resolve_as_of(as_of),
+                int(request.args.get('chunkSize', 10000))
+            )
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        return jsonify({
+            "success": True,
+            "data": meta
+        })
+    
+    @bp.route('/delta', methods=['GET'])
+    def get_delta():
+        """Risk level changes between two snapshots (default: the latest two)"""
+        from_run = request.args.get('from')
+        to_run = request.args.get('to')
+        if not from_run or not to_run:
+            runs = [m['runId'] for m in snapshots.list()]
+            if len(runs) < 2:
+                return jsonify({
+                    "success": False,
+                    "error": "Need two snapshots (or from/to run ids)"
+                }), 400
+            from_run = from_run or runs[-2]
+            to_run = to_run or runs[-1]
+        
+        levels = request.args.get('levels')
+        try:
+            result = snapshots.delta(
+                from_run,
+                to_run,
+                levels=levels.upper().split(',') if levels else None,
+                escalations_only=request.args.get('escalationsOnly', 'false').lower() == 'true',
+                limit=int(request.args.get('limit', 100))
+            )
+        except KeyError as e:
+            return jsonify({
+                "success": False,
+                "error": f"Snapshot not found: {e.args[0]}"
+            }), 404
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "from": result['from'],
+                "to": result['to'],
+                "totalChanged": result['total_changed'],
+                "transitions": result['transitions'],
+                "newCustomers": result['new_customers'],
+                "droppedCustomers": result['dropped_customers'],
+                "changes": [
                     {
-                        "customerId": c.customer_id,
-                        "churnProbability": c.churn_probability,
-                        "riskLevel": c.risk_level,
-                        "recommendation": c.recommendation
+                        "customerId": c['customer_id'],
+                        "fromLevel": c['from_level'],
+                        "toLevel": c['to_level'],
+                        "fromProbability": c['from_probability'],
+                        "toProbability": c['to_probability'],
+                        "direction": c['direction']
                     }
-                    for c in result['customers']
-                ],
-                "summary": result['summary']
+                    for c in result['changes']
+                ]
             }
         })
     
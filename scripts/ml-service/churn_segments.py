@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Churn Segment Aggregation
+Server-side group-by statistics over scored customers
+
+Customers are scored chunk by chunk with ChurnPredictor.predict_columns().
+Each segment column (region, customer_type, tenure bucket, ...) is
+integer-coded with np.unique(..., return_inverse=True), the codes are
+folded field by field into one dense combo code (re-coded after each field
+so it stays below the chunk size), and count / probability sum /
+risk-level histogram are accumulated with np.bincount. Only the aggregated
+groups are kept (at most MAX_SEGMENT_GROUPS), so memory is
+O(groups + chunk_size).
+"""
+
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple, Union
+
+import numpy as np
+
+from churn_prediction import ChurnPredictor, parse_last_order_dates
+from service_clock import resolve_as_of
+
+RISK_LEVELS = tuple(ChurnPredictor.RISK_LEVELS)
+
+# Tenure buckets (months since first order); left-closed: months >= bin
+TENURE_BINS = [3, 6, 12, 24]
+TENURE_LABELS = ['<3m', '3-6m', '6-12m', '12-24m', '24m+']
+DAYS_PER_MONTH = 30.4375
+
+UNKNOWN = 'unknown'
+
+# Distinct segment value combinations one aggregation may produce
+MAX_SEGMENT_GROUPS = 1000
+
+
+def parse_segment_fields(by: Union[str, Sequence[str], None]) -> List[str]:
+    """
+    Segment fields from 'a,b' text or a list of names (blanks dropped)
+    
+    Raises:
+        ValueError: If by is neither text nor a list of strings
+    """
+    if by is None:
+        return []
+    if isinstance(by, str):
+        by = by.split(',')
+    if not isinstance(by, (list, tuple)) or not all(isinstance(field, str) for field in by):
+        raise ValueError("by must be a comma-separated string or a list of field names")
+    return [field.strip() for field in by if field.strip()]
+
+
+def factorize_segment(values, n: int) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    Integer-code one segment column
+    
+    Returns:
+        (labels, codes): distinct string labels and each row's index into
+        them; None, NaN and '' are labelled 'unknown'
+    """
+    if values is None:
+        return np.array([UNKNOWN], dtype=object), np.zeros(n, dtype=np.int64)
+    values = values if isinstance(values, np.ndarray) else np.asarray(values, dtype=object)
+    if values.dtype.kind == 'O':
+        missing = np.equal(values, None) | np.not_equal(values, values) | np.equal(values, '')
+    elif values.dtype.kind == 'f':
+        missing = np.isnan(values)
+    else:
+        missing = np.zeros(len(values), dtype=bool)
+    text = values.astype(str)
+    text[missing] = ''
+    
+    labels, codes = np.unique(text, return_inverse=True)
+    labels = labels.astype(object)
+    labels[labels == ''] = UNKNOWN
+    return labels, codes.reshape(-1)
+
+
+def tenure_buckets(data: Dict, n: int, today) -> np.ndarray:
+    """
+    Tenure bucket labels from tenure_months, or first_order_date vs today
+    
+    Missing or unparseable values -> 'unknown'.
+    """
+    months = data.get('tenure_months')
+    if months is not None:
+        months = np.array([np.nan if m is None else m for m in months], dtype=np.float64)
+    elif data.get('first_order_date') is not None:
+        parsed, missing, invalid = parse_last_order_dates(data['first_order_date'])
+        days = (np.datetime64(today, 'us') - parsed) / np.timedelta64(1, 'D')
+        months = np.where(missing | invalid, np.nan, days / DAYS_PER_MONTH)
+    else:
+        return np.full(n, UNKNOWN, dtype=object)
+    
+    labels = np.take(TENURE_LABELS, np.digitize(np.nan_to_num(months, nan=0.0), TENURE_BINS)).astype(object)
+    labels[np.isnan(months)] = UNKNOWN
+    return labels
+
+
+class SegmentAggregator:
+    """Running group-by of churn scores over one or more segment fields"""
+    
+    def __init__(self, by: Union[str, Sequence[str]], max_groups: Optional[int] = None):
+        self.by = tuple(parse_segment_fields(by))
+        if not self.by:
+            raise ValueError("At least one segment field is required")
+        self.max_groups = max_groups or MAX_SEGMENT_GROUPS
+        self.group_ids = {}   # segment value tuple -> group id
+        self.keys = []        # group id -> segment value tuple
+        self.counts = np.zeros(0, dtype=np.int64)
+        self.probability_sums = np.zeros(0)
+        self.levels = np.zeros((0, len(RISK_LEVELS)), dtype=np.int64)
+    
+    def add(self, data: Dict, scores: Dict[str, np.ndarray], today):
+        """
+        Fold one scored chunk (data: dict of columns aligned with scores)
+        
+        Raises:
+            ValueError: If the segments would exceed max_groups
+        """
+        n = len(scores['churn_probability'])
+        if not n:
+            return
+        
+        # Integer-code each field and fold it into the chunk's combo codes
+        uniques, codes = [], []
+        local = np.zeros(n, dtype=np.int64)
+        for field in self.by:
+            if field == 'tenure':
+                labels, inverse = factorize_segment(tenure_buckets(data, n, today), n)
+            else:
+                labels, inverse = factorize_segment(data.get(field), n)
+            uniques.append(labels)
+            codes.append(inverse)
+            _, first_rows, local = np.unique(
+                local * len(labels) + inverse, return_index=True, return_inverse=True
+            )
+            local = local.reshape(-1)
+        
+        # Map the chunk's few distinct combos to stable global group ids
+        keys = [
+            tuple(uniques[f][codes[f][row]] for f in range(len(self.by)))
+            for row in first_rows.tolist()
+        ]
+        new = {key for key in keys if key not in self.group_ids}
+        if len(self.keys) + len(new) > self.max_groups:
+            raise ValueError(
+                f"More than {self.max_groups} segments; group by fewer or coarser fields"
+            )
+        mapping = np.empty(len(keys), dtype=np.int64)
+        for i, key in enumerate(keys):
+            group = self.group_ids.get(key)
+            if group is None:
+                group = self.group_ids[key] = len(self.keys)
+                self.keys.append(key)
+            mapping[i] = group
+        groups = mapping[local]
+        
+        size = len(self.keys)
+        if size > len(self.counts):
+            grow = size - len(self.counts)
+            self.counts = np.concatenate([self.counts, np.zeros(grow, dtype=np.int64)])
+            self.probability_sums = np.concatenate([self.probability_sums, np.zeros(grow)])
+            self.levels = np.vstack([self.levels, np.zeros((grow, len(RISK_LEVELS)), dtype=np.int64)])
+        
+        level_names = scores['risk_level']
+        level_codes = np.zeros(n, dtype=np.int64)
+        for code, level in enumerate(RISK_LEVELS):
+            level_codes[level_names == level] = code
+        
+        self.counts += np.bincount(groups, minlength=size)
+        self.probability_sums += np.bincount(groups, weights=scores['churn_probability'], minlength=size)
+        self.levels += np.bincount(
+            groups * len(RISK_LEVELS) + level_codes, minlength=size * len(RISK_LEVELS)
+        ).reshape(size, len(RISK_LEVELS))
+    
+    def result(self) -> Dict:
+        """Groups sorted by size (largest first)"""
+        order = sorted(range(len(self.keys)), key=lambda g: (-self.counts[g], self.keys[g]))
+        return {
+            'by': list(self.by),
+            'customers': int(self.counts.sum()),
+            'groups': [
+                {
+                    'segment': dict(zip(self.by, self.keys[g])),
+                    'count': int(self.counts[g]),
+                    'mean_probability': round(float(self.probability_sums[g] / self.counts[g]), 4),
+                    'risk_levels': dict(zip(RISK_LEVELS, self.levels[g].tolist()))
+                }
+                for g in order
+            ]
+        }
+
+
+def aggregate_segments(
+    predictor: ChurnPredictor,
+    customers: Iterable,
+    by: Union[str, Sequence[str]],
+    as_of=None,
+    chunk_size: int = 10000
+) -> Dict:
+    """
+    Score customers and aggregate by segment fields
+    
+    Args:
+        customers: Iterable of customer dicts, or a DataFrame
+        by: Segment fields, as a list or 'a,b' text; 'tenure' buckets
+            tenure_months or first_order_date
+        as_of: Reference date for recency and tenure (default: now)
+    
+    Returns:
+        by, customers and groups (segment, count, mean_probability,
+        risk_levels)
+    
+    Raises:
+        ValueError: On bad fields or chunk_size, or more than
+            MAX_SEGMENT_GROUPS segments
+    """
+    if chunk_size < 1:
+        raise ValueError("chunkSize must be a positive integer")
+    today = resolve_as_of(as_of)
+    aggregator = SegmentAggregator(by)
+    fields = set(aggregator.by) | {'tenure_months', 'first_order_date'}
+    
+    if hasattr(customers, 'columns'):
+        data = {c: customers[c].to_numpy() for c in customers.columns if c in fields}
+        aggregator.add(data, predictor.predict_columns(customers, today), today)
+        return aggregator.result()
+    
+    iterator = iter(customers)
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        present = {field for customer in chunk for field in customer if field in fields}
+        data = {field: [customer.get(field) for customer in chunk] for field in present}
+        aggregator.add(data, predictor.predict_columns(chunk, today), today)
+    
+    return aggregator.result()
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Churn Score Snapshots
+Columnar per-run score files and risk-level deltas between runs
+
+Each scoring run is stored as one compressed .npz file holding three
+columns sorted by customer id (id, probability, risk level code) plus JSON
+metadata. Deltas join two runs with a binary-search merge over the sorted
+ids (O(n log m)), so no customer is ever compared against every other.
+
+Usage:
+    python churn_snapshots.py list
+    python churn_snapshots.py score customers.csv --run-id 2025-W01
+    python churn_snapshots.py delta 2025-W01 2025-W02 --levels HIGH,CRITICAL
+"""
+
+import json
+import os
+import re
+from itertools import islice
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+from service_clock import now, resolve_as_of
+
+SNAPSHOT_DIR = Path(__file__).parent / "snapshots"
+RISK_LEVELS = ('LOW', 'MEDIUM', 'HIGH', 'CRITICAL')
+RUN_ID_PATTERN = re.compile(r'^[A-Za-z0-9_-]{1,64}$')
+
+
+class SnapshotStore:
+    """Directory of churn_<run_id>.npz score snapshots"""
+    
+    def __init__(self, directory=None):
+        self.directory = Path(directory or SNAPSHOT_DIR)
+    
+    def _path(self, run_id: str) -> Path:
+        if not RUN_ID_PATTERN.match(run_id or ''):
+            raise ValueError(f"Invalid run id: {run_id!r}")
+        return self.directory / f"churn_{run_id}.npz"
+    
+    def save(
+        self,
+        customer_ids,
+        probabilities,
+        risk_levels,
+        run_id: Optional[str] = None,
+        as_of=None
+    ) -> Dict:
+        """
+        Persist one scoring run
+        
+        Duplicate customer ids keep their first score.
+        
+        Raises:
+            ValueError: On an invalid run id or unknown risk level
+        
+        Returns:
+            Snapshot metadata
+        """
+        run_id = run_id or now().strftime('%Y%m%dT%H%M%S')
+        path = self._path(run_id)
+        
+        ids = np.asarray(customer_ids).astype(str)
+        order = np.argsort(ids, kind='stable')
+        ids = ids[order]
+        first = np.ones(len(ids), dtype=bool)
+        first[1:] = ids[1:] != ids[:-1]
+        order, ids = order[first], ids[first]
+        
+        names = np.asarray(risk_levels).astype(str)[order]
+        levels = np.zeros(len(ids), dtype=np.uint8)
+        known = np.zeros(len(ids), dtype=bool)
+        for code, level in enumerate(RISK_LEVELS):
+            match = names == level
+            levels[match] = code
+            known |= match
+        if not known.all():
+            raise ValueError(f"Unknown risk level: {names[~known][0]}")
+        
+        meta = {
+            'runId': run_id,
+            'createdAt': now().isoformat(timespec='seconds'),
+            'asOf': resolve_as_of(as_of).isoformat(timespec='seconds'),
+            'customers': int(len(ids)),
+            'levels': {
+                level: int(np.count_nonzero(levels == code)) for code, level in enumerate(RISK_LEVELS)
+            }
+        }
+        
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_suffix('.tmp.npz')
+        np.savez_compressed(
+            tmp,
+            customer_id=ids,
+            churn_probability=np.asarray(probabilities, dtype=np.float32)[order],
+            risk_level=levels,
+            meta=np.array(json.dumps(meta))
+        )
+        os.replace(tmp, path)
+        return meta
+    
+    def save_scores(self, scores: Dict[str, np.ndarray], run_id: Optional[str] = None, as_of=None) -> Dict:
+        """Persist a ChurnPredictor.predict_columns() result"""
+        return self.save(
+            scores['customer_id'], scores['churn_probability'], scores['risk_level'], run_id, as_of
+        )
+    
+    def load(self, run_id: str) -> Dict[str, np.ndarray]:
+        """
+        Raises:
+            KeyError: If the snapshot does not exist
+        """
+        path = self._path(run_id)
+        if not path.exists():
+            raise KeyError(run_id)
+        with np.load(path) as data:
+            return {
+                'customer_id': data['customer_id'],
+                'churn_probability': data['churn_probability'],
+                'risk_level': data['risk_level'],
+                'meta': json.loads(str(data['meta']))
+            }
+    
+    def list(self) -> List[Dict]:
+        """Metadata of every snapshot, oldest first"""
+        snapshots = []
+        for path in self.directory.glob('churn_*.npz'):
+            if path.name.endswith('.tmp.npz'):
+                continue
+            with np.load(path) as data:
+                snapshots.append(json.loads(str(data['meta'])))
+        return sorted(snapshots, key=lambda m: (m['createdAt'], m['runId']))
+    
+    def delta(
+        self,
+        from_run: str,
+        to_run: str,
+        levels: Optional[Iterable[str]] = None,
+        escalations_only: bool = False,
+        limit: Optional[int] = None
+    ) -> Dict:
+        """
+        Customers whose risk level changed between two runs
+        
+        Args:
+            levels: Only report moves into these levels (e.g. HIGH, CRITICAL)
+            escalations_only: Only report moves to a higher level
+            limit: Cap on listed changes (largest probability increase first);
+                counts always cover every change
+        
+        Returns:
+            changes, transition counts and new/dropped customer counts
+        """
+        old, new = self.load(from_run), self.load(to_run)
+        old_ids, new_ids = old['customer_id'], new['customer_id']
+        
+        # Sorted-merge join: position of each new id among the old ids
+        position = np.searchsorted(old_ids, new_ids)
+        in_range = position < len(old_ids)
+        matched = np.zeros(len(new_ids), dtype=bool)
+        matched[in_range] = old_ids[position[in_range]] == new_ids[in_range]
+        new_rows = np.nonzero(matched)[0]
+        old_rows = position[matched]
+        
+        before = old['risk_level'][old_rows]
+        after = new['risk_level'][new_rows]
+        changed = before != after
+        if escalations_only:
+            changed &= after > before
+        if levels is not None:
+            wanted = [RISK_LEVELS.index(level) for level in levels]
+            changed &= np.isin(after, wanted)
+        
+        new_rows, old_rows = new_rows[changed], old_rows[changed]
+        before, after = before[changed], after[changed]
+        old_p = old['churn_probability'][old_rows]
+        new_p = new['churn_probability'][new_rows]
+        
+        transitions = {}
+        pairs, counts = np.unique(before.astype(np.int64) * len(RISK_LEVELS) + after, return_counts=True)
+        for pair, count in zip(pairs.tolist(), counts.tolist()):
+            transitions[f"{RISK_LEVELS[pair // len(RISK_LEVELS)]}->{RISK_LEVELS[pair % len(RISK_LEVELS)]}"] = count
+        
+        order = np.argsort(-(new_p - old_p), kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        
+        return {
+            'from': old['meta'],
+            'to': new['meta'],
+            'total_changed': int(len(new_rows)),
+            'transitions': transitions,
+            'new_customers': int(len(new_ids) - np.count_nonzero(matched)),
+            'dropped_customers': int(len(old_ids) - np.count_nonzero(matched)),
+            'changes': [
+                {
+                    'customer_id': str(new_ids[new_rows[i]]),
+                    'from_level': RISK_LEVELS[before[i]],
+                    'to_level': RISK_LEVELS[after[i]],
+                    'from_probability': round(float(old_p[i]), 3),
+                    'to_probability': round(float(new_p[i]), 3),
+                    'direction': 'up' if after[i] > before[i] else 'down'
+                }
+                for i in order.tolist()
+            ]
+        }
+
+
+def score_snapshot(
+    predictor,
+    customers: Iterable,
+    store: SnapshotStore,
+    run_id: Optional[str] = None,
+    as_of=None,
+    chunk_size: int = 10000
+) -> Dict:
+    """Score customers chunk by chunk and persist only the score columns"""
+    if chunk_size < 1:
+        raise ValueError("chunkSize must be a positive integer")
+    today = resolve_as_of(as_of)
+    if hasattr(customers, 'columns'):
+        scores = predictor.predict_columns(customers, today)
+        return store.save_scores(scores, run_id, today)
+    
+    iterator = iter(customers)
+    ids, probabilities, levels = [], [], []
+    while True:
+        chunk = list(islice(iterator, chunk_size))
+        if not chunk:
+            break
+        scores = predictor.predict_columns(chunk, today)
+        ids.append(scores['customer_id'].astype(str))
+        probabilities.append(scores['churn_probability'])
+        levels.append(scores['risk_level'])
+    
+    if not ids:
+        raise ValueError("No customers to score")
+    return store.save(
+        np.concatenate(ids), np.concatenate(probabilities), np.concatenate(levels), run_id, today
+    )
+
+
+def main():
+    """Snapshot CLI"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Churn Score Snapshots")
+    parser.add_argument("--dir", type=str, default=None, help="Snapshot directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    
+    commands.add_parser("list", help="List snapshots")
+    
+    score = commands.add_parser("score", help="Score a CSV/Parquet export into a snapshot")
+    score.add_argument("data")
+    score.add_argument("--run-id", type=str)
+    score.add_argument("--as-of", type=str)
+    score.add_argument("--model", type=str, help="Trained churn model artifact")
+    score.add_argument("--spend-sketch", type=str, help="Spend sketch artifact (default: next to --model)")
+    
+    delta = commands.add_parser("delta", help="Risk level changes between two runs")
+    delta.add_argument("from_run")
+    delta.add_argument("to_run")
+    delta.add_argument("--levels", type=str, help="Comma-separated target levels")
+    delta.add_argument("--escalations-only", action="store_true")
+    delta.add_argument("--limit", type=int, default=50)
+    
+    args = parser.parse_args()
+    store = SnapshotStore(args.dir)
+    
+    if args.command == "list":
+        result = store.list()
+    elif args.command == "score":
+        from churn_prediction import ChurnPredictor, spend_sketch_path
+        from train_churn_model import load_dataset
+        sketch = args.spend_sketch or (args.model and spend_sketch_path(args.model))
+        predictor = ChurnPredictor(sketch or None, model=args.model)
+        result = score_snapshot(predictor, load_dataset(args.data), store, args.run_id, args.as_of)
+    else:
+        levels = args.levels.split(',') if args.levels else None
+        result = store.delta(args.from_run, args.to_run, levels, args.escalations_only, args.limit)
+    
+    print(json.dumps(result, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+"""
+Competitor Price Index
+Time-decayed competitor prices per product, fed by scraped observations
+
+Repricing used to rely on a single competitorPrice supplied by the caller.
+This index ingests observations in bulk and keeps, per product:
+
+- a time-decayed weighted average (weight halves every half_life_days),
+  held as running sums anchored at the product's latest observation, so
+  the average is one division at lookup time (O(1));
+- min/max over the observations still inside the max-age window;
+- a ring of max_age_days day buckets (rows of NumPy matrices, as in the
+  churn feature store) holding each day's sums and min/max, so buckets
+  that age out are subtracted from the running sums and dropped.
+
+Bulk ingest is vectorized over the batch (np.bincount / ufunc.at).
+"""
+
+import json
+import os
+import threading
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+from service_clock import now, resolve_as_of
+
+SECONDS_PER_DAY = 86400.0
+
+
+def iter_ndjson(lines: Iterable) -> Iterable[Optional[Dict]]:
+    """Decode NDJSON lines (str or bytes); undecodable lines yield None, counted invalid by ingest()"""
+    for line in lines:
+        try:
+            if isinstance(line, bytes):
+                line = line.decode('utf-8')
+            if line.strip():
+                yield json.loads(line)
+        except ValueError:
+            yield None
+
+
+def to_days(value) -> float:
+    """Datetime-like value -> fractional proleptic day ordinal"""
+    moment = resolve_as_of(value)
+    return moment.toordinal() + (
+        moment.hour * 3600 + moment.minute * 60 + moment.second + moment.microsecond / 1e6
+    ) / SECONDS_PER_DAY
+
+
+def parse_observation(observation: Dict, default_time: float) -> tuple:
+    """
+    (product_id, price, time, weight) from a camelCase/snake_case dict
+    
+    Raises:
+        ValueError: If the product id, price or weight is invalid
+    """
+    product_id = observation.get('productId', observation.get('product_id'))
+    if product_id in (None, ''):
+        raise ValueError("Missing productId")
+    price = float(observation.get('price'))
+    weight = float(observation.get('weight', 1.0))
+    if not price > 0 or not weight > 0:
+        raise ValueError("Price and weight must be positive")
+    observed = observation.get('observedAt', observation.get('observed_at'))
+    return str(product_id), price, default_time if observed is None else to_days(observed), weight
+
+
+class CompetitorPriceIndex:
+    """
+    In-memory competitor price index
+    
+    Row r holds product r. Running sums S = Σ w·p·2^(-(t_r - t)/H) and
+    W = Σ w·2^(-(t_r - t)/H) are anchored at the row's latest observation
+    time t_r; bucket day % max_age_days holds that day's sums anchored at
+    the day start. Observations older than max_age_days before the row's
+    latest day are dropped, and evict_stale() clears buckets that aged out
+    relative to the clock.
+    """
+    
+    def __init__(
+        self,
+        half_life_days: float = 7.0,
+        max_age_days: int = 30,
+        log_path: Optional[str] = None,
+        initial_capacity: int = 1024
+    ):
+        if half_life_days <= 0 or max_age_days < 1:
+            raise ValueError("half_life_days must be > 0 and max_age_days >= 1")
+        self.half_life = float(half_life_days)
+        self.window = int(max_age_days)
+        self.positions = {}  # product_id -> row
+        self.product_ids = []
+        self._allocate(initial_capacity)
+        self.log_path = log_path
+        self._lock = threading.RLock()
+        
+        if log_path and os.path.exists(log_path):
+            with open(log_path, encoding='utf-8') as f:
+                self.ingest(iter_ndjson(f), log=False)
+    
+    def _allocate(self, capacity: int):
+        shape = (capacity, self.window)
+        self.bucket_day = np.full(shape, -1, dtype=np.int64)
+        self.bucket_sum = np.zeros(shape)
+        self.bucket_weight = np.zeros(shape)
+        self.bucket_min = np.full(shape, np.inf)
+        self.bucket_max = np.full(shape, -np.inf)
+        self.anchor = np.zeros(capacity)  # t_r, latest observation time
+        self.weighted_sum = np.zeros(capacity)
+        self.weight = np.zeros(capacity)
+        self.min_price = np.full(capacity, np.inf)
+        self.max_price = np.full(capacity, -np.inf)
+        self.observations = np.zeros(capacity, dtype=np.int64)
+    
+    def _grow(self, needed: int):
+        """Grow every per-row array to hold `needed` rows"""
+        capacity = len(self.anchor)
+        while capacity < needed:
+            capacity *= 2
+        if capacity == len(self.anchor):
+            return
+        fill = {'bucket_day': -1, 'bucket_min': np.inf, 'bucket_max': -np.inf,
+                'min_price': np.inf, 'max_price': -np.inf}
+        for name in ('bucket_day', 'bucket_sum', 'bucket_weight', 'bucket_min', 'bucket_max',
+                     'anchor', 'weighted_sum', 'weight', 'min_price', 'max_price', 'observations'):
+            old = getattr(self, name)
+            new = np.full((capacity,) + old.shape[1:], fill.get(name, 0), dtype=old.dtype)
+            new[:len(old)] = old
+            setattr(self, name, new)
+    
+    def __len__(self) -> int:
+        return len(self.product_ids)
+    
+    def __contains__(self, product_id) -> bool:
+        return str(product_id) in self.positions
+    
+    def _decay(self, age_days):
+        return np.exp2(-np.asarray(age_days) / self.half_life)
+    
+    def _evict(self, rows: np.ndarray, cutoff_day: np.ndarray):
+        """Clear buckets of `rows` whose day is <= cutoff_day (per row)"""
+        days = self.bucket_day[rows]
+        stale = (days >= 0) & (days <= cutoff_day[:, None])
+        if not stale.any():
+            return
+        
+        # Subtract the stale buckets (re-anchored to each row's t_r)
+        factor = np.where(stale, self._decay(self.anchor[rows][:, None] - days), 0.0)
+        self.weighted_sum[rows] -= np.sum(self.bucket_sum[rows] * factor, axis=1)
+        self.weight[rows] -= np.sum(self.bucket_weight[rows] * factor, axis=1)
+        
+        r, b = np.nonzero(stale)
+        r = rows[r]
+        self.bucket_day[r, b] = -1
+        self.bucket_sum[r, b] = 0
+        self.bucket_weight[r, b] = 0
+        self.bucket_min[r, b] = np.inf
+        self.bucket_max[r, b] = -np.inf
+        
+        touched = np.unique(r)
+        self.min_price[touched] = self.bucket_min[touched].min(axis=1)
+        self.max_price[touched] = self.bucket_max[touched].max(axis=1)
+        empty = self.bucket_day[touched].max(axis=1) < 0
+        self.weighted_sum[touched[empty]] = 0
+        self.weight[touched[empty]] = 0
+    
+    def ingest(self, observations: Iterable[Dict], log: bool = True) -> Dict:
+        """
+        Apply a batch of competitor price observations
+        
+        Args:
+            observations: Dicts with productId, price and optional
+                observedAt (default: now), competitor and weight
+            log: Append accepted observations to log_path
+        
+        Returns:
+            Counts of ingested, dropped (older than max_age_days before the
+            product's latest observation) and invalid observations
+        """
+        stats = {'ingested': 0, 'dropped': 0, 'invalid': 0}
+        default_time = to_days(now())
+        ids, prices, times, weights, accepted = [], [], [], [], []
+        for observation in observations:
+            try:
+                product_id, price, moment, weight = parse_observation(observation, default_time)
+            except (TypeError, ValueError, AttributeError):
+                stats['invalid'] += 1
+                continue
+            ids.append(product_id)
+            prices.append(price)
+            times.append(moment)
+            weights.append(weight)
+            accepted.append(observation)
+        
+        if not ids:
+            return stats
+        
+        with self._lock:
+            rows = np.empty(len(ids), dtype=np.int64)
+            for i, product_id in enumerate(ids):
+                row = self.positions.get(product_id)
+                if row is None:
+                    row = self.positions[product_id] = len(self.product_ids)
+                    self.product_ids.append(product_id)
+                rows[i] = row
+            self._grow(len(self.product_ids))
+            
+            prices = np.asarray(prices)
+            times = np.asarray(times)
+            weights = np.asarray(weights)
+            days = np.floor(times).astype(np.int64)
+            
+            # Advance each touched row's anchor to its latest observation
+            touched = np.unique(rows)
+            new_anchor = self.anchor.copy()
+            np.maximum.at(new_anchor, rows, times)
+            fresh = self.weight[touched] <= 0
+            shift = new_anchor[touched] - self.anchor[touched]
+            factor = np.where(fresh, 0.0, self._decay(shift))
+            self.weighted_sum[touched] *= factor
+            self.weight[touched] *= factor
+            self.anchor[touched] = new_anchor[touched]
+            
+            # Evict buckets that fall out of the window at the new head day
+            head = np.floor(self.anchor[touched]).astype(np.int64)
+            self._evict(touched, head - self.window)
+            
+            keep = days > np.floor(self.anchor[rows]).astype(np.int64) - self.window
+            stats['dropped'] = int(np.count_nonzero(~keep))
+            rows, prices, times, weights, days = rows[keep], prices[keep], times[keep], weights[keep], days[keep]
+            buckets = days % self.window
+            
+            # Reset buckets that still hold an older day, then accumulate
+            reset = self.bucket_day[rows, buckets] != days
+            r, b = rows[reset], buckets[reset]
+            self.bucket_day[r, b] = days[reset]
+            self.bucket_sum[r, b] = 0
+            self.bucket_weight[r, b] = 0
+            self.bucket_min[r, b] = np.inf
+            self.bucket_max[r, b] = -np.inf
+            
+            within_day = np.exp2((times - days) / self.half_life)
+            np.add.at(self.bucket_sum, (rows, buckets), weights * prices * within_day)
+            np.add.at(self.bucket_weight, (rows, buckets), weights * within_day)
+            np.minimum.at(self.bucket_min, (rows, buckets), prices)
+            np.maximum.at(self.bucket_max, (rows, buckets), prices)
+            
+            decayed = weights * self._decay(self.anchor[rows] - times)
+            size = len(self.anchor)
+            self.weighted_sum += np.bincount(rows, weights=decayed * prices, minlength=size)
+            self.weight += np.bincount(rows, weights=decayed, minlength=size)
+            np.minimum.at(self.min_price, rows, prices)
+            np.maximum.at(self.max_price, rows, prices)
+            self.observations += np.bincount(rows, minlength=size)
+            
+            stats['ingested'] = int(len(rows))
+            if log and self.log_path:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    for observation, ok in zip(accepted, keep.tolist()):
+                        if ok:
+                            f.write(json.dumps(observation, ensure_ascii=False, default=str) + '\n')
+        
+        return stats
+    
+    def ingest_ndjson(self, lines: Iterable) -> Dict:
+        """Ingest an NDJSON file object / iterable of lines (undecodable lines count as invalid)"""
+        return self.ingest(iter_ndjson(lines))
+    
+    def evict_stale(self, as_of=None) -> int:
+        """Drop buckets older than max_age_days before as_of (default: now); returns products emptied"""
+        today = int(np.floor(to_days(as_of)))
+        with self._lock:
+            n = len(self.product_ids)
+            if not n:
+                return 0
+            rows = np.arange(n)
+            before = self.bucket_day[:n].max(axis=1) >= 0
+            self._evict(rows, np.full(n, today - self.window))
+            after = self.bucket_day[:n].max(axis=1) >= 0
+            return int(np.count_nonzero(before & ~after))
+    
+    def _stale(self, row: int, today: int) -> bool:
+        return self.weight[row] <= 0 or int(self.anchor[row]) <= today - self.window
+    
+    def get(self, product_id, as_of=None) -> Optional[Dict]:
+        """
+        Competitor price summary for one product (O(1))
+        
+        Returns:
+            average/min/max price, observation count and last observation
+            time, or None if unknown or no observation is within
+            max_age_days of as_of
+        """
+        row = self.positions.get(str(product_id))
+        if row is None or self._stale(row, int(np.floor(to_days(as_of)))):
+            return None
+        return {
+            'average': float(self.weighted_sum[row] / self.weight[row]),
+            'min': float(self.min_price[row]),
+            'max': float(self.max_price[row]),
+            'observations': int(self.observations[row]),
+            'lastObservedDay': int(self.anchor[row])
+        }
+    
+    def average(self, product_id, as_of=None) -> Optional[float]:
+        """Decayed average competitor price, or None"""
+        summary = self.get(product_id, as_of)
+        return None if summary is None else summary['average']
+    
+    def averages(self, product_ids, as_of=None) -> np.ndarray:
+        """Vectorized average() (NaN where unknown or stale)"""
+        today = int(np.floor(to_days(as_of)))
+        rows = np.array([self.positions.get(str(p), -1) for p in product_ids], dtype=np.int64)
+        result = np.full(len(rows), np.nan)
+        known = rows >= 0
+        r = rows[known]
+        valid = (self.weight[r] > 0) & (np.floor(self.anchor[r]) > today - self.window)
+        values = np.full(len(r), np.nan)
+        values[valid] = self.weighted_sum[r[valid]] / self.weight[r[valid]]
+        result[known] = values
+        return result
@@ -0,0 +1,364 @@
+#!/usr/bin/env python3
+"""
+Contractor Matching Benchmark
+Latency, throughput, memory and ranking-agreement harness for ContractorMatcher
+
+Compares the text engines of ContractorMatcher on seeded synthetic data:
+    - pairwise: TF-IDF fitted per (project, contractor) pair (legacy engine)
+    - hashing: streaming hashed TF-IDF over the registry (new engine)
+
+Usage:
+    python contractor_benchmark.py                              # 100 -> 100k contractors
+    python contractor_benchmark.py --sizes 100,1000 --queries 50
+    python contractor_benchmark.py --max-pairwise 1000 --output bench.json
+"""
+
+import sys
+import json
+import math
+import time
+import random
+import tracemalloc
+from datetime import datetime
+from typing import Dict, List
+
+import numpy as np
+
+from contractor_matching import ContractorMatcher
+
+try:
+    from scipy.stats import kendalltau
+    HAS_SCIPY = True
+except ImportError:
+    HAS_SCIPY = False
+
+
+# Trade -> (skills, bio phrases) used by the generator
+TRADES = {
+    'tho_ho': (
+        ['thợ hồ', 'xây tường', 'trát tường', 'đổ bê tông', 'đọc bản vẽ'],
+        ['xây nhà ở dân dụng', 'thi công móng nhà', 'xây nhà phố trọn gói']
+    ),
+    'dien_nuoc': (
+        ['điện', 'nước', 'điện nước', 'lắp đặt điện', 'ống nước'],
+        ['sửa chữa điện nước tận nơi', 'thi công điện âm tường', 'lắp đặt hệ thống cấp thoát nước']
+    ),
+    'son_nuoc': (
+        ['sơn nước', 'sơn dầu', 'bả matit', 'chống thấm'],
+        ['sơn sửa nhà cũ', 'chống thấm sân thượng', 'sơn nhà trọn gói']
+    ),
+    'op_lat': (
+        ['lát gạch', 'ốp gạch', 'ốp đá', 'lát sàn gỗ'],
+        ['ốp lát nhà vệ sinh', 'lát gạch sân vườn', 'ốp đá mặt tiền']
+    ),
+    'co_khi': (
+        ['hàn sắt', 'mái tôn', 'khung thép', 'cửa sắt'],
+        ['làm mái tôn nhà xưởng', 'gia công khung thép tiền chế', 'làm cửa cổng sắt']
+    ),
+    'noi_that': (
+        ['nội thất', 'thạch cao', 'trần thạch cao', 'tủ bếp'],
+        ['thi công trần thạch cao', 'đóng tủ bếp gỗ công nghiệp', 'thiết kế nội thất căn hộ']
+    )
+}
+
+PROJECT_TYPES = [
+    'Xây nhà 2 tầng', 'Sửa chữa nhà phố', 'Cải tạo căn hộ', 'Làm nhà xưởng',
+    'Chống thấm sân thượng', 'Hoàn thiện nội thất'
+]
+
+# Approximate city centers for the cities in ContractorMatcher.REGIONS
+CITY_COORDINATES = {
+    'hồ chí minh': (10.776, 106.700), 'tp.hcm': (10.776, 106.700),
+    'biên hòa': (10.957, 106.843), 'đồng nai': (11.068, 107.168),
+    'bình dương': (11.167, 106.653), 'vũng tàu': (10.346, 107.084),
+    'bà rịa': (10.499, 107.168), 'hà nội': (21.028, 105.854),
+    'thanh hóa': (19.807, 105.776), 'nam định': (20.434, 106.177),
+    'ninh bình': (20.251, 105.975), 'hải phòng': (20.845, 106.688),
+    'cần thơ': (10.045, 105.747), 'an giang': (10.521, 105.126),
+    'kiên giang': (10.012, 105.081), 'cà mau': (9.177, 105.150),
+    'bạc liêu': (9.294, 105.727), 'sóc trăng': (9.603, 105.974),
+    'đà nẵng': (16.054, 108.202), 'huế': (16.464, 107.591),
+    'quảng nam': (15.574, 108.474), 'quảng ngãi': (15.120, 108.792),
+    'bình định': (13.782, 109.219), 'nha trang': (12.239, 109.197)
+}
+
+DISTRICTS = ['Quận 1', 'Quận 7', 'Tân Phong', 'Long Bình', 'Trung Tâm', 'Phường 1', 'Phường 2']
+
+ENGINES = ('pairwise', 'hashing')
+
+
+def _cities() -> List[str]:
+    return [c for cities in ContractorMatcher.REGIONS.values() for c in cities]
+
+
+def _place(rng: random.Random) -> Dict:
+    """Random city/district with jittered coordinates (~10km)"""
+    city = rng.choice(_cities())
+    lat, lon = CITY_COORDINATES[city]
+    return {
+        'city': city.title(),
+        'district': rng.choice(DISTRICTS),
+        'lat': round(lat + rng.uniform(-0.1, 0.1), 5),
+        'lon': round(lon + rng.uniform(-0.1, 0.1), 5)
+    }
+
+
+def generate_contractors(n: int, seed: int = 42) -> List[Dict]:
+    """Seeded synthetic contractor profiles"""
+    rng = random.Random(seed)
+    trades = list(TRADES)
+    contractors = []
+    
+    for i in range(n):
+        primary = rng.choice(trades)
+        skills, bios = TRADES[primary]
+        chosen = rng.sample(skills, rng.randint(2, len(skills)))
+        # Some contractors also work a second trade
+        if rng.random() < 0.3:
+            chosen.append(rng.choice(TRADES[rng.choice(trades)][0]))
+        
+        experience = rng.randint(0, 30)
+        contractors.append({
+            'id': f'C{i:06d}',
+            'displayName': f'Nhà thầu {i}',
+            'skills': chosen,
+            'bio': f"{experience} năm kinh nghiệm {rng.choice(bios)}",
+            'avgRating': round(rng.uniform(2.5, 5.0), 1),
+            'experienceYears': experience,
+            'completedJobs': rng.randint(0, 150),
+            'isVerified': rng.random() < 0.4,
+            **_place(rng)
+        })
+    
+    return contractors
+
+
+def generate_projects(n: int, seed: int = 7) -> List[Dict]:
+    """Seeded synthetic projects"""
+    rng = random.Random(seed)
+    trades = list(TRADES)
+    projects = []
+    
+    for _ in range(n):
+        needed = rng.sample(trades, rng.randint(1, 2))
+        requirements = [rng.choice(TRADES[t][0]) for t in needed]
+        projects.append({
+            'title': rng.choice(PROJECT_TYPES),
+            'description': f"Cần thợ có kinh nghiệm {rng.choice(TRADES[needed[0]][1])}",
+            'requirements': requirements,
+            **_place(rng)
+        })
+    
+    return projects
+
+
+def kendall_tau(scores_a: np.ndarray, scores_b: np.ndarray) -> float:
+    """Kendall tau-b between two score vectors over the same contractors"""
+    if len(scores_a) < 2:
+        return 1.0
+    if HAS_SCIPY:
+        tau = kendalltau(scores_a, scores_b).statistic
+        return float(tau) if not np.isnan(tau) else 0.0
+    
+    # O(n²) fallback for small inputs
+    a = np.sign(scores_a[:, None] - scores_a[None, :])
+    b = np.sign(scores_b[:, None] - scores_b[None, :])
+    concordance = np.sum(a * b)
+    norm = math.sqrt(float(np.sum(a * a) * np.sum(b * b)))
+    return float(concordance / norm) if norm > 0 else 0.0
+
+
+def top_k_overlap(ids_a: List[str], ids_b: List[str], k: int) -> float:
+    """Share of the top-k ids found in both rankings"""
+    if k <= 0:
+        return 1.0
+    return len(set(ids_a[:k]) & set(ids_b[:k])) / k
+
+
+def _build_matcher(engine: str, contractors: List[Dict]) -> ContractorMatcher:
+    matcher = ContractorMatcher(text_mode=engine)
+    matcher.index_contractors(contractors)
+    return matcher
+
+
+def benchmark_engine(
+    engine: str,
+    contractors: List[Dict],
+    projects: List[Dict],
+    limit: int = 10,
+    measure_memory: bool = True
+) -> Dict:
+    """
+    Time registry indexing and match() calls for one engine
+    
+    Returns:
+        Dictionary with index time, latency percentiles (ms),
+        throughput (requests/s) and peak traced memory (MB)
+    """
+    start = time.perf_counter()
+    matcher = _build_matcher(engine, contractors)
+    index_seconds = time.perf_counter() - start
+    
+    latencies = []
+    for project in projects:
+        start = time.perf_counter()
+        matcher.match(project, limit=limit, explain=True)
+        latencies.append(time.perf_counter() - start)
+    
+    latencies_ms = np.array(latencies) * 1000
+    result = {
+        'engine': engine,
+        'contractors': len(contractors),
+        'indexSeconds': round(index_seconds, 4),
+        'latencyMs': {
+            'mean': round(float(latencies_ms.mean()), 3),
+            'p50': round(float(np.percentile(latencies_ms, 50)), 3),
+            'p95': round(float(np.percentile(latencies_ms, 95)), 3),
+            'max': round(float(latencies_ms.max()), 3)
+        },
+        'throughputRps': round(len(latencies) / max(sum(latencies), 1e-9), 2),
+        'peakMemoryMb': None
+    }
+    
+    if measure_memory:
+        # Separate pass: tracemalloc slows allocation-heavy code
+        tracemalloc.start()
+        traced = _build_matcher(engine, contractors)
+        traced.match(projects[0], limit=limit)
+        _, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        result['peakMemoryMb'] = round(peak / (1024 * 1024), 2)
+    
+    return result
+
+
+def ranking_agreement(
+    contractors: List[Dict],
+    projects: List[Dict],
+    k: int = 10,
+    engines: tuple = ENGINES
+) -> Dict:
+    """
+    Compare full rankings of two engines on the same registry
+    
+    Returns:
+        Mean/min Kendall tau over final scores and mean top-k overlap
+    """
+    old_engine, new_engine = engines
+    old = _build_matcher(old_engine, contractors)
+    new = _build_matcher(new_engine, contractors)
+    n = len(contractors)
+    
+    taus, overlaps = [], []
+    for project in projects:
+        old_results = old.match(project, limit=n, explain=False)
+        new_results = new.match(project, limit=n, explain=False)
+        
+        old_scores = {r.contractor_id: r.score for r in old_results}
+        new_scores = {r.contractor_id: r.score for r in new_results}
+        ids = list(old_scores)
+        
+        taus.append(kendall_tau(
+            np.array([old_scores[i] for i in ids]),
+            np.array([new_scores[i] for i in ids])
+        ))
+        overlaps.append(top_k_overlap(
+            [r.contractor_id for r in old_results],
+            [r.contractor_id for r in new_results],
+            min(k, n)
+        ))
+    
+    return {
+        'engines': [old_engine, new_engine],
+        'contractors': n,
+        'kendallTau': {
+            'mean': round(float(np.mean(taus)), 4),
+            'min': round(float(np.min(taus)), 4)
+        },
+        f'top{k}Overlap': round(float(np.mean(overlaps)), 4)
+    }
+
+
+def run_benchmark(
+    sizes: List[int],
+    n_queries: int = 20,
+    limit: int = 10,
+    seed: int = 42,
+    max_pairwise: int = 5000,
+    measure_memory: bool = True
+) -> Dict:
+    """Run the benchmark grid over registry sizes and engines"""
+    projects = generate_projects(n_queries, seed + 1)
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'seed': seed,
+        'queries': n_queries,
+        'limit': limit,
+        'performance': [],
+        'agreement': []
+    }
+    
+    for size in sizes:
+        contractors = generate_contractors(size, seed)
+        print(f"\n📦 {size:,} contractors")
+        
+        for engine in ENGINES:
+            if engine == 'pairwise' and size > max_pairwise:
+                print(f"  ⏭️ {engine}: skipped (> --max-pairwise {max_pairwise:,})")
+                continue
+            
+            result = benchmark_engine(engine, contractors, projects, limit, measure_memory)
+            report['performance'].append(result)
+            memory = f"{result['peakMemoryMb']} MB" if result['peakMemoryMb'] is not None else "-"
+            print(
+                f"  ⏱️ {engine:<9} index {result['indexSeconds']:.3f}s | "
+                f"p50 {result['latencyMs']['p50']:.2f}ms p95 {result['latencyMs']['p95']:.2f}ms | "
+                f"{result['throughputRps']:.1f} req/s | peak {memory}"
+            )
+        
+        if size <= max_pairwise:
+            agreement = ranking_agreement(contractors, projects, limit)
+            report['agreement'].append(agreement)
+            print(
+                f"  📊 agreement: tau {agreement['kendallTau']['mean']:.3f} "
+                f"(min {agreement['kendallTau']['min']:.3f}) | "
+                f"top-{limit} overlap {agreement[f'top{limit}Overlap']:.0%}"
+            )
+    
+    return report
+
+
+def main():
+    """Benchmark CLI"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Contractor Matching Benchmark")
+    parser.add_argument("--sizes", type=str, default="100,1000,10000,100000",
+                        help="Comma-separated registry sizes")
+    parser.add_argument("--queries", type=int, default=20, help="Projects per size")
+    parser.add_argument("--limit", type=int, default=10, help="Top-k per request")
+    parser.add_argument("--seed", type=int, default=42, help="Random seed")
+    parser.add_argument("--max-pairwise", type=int, default=5000,
+                        help="Largest size for the pairwise engine and agreement checks")
+    parser.add_argument("--no-memory", action="store_true", help="Skip tracemalloc pass")
+    parser.add_argument("--output", type=str, help="Write JSON report to this path")
+    
+    args = parser.parse_args()
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+    
+    print("🚀 Contractor Matching Benchmark")
+    print("=" * 50)
+    
+    report = run_benchmark(
+        sizes, args.queries, args.limit, args.seed,
+        args.max_pairwise, not args.no_memory
+    )
+    
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2, ensure_ascii=False)
+        print(f"\n✅ Report saved to: {args.output}")
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -6,18 +6,26 @@ Hybrid recommendation using Content-Based Filtering + Rule-Based Scoring
 API Endpoints:
     POST /predict/contractors - Get contractor recommendations for a project
     POST /contractors/retrain - Retrain the TF-IDF model
+    POST /contractors/index - Add contractors to the in-memory registry
+    POST /contractors/bookings - Add booked intervals for registered contractors
 """
 
 import re
+import json
 import math
+import hashlib
+import threading
+from collections import OrderedDict
 from typing import Dict, List, Optional, Tuple
 from dataclasses import dataclass
 
+import numpy as np
+
 # Try to import scikit-learn for TF-IDF
 try:
-    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.feature_extraction.text import TfidfVectorizer, HashingVectorizer
     from sklearn.metrics.pairwise import cosine_similarity
-    import numpy as np
+    from scipy.sparse import vstack
     HAS_SKLEARN = True
 except ImportError:
     HAS_SKLEARN = False
@@ -43,12 +51,551 @@ class ContractorMatch:
     reasons: List[str]
 
 
+EARTH_RADIUS_KM = 6371.0
+
+# Largest accepted search radius (radiusKm)
+MAX_RADIUS_KM = 2000.0
+
+
+def haversine_km(lat1, lon1, lat2, lon2):
+    """
+    Great-circle distance in kilometers
+    
+    Accepts scalars or NumPy arrays (broadcast against each other).
+    """
+    lat1, lon1, lat2, lon2 = map(np.radians, (lat1, lon1, lat2, lon2))
+    a = (
+        np.sin((lat2 - lat1) / 2.0) ** 2 +
+        np.cos(lat1) * np.cos(lat2) * np.sin((lon2 - lon1) / 2.0) ** 2
+    )
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.minimum(a, 1.0)))
+
+
+def get_coordinates(data: Dict) -> Optional[Tuple[float, float]]:
+    """Read (lat, lon) from a contractor/project dict, None if missing or invalid"""
+    lat = data.get('lat', data.get('latitude'))
+    lon = data.get('lon', data.get('lng', data.get('longitude')))
+    
+    if lat is None or lon is None:
+        return None
+    
+    try:
+        lat, lon = float(lat), float(lon)
+    except (TypeError, ValueError):
+        return None
+    
+    if not (-90.0 <= lat <= 90.0 and -180.0 <= lon <= 180.0):
+        return None
+    
+    return lat, lon
+
+
+def parse_radius_km(value) -> Optional[float]:
+    """
+    Search radius from a request (None/'' -> no radius filter)
+    
+    Raises:
+        ValueError: If the radius is not a number in (0, MAX_RADIUS_KM]
+    """
+    if value is None or value == '':
+        return None
+    try:
+        if isinstance(value, bool):
+            raise TypeError
+        radius = float(value)
+    except (TypeError, ValueError):
+        raise ValueError(f"Invalid radiusKm: {value!r}")
+    if not 0 < radius <= MAX_RADIUS_KM:
+        raise ValueError(f"radiusKm must be > 0 and <= {MAX_RADIUS_KM:g}")
+    return radius
+
+
+class GeoGridIndex:
+    """
+    Uniform lat/lon grid for radius queries
+    
+    Each cell holds registry row numbers. A radius query visits only the
+    cells overlapping the bounding box of the circle (split in two where it
+    crosses the antimeridian, and widened to every longitude where it
+    covers a pole).
+    """
+    
+    def __init__(self, cell_deg: float = 0.1):
+        self.cell_deg = cell_deg
+        self.cells = {}  # (row, col) -> [registry rows]
+    
+    def _cell(self, lat: float, lon: float) -> Tuple[int, int]:
+        return (int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg)))
+    
+    def add(self, row: int, lat: float, lon: float):
+        """Add a registry row at the given coordinates"""
+        self.cells.setdefault(self._cell(lat, lon), []).append(row)
+    
+    def remove(self, row: int, lat: float, lon: float):
+        """Remove a registry row previously added at the given coordinates"""
+        key = self._cell(lat, lon)
+        rows = self.cells.get(key)
+        if rows and row in rows:
+            rows.remove(row)
+            if not rows:
+                del self.cells[key]
+    
+    def candidates(self, lat: float, lon: float, radius_km: float) -> List[int]:
+        """
+        Rows in cells overlapping the bounding box of the radius
+        
+        When the box spans more cells than are occupied, the occupied cells
+        are scanned instead, so the cost is bounded by the index size.
+        """
+        angle = radius_km / EARTH_RADIUS_KM
+        dlat = math.degrees(angle)
+        if abs(lat) + dlat >= 90.0:
+            lon_ranges = [(-180.0, 180.0)]
+        else:
+            # Widest longitude extent of the circle (reached off its
+            # center latitude, so wider than angle / cos(lat))
+            dlon = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(lat))))
+            west, east = lon - dlon, lon + dlon
+            lon_ranges = [(max(west, -180.0), min(east, 180.0))]
+            if west < -180.0:
+                lon_ranges.append((west + 360.0, 180.0))
+            if east > 180.0:
+                lon_ranges.append((-180.0, east - 360.0))
+        
+        row_min = self._cell(max(lat - dlat, -90.0), 0.0)[0]
+        row_max = self._cell(min(lat + dlat, 90.0), 0.0)[0]
+        col_ranges = [(self._cell(0.0, w)[1], self._cell(0.0, e)[1]) for w, e in lon_ranges]
+        
+        rows = []
+        box_cells = (row_max - row_min + 1) * sum(c_max - c_min + 1 for c_min, c_max in col_ranges)
+        if box_cells > len(self.cells):
+            for (r, c), cell_rows in self.cells.items():
+                if row_min <= r <= row_max and any(c_min <= c <= c_max for c_min, c_max in col_ranges):
+                    rows.extend(cell_rows)
+            return rows
+        for r in range(row_min, row_max + 1):
+            for c_min, c_max in col_ranges:
+                for c in range(c_min, c_max + 1):
+                    rows.extend(self.cells.get((r, c), ()))
+        return rows
+
+
+def get_profile_features(contractor: Dict) -> Tuple[float, float, float, bool]:
+    """Read (rating, experience_years, completed_jobs, verified) with camelCase fallbacks"""
+    return (
+        contractor.get('avg_rating', contractor.get('avgRating', 0)),
+        contractor.get('experience_years', contractor.get('experienceYears', 0)),
+        contractor.get('completed_jobs', contractor.get('completedJobs', 0)),
+        bool(contractor.get('is_verified', contractor.get('isVerified', False)))
+    )
+
+
+def get_area(data: Dict) -> Tuple[str, str]:
+    """Normalized (city, district) used for area-based location scoring"""
+    return (
+        str(data.get('city', '')).lower().strip(),
+        str(data.get('district', '')).lower().strip()
+    )
+
+
+def get_skills(contractor: Dict) -> List[str]:
+    """Contractor skills as a list (a single skill may be sent as a string)"""
+    skills = contractor.get('skills', [])
+    if isinstance(skills, str):
+        skills = [skills]
+    return skills
+
+
+def normalize_skill(skill: str) -> str:
+    return ' '.join(str(skill).lower().split())
+
+
+def to_day(value) -> int:
+    """Date (ISO string, date or datetime) as days since 1970-01-01"""
+    if hasattr(value, 'isoformat'):
+        value = value.isoformat()
+    try:
+        return int(np.datetime64(str(value)[:10], 'D').astype(np.int64))
+    except ValueError:
+        raise ValueError(f"Invalid date: {value!r}")
+
+
+def parse_bookings(bookings: Optional[List[Dict]]) -> List[Tuple[int, int]]:
+    """
+    Booked intervals as (start_day, end_day), both days inclusive
+    
+    Each booking has start/startDate and end/endDate (end defaults to start).
+    """
+    intervals = []
+    for booking in bookings or []:
+        start = booking.get('start', booking.get('startDate'))
+        end = booking.get('end', booking.get('endDate')) or start
+        if start is None:
+            raise ValueError("Booking is missing a start date")
+        start_day, end_day = to_day(start), to_day(end)
+        if end_day < start_day:
+            raise ValueError(f"Booking ends before it starts: {start} -> {end}")
+        intervals.append((start_day, end_day))
+    return intervals
+
+
+def get_contractor_text(contractor: Dict) -> str:
+    """Contractor skills + bio + specialties used for text matching"""
+    return ' '.join([
+        ' '.join(get_skills(contractor)),
+        contractor.get('bio', ''),
+        contractor.get('specialties', '')
+    ])
+
+
+class HashedTfidfIndex:
+    """
+    Streaming TF-IDF over contractor texts
+    
+    Term counts are hashed into a fixed feature space (no vocabulary to
+    fit) and document frequencies are kept in an online table, so
+    contractors can be appended or updated without refitting. IDF weights
+    are derived from the current table at query time, which keeps
+    similarities consistent across the whole registry:
+    
+    IDF(t) = ln((1 + N) / (1 + df(t))) + 1   (same smoothing as TfidfVectorizer)
+    """
+    
+    def __init__(self, preprocessor=None, n_features: int = 2 ** 18):
+        self.preprocessor = preprocessor or (lambda text: text)
+        self.vectorizer = HashingVectorizer(
+            n_features=n_features,
+            ngram_range=(1, 2),
+            alternate_sign=False,
+            norm=None
+        )
+        self.doc_freq = np.zeros(n_features, dtype=np.int64)
+        self.n_docs = 0
+        self._matrix = None  # term counts, one row per registry row
+        self._pending = []  # appended batches not yet stacked into _matrix
+        self._replaced = {}  # row -> 1-row term counts not yet written into _matrix
+    
+    def _transform(self, texts: List[str]):
+        return self.vectorizer.transform([self.preprocessor(t) for t in texts]).tocsr()
+    
+    def _stack_pending(self):
+        if self._pending:
+            blocks = ([self._matrix] if self._matrix is not None else []) + self._pending
+            self._matrix = vstack(blocks, format='csr')
+            self._pending = []
+    
+    @property
+    def matrix(self):
+        """
+        Term-count matrix of all indexed rows
+        
+        Appends and replacements are buffered and applied here in one
+        vstack, so a run of updates costs one rebuild at the next read.
+        """
+        self._stack_pending()
+        if self._replaced:
+            blocks, start = [], 0
+            for row in sorted(self._replaced):
+                blocks.append(self._matrix[start:row])
+                blocks.append(self._replaced[row])
+                start = row + 1
+            blocks.append(self._matrix[start:])
+            self._matrix = vstack(blocks, format='csr')
+            self._replaced = {}
+        return self._matrix
+    
+    def update(self, rows: List[int], texts: List[str]):
+        """
+        Index texts at registry rows
+        
+        Rows beyond the current size are appended (they must follow on
+        from it); existing rows are replaced and their old terms leave the
+        document-frequency table.
+        """
+        if not rows:
+            return
+        
+        # Keep the last text per row when a batch repeats a contractor
+        latest = {}
+        for row, text in zip(rows, texts):
+            latest[row] = text
+        ordered = sorted(latest)
+        counts = self._transform([latest[r] for r in ordered])
+        n_features = self.doc_freq.size
+        
+        new_count = sum(1 for r in ordered if r >= self.n_docs)
+        existing = np.array(ordered[:len(ordered) - new_count], dtype=np.int64)
+        
+        if existing.size:
+            self._stack_pending()
+            for i, row in enumerate(existing.tolist()):
+                old = self._replaced.get(row)
+                if old is None:
+                    old = self._matrix[row]
+                self.doc_freq -= np.bincount(old.indices, minlength=n_features)
+                self._replaced[row] = counts[i]
+        
+        if new_count:
+            self._pending.append(counts[existing.size:])
+            self.n_docs += new_count
+        
+        # HashingVectorizer sums duplicates, so indices are unique per row
+        self.doc_freq += np.bincount(counts.indices, minlength=n_features)
+    
+    def similarities(self, text: str, rows: np.ndarray) -> np.ndarray:
+        """Cosine similarity of a query text against the given rows"""
+        if len(rows) == 0 or self.n_docs == 0:
+            return np.zeros(len(rows))
+        
+        idf = np.log((1.0 + self.n_docs) / (1.0 + self.doc_freq)) + 1.0
+        
+        query = self._transform([text])
+        query.data = query.data * idf[query.indices]
+        query_norm = np.sqrt(np.sum(query.data ** 2))
+        if query_norm == 0:
+            return np.zeros(len(rows))
+        
+        docs = self.matrix[rows]
+        docs.data = docs.data * idf[docs.indices]
+        doc_norms = np.sqrt(np.asarray(docs.multiply(docs).sum(axis=1)).ravel())
+        
+        dots = np.asarray((docs @ query.T).todense()).ravel()
+        with np.errstate(divide='ignore', invalid='ignore'):
+            sims = np.where(doc_norms > 0, dots / (doc_norms * query_norm), 0.0)
+        return np.clip(sims, 0.0, 1.0)
+
+
+class ContractorRegistry:
+    """
+    In-memory contractor registry
+    
+    Keeps contractor profiles in insertion order with coordinates and
+    profile features as NumPy columns (coordinates are NaN when unknown),
+    a grid index for radius retrieval and a skill -> rows inverted index
+    for hard filters. An optional HashedTfidfIndex is kept in sync with the
+    contractor texts.
+    
+    Booked intervals are flattened into arrays sorted by start day, so an
+    availability check is a binary search plus one vectorized comparison
+    instead of a loop over each contractor's calendar.
+    """
+    
+    FEATURES = ('lat', 'lon', 'rating', 'experience', 'jobs', 'verified', 'city', 'district')
+    FEATURE_DTYPES = {'verified': bool, 'city': object, 'district': object}
+    
+    def __init__(self, cell_deg: float = 0.1, text_index: Optional[HashedTfidfIndex] = None):
+        self.contractors = []
+        self.positions = {}  # contractor_id -> row
+        self.grid = GeoGridIndex(cell_deg)
+        self.text_index = text_index
+        self.skill_rows = {}  # normalized skill -> set of rows
+        self._features = {name: [] for name in self.FEATURES}
+        self._skills = []  # per-row normalized skills
+        self._bookings = {}  # row -> [(start_day, end_day)]
+        self._columns = None  # cached NumPy views, rebuilt after changes
+        self._booking_arrays = None  # (starts, ends, rows) sorted by start
+    
+    def __len__(self) -> int:
+        return len(self.contractors)
+    
+    @classmethod
+    def from_contractors(
+        cls, 
+        contractors: List[Dict], 
+        cell_deg: float = 0.1,
+        text_index: Optional[HashedTfidfIndex] = None
+    ) -> 'ContractorRegistry':
+        """Build a registry keeping every entry, even duplicated or missing ids"""
+        registry = cls(cell_deg, text_index)
+        registry.add(contractors, upsert=False)
+        return registry
+    
+    @staticmethod
+    def contractor_id(contractor: Dict) -> str:
+        return contractor.get('id', contractor.get('contractor_id', ''))
+    
+    def add(self, contractors: List[Dict], upsert: bool = True) -> List[int]:
+        """
+        Add or update contractors (matched by id when upsert is set)
+        
+        Returns:
+            Registry rows of the given contractors
+        """
+        rows = []
+        features = self._features
+        
+        # Validate calendars up front so a bad date leaves the registry untouched
+        calendars = [
+            parse_bookings(c['bookings']) if 'bookings' in c else None
+            for c in contractors
+        ]
+        
+        for contractor, calendar in zip(contractors, calendars):
+            cid = self.contractor_id(contractor)
+            coords = get_coordinates(contractor)
+            lat, lon = coords if coords else (math.nan, math.nan)
+            rating, experience, jobs, verified = get_profile_features(contractor)
+            city, district = get_area(contractor)
+            skills = {normalize_skill(s) for s in get_skills(contractor)}
+            values = {
+                'lat': lat, 'lon': lon, 'rating': rating,
+                'experience': experience, 'jobs': jobs, 'verified': verified,
+                'city': city, 'district': district
+            }
+            row = self.positions.get(cid) if (upsert and cid) else None
+            
+            if row is None:
+                row = len(self.contractors)
+                self.contractors.append(contractor)
+                self._skills.append(skills)
+                for name in self.FEATURES:
+                    features[name].append(values[name])
+                if cid and upsert:
+                    self.positions[cid] = row
+            else:
+                # Update in place, re-indexing the old position and skills
+                if not math.isnan(features['lat'][row]):
+                    self.grid.remove(row, features['lat'][row], features['lon'][row])
+                for skill in self._skills[row]:
+                    self.skill_rows[skill].discard(row)
+                self.contractors[row] = contractor
+                self._skills[row] = skills
+                for name in self.FEATURES:
+                    features[name][row] = values[name]
+            
+            if coords:
+                self.grid.add(row, lat, lon)
+            for skill in skills:
+                self.skill_rows.setdefault(skill, set()).add(row)
+            if calendar is not None:
+                self._set_bookings(row, calendar)
+            rows.append(row)
+        
+        if self.text_index is not None:
+            self.text_index.update(rows, [get_contractor_text(c) for c in contractors])
+        
+        self._columns = None
+        return rows
+    
+    @property
+    def columns(self) -> Dict[str, np.ndarray]:
+        """Columnar view of registry features"""
+        if self._columns is None:
+            self._columns = {
+                name: np.array(values, dtype=self.FEATURE_DTYPES.get(name, float))
+                for name, values in self._features.items()
+            }
+        return self._columns
+    
+    def _set_bookings(self, row: int, intervals: List[Tuple[int, int]]):
+        if intervals:
+            self._bookings[row] = list(intervals)
+        else:
+            self._bookings.pop(row, None)
+        self._booking_arrays = None
+    
+    def add_bookings(self, contractor_id: str, bookings: List[Dict]) -> int:
+        """
+        Append booked intervals to a registered contractor
+        
+        Returns:
+            Number of bookings the contractor now has
+        """
+        row = self.positions.get(contractor_id)
+        if row is None:
+            raise KeyError(contractor_id)
+        intervals = parse_bookings(bookings)
+        self._set_bookings(row, self._bookings.get(row, []) + intervals)
+        return len(self._bookings.get(row, []))
+    
+    def _sorted_bookings(self) -> Tuple[np.ndarray, np.ndarray, np.ndarray, int]:
+        """Flattened bookings sorted by start day, plus the longest booking length"""
+        if self._booking_arrays is None:
+            owners = [row for row, intervals in self._bookings.items() for _ in intervals]
+            spans = [iv for intervals in self._bookings.values() for iv in intervals]
+            starts = np.array([s for s, _ in spans], dtype=np.int64)
+            ends = np.array([e for _, e in spans], dtype=np.int64)
+            owners = np.array(owners, dtype=np.int64)
+            order = np.argsort(starts, kind='stable')
+            max_length = int((ends - starts).max()) if spans else 0
+            self._booking_arrays = (starts[order], ends[order], owners[order], max_length)
+        return self._booking_arrays
+    
+    def busy_mask(self, start_day: int, end_day: int) -> np.ndarray:
+        """
+        Boolean mask over all rows: True if a booking overlaps [start_day, end_day]
+        
+        A booking overlaps when start <= end_day and end >= start_day. Bookings
+        are sorted by start, and no booking is longer than max_length, so
+        only bookings with start in [start_day - max_length, end_day] can
+        overlap; those are located by binary search and checked at once.
+        """
+        busy = np.zeros(len(self.contractors), dtype=bool)
+        starts, ends, owners, max_length = self._sorted_bookings()
+        if starts.size == 0:
+            return busy
+        
+        lo = np.searchsorted(starts, start_day - max_length, side='left')
+        hi = np.searchsorted(starts, end_day, side='right')
+        overlapping = ends[lo:hi] >= start_day
+        busy[owners[lo:hi][overlapping]] = True
+        return busy
+    
+    def within_radius(self, lat: float, lon: float, radius_km: float) -> np.ndarray:
+        """Rows of contractors within radius_km of (lat, lon), in registry order"""
+        rows = np.unique(np.array(self.grid.candidates(lat, lon, radius_km), dtype=np.int64))
+        if rows.size == 0:
+            return rows
+        columns = self.columns
+        distances = haversine_km(lat, lon, columns['lat'][rows], columns['lon'][rows])
+        return rows[distances <= radius_km]
+    
+    def filter_mask(self, rows: np.ndarray, filters: Optional[Dict]) -> np.ndarray:
+        """
+        Boolean mask over rows for hard constraints
+        
+        Args:
+            rows: Registry rows to test
+            filters: Optional constraints
+                - min_rating / minRating: Minimum average rating
+                - verified_only / verifiedOnly: Only verified contractors
+                - required_skills / requiredSkills: Skills a contractor must all have
+        """
+        mask = np.ones(len(rows), dtype=bool)
+        if not filters:
+            return mask
+        
+        columns = self.columns
+        
+        min_rating = filters.get('min_rating', filters.get('minRating'))
+        if min_rating is not None:
+            mask &= columns['rating'][rows] >= float(min_rating)
+        
+        if filters.get('verified_only', filters.get('verifiedOnly', False)):
+            mask &= columns['verified'][rows]
+        
+        required = filters.get('required_skills', filters.get('requiredSkills')) or []
+        if isinstance(required, str):
+            required = [required]
+        for skill in required:
+            has_skill = np.zeros(len(self.contractors), dtype=bool)
+            has_skill[list(self.skill_rows.get(normalize_skill(skill), ()))] = True
+            mask &= has_skill[rows]
+        
+        return mask
+
+
 class ContractorMatcher:
     """
     Contractor Matching using Hybrid Recommendation
     
     Formula:
     FINAL_SCORE = (0.50 × Text_Similarity) + (0.35 × Profile_Score) + (0.15 × Location_Score)
+    
+    Text modes:
+    - pairwise: TF-IDF fitted on (project, contractor) for each contractor
+    - hashing: streaming hashed TF-IDF over the whole registry
+      (see HashedTfidfIndex), no refit when contractors are added
     """
     
     # Weights
@@ -74,6 +621,22 @@ class ContractorMatcher:
         'other': 0.2
     }
     
+    # Cities grouped by region (used for the same-province check)
+    REGIONS = {
+        'dong_nam_bo': ['hồ chí minh', 'tp.hcm', 'biên hòa', 'đồng nai', 'bình dương', 'vũng tàu', 'bà rịa'],
+        'ha_noi': ['hà nội', 'thanh hóa', 'nam định', 'ninh bình', 'hải phòng'],
+        'mien_tay': ['cần thơ', 'an giang', 'kiên giang', 'cà mau', 'bạc liêu', 'sóc trăng'],
+        'mien_trung': ['đà nẵng', 'huế', 'quảng nam', 'quảng ngãi', 'bình định', 'nha trang']
+    }
+    
+    # Coordinate-based location scoring: score = exp(-distance / decay)
+    DISTANCE_DECAY_KM = 15.0
+    GRID_CELL_DEG = 0.1  # ~11 km grid cells
+    
+    # Registries built for explicit contractor lists, reused while the
+    # same list (by content digest) keeps being sent
+    LIST_CACHE_SIZE = 8
+    
     # Vietnamese stopwords (common words to ignore)
     STOPWORDS = {
         'và', 'hoặc', 'để', 'cho', 'của', 'có', 'là', 'với', 'các', 'được',
@@ -81,10 +644,18 @@ class ContractorMatcher:
         'cần', 'phải', 'nên', 'sẽ', 'đã', 'đang', 'rồi', 'vì', 'nếu', 'tại'
     }
     
-    def __init__(self):
+    TEXT_MODES = ('pairwise', 'hashing')
+    
+    def __init__(self, text_mode: str = 'pairwise'):
+        if text_mode not in self.TEXT_MODES:
+            raise ValueError(f"Unknown text_mode '{text_mode}', expected one of {self.TEXT_MODES}")
+        
+        self.text_mode = text_mode
         self.vectorizer = None
         self.contractor_vectors = None
-        self.contractors = []
+        self.registry = ContractorRegistry(self.GRID_CELL_DEG, self._new_text_index())
+        self._list_registries = OrderedDict()  # content digest -> ContractorRegistry
+        self._list_lock = threading.Lock()
         self._init_vectorizer()
     
     def _init_vectorizer(self):
@@ -97,6 +668,39 @@ class ContractorMatcher:
                 max_df=0.95
             )
     
+    def _new_text_index(self) -> Optional[HashedTfidfIndex]:
+        """Text index for a registry (hashing mode only, needs scikit-learn)"""
+        if self.text_mode == 'hashing' and HAS_SKLEARN:
+            return HashedTfidfIndex(self.preprocess)
+        return None
+    
+    def _list_registry(self, contractors: List[Dict]) -> ContractorRegistry:
+        """
+        Registry for an explicit contractor list
+        
+        Keyed by a digest of the list's content, so the grid, skill sets
+        and (hashing mode) document frequencies are built once per
+        distinct list; the LIST_CACHE_SIZE most recently used are kept.
+        """
+        key = hashlib.blake2b(
+            json.dumps(contractors, sort_keys=True, ensure_ascii=False, default=str).encode('utf-8'),
+            digest_size=16
+        ).digest()
+        with self._list_lock:
+            registry = self._list_registries.get(key)
+            if registry is not None:
+                self._list_registries.move_to_end(key)
+                return registry
+        
+        registry = ContractorRegistry.from_contractors(
+            contractors, self.GRID_CELL_DEG, self._new_text_index()
+        )
+        with self._list_lock:
+            self._list_registries[key] = registry
+            while len(self._list_registries) > self.LIST_CACHE_SIZE:
+                self._list_registries.popitem(last=False)
+        return registry
+    
     def tokenize(self, text: str) -> str:
         """Tokenize Vietnamese text"""
         if HAS_UNDERTHESEA:
@@ -177,20 +781,18 @@ class ContractorMatcher:
         Profile_Score = (w1 × Rating_Norm) + (w2 × Experience_Norm) + 
                        (w3 × Jobs_Norm) + (w4 × Verified_Bonus)
         """
+        rating, experience, jobs, verified = get_profile_features(contractor)
+        
         # Normalize rating (0-5 -> 0-1)
-        rating = contractor.get('avg_rating', contractor.get('avgRating', 0))
         rating_norm = rating / 5.0
         
         # Normalize experience (max 20 years)
-        experience = contractor.get('experience_years', contractor.get('experienceYears', 0))
         experience_norm = min(experience / 20.0, 1.0)
         
         # Normalize completed jobs (max 100)
-        jobs = contractor.get('completed_jobs', contractor.get('completedJobs', 0))
         jobs_norm = min(jobs / 100.0, 1.0)
         
         # Verified bonus
-        verified = contractor.get('is_verified', contractor.get('isVerified', False))
         verified_bonus = 1.0 if verified else 0.0
         
         # Calculate weighted score
@@ -203,6 +805,15 @@ class ContractorMatcher:
         
         return profile_score
     
+    def _calculate_profile_scores(self, columns: Dict[str, np.ndarray], rows: np.ndarray) -> np.ndarray:
+        """Vectorized _calculate_profile_score over registry rows"""
+        return (
+            self.PROFILE_WEIGHTS['rating'] * (columns['rating'][rows] / 5.0) +
+            self.PROFILE_WEIGHTS['experience'] * np.minimum(columns['experience'][rows] / 20.0, 1.0) +
+            self.PROFILE_WEIGHTS['jobs'] * np.minimum(columns['jobs'][rows] / 100.0, 1.0) +
+            self.PROFILE_WEIGHTS['verified'] * columns['verified'][rows].astype(float)
+        )
+    
     def _calculate_location_score(
         self, 
         contractor: Dict, 
@@ -211,16 +822,22 @@ class ContractorMatcher:
         """
         Calculate location score based on proximity
         
+        With coordinates on both sides: exp(-distance_km / DISTANCE_DECAY_KM)
+        
+        Otherwise by administrative area:
         Same district: 1.0
         Same city: 0.8
         Same province: 0.5
         Other: 0.2
         """
-        contractor_city = str(contractor.get('city', '')).lower().strip()
-        contractor_district = str(contractor.get('district', '')).lower().strip()
+        contractor_coords = get_coordinates(contractor)
+        project_coords = get_coordinates(project)
+        if contractor_coords and project_coords:
+            distance = haversine_km(*project_coords, *contractor_coords)
+            return float(np.exp(-distance / self.DISTANCE_DECAY_KM))
         
-        project_city = str(project.get('city', '')).lower().strip()
-        project_district = str(project.get('district', '')).lower().strip()
+        contractor_city, contractor_district = get_area(contractor)
+        project_city, project_district = get_area(project)
         
         # Check same district
         if contractor_city == project_city and contractor_district == project_district:
@@ -236,17 +853,50 @@ class ContractorMatcher:
         
         return self.LOCATION_SCORES['other']
     
+    def _calculate_location_scores(
+        self,
+        columns: Dict[str, np.ndarray],
+        rows: np.ndarray,
+        project: Dict
+    ) -> np.ndarray:
+        """
+        Vectorized _calculate_location_score over registry rows
+        
+        Distances come from one haversine_km call over the coordinate
+        columns; the area fallback compares the city/district columns and
+        runs _same_province once per distinct city.
+        """
+        scores = np.full(len(rows), self.LOCATION_SCORES['other'])
+        lat, lon = columns['lat'][rows], columns['lon'][rows]
+        project_coords = get_coordinates(project)
+        
+        by_distance = ~np.isnan(lat) if project_coords else np.zeros(len(rows), dtype=bool)
+        if by_distance.any():
+            distances = haversine_km(*project_coords, lat[by_distance], lon[by_distance])
+            scores[by_distance] = np.exp(-distances / self.DISTANCE_DECAY_KM)
+        
+        by_area = np.nonzero(~by_distance)[0]
+        if by_area.size:
+            project_city, project_district = get_area(project)
+            cities = columns['city'][rows[by_area]]
+            districts = columns['district'][rows[by_area]]
+            same_city = cities == project_city
+            
+            other = np.nonzero(~same_city)[0]
+            names, inverse = np.unique(cities[other].astype(str), return_inverse=True)
+            same_province = np.array([self._same_province(c, project_city) for c in names], dtype=bool)
+            
+            area = np.full(by_area.size, self.LOCATION_SCORES['other'])
+            area[other[same_province[inverse.reshape(-1)]]] = self.LOCATION_SCORES['same_province']
+            area[same_city] = self.LOCATION_SCORES['same_city']
+            area[same_city & (districts == project_district)] = self.LOCATION_SCORES['same_district']
+            scores[by_area] = area
+        
+        return scores
+    
     def _same_province(self, city1: str, city2: str) -> bool:
         """Check if two cities are in the same province/region"""
-        # Group cities by region
-        regions = {
-            'dong_nam_bo': ['hồ chí minh', 'tp.hcm', 'biên hòa', 'đồng nai', 'bình dương', 'vũng tàu', 'bà rịa'],
-            'ha_noi': ['hà nội', 'thanh hóa', 'nam định', 'ninh bình', 'hải phòng'],
-            'mien_tay': ['cần thơ', 'an giang', 'kiên giang', 'cà mau', 'bạc liêu', 'sóc trăng'],
-            'mien_trung': ['đà nẵng', 'huế', 'quảng nam', 'quảng ngãi', 'bình định', 'nha trang']
-        }
-        
-        for region, cities in regions.items():
+        for region, cities in self.REGIONS.items():
             cities_in_region = [c for c in cities if c in city1.lower() or city1.lower() in c]
             if cities_in_region:
                 for c in cities:
@@ -290,11 +940,54 @@ class ContractorMatcher:
         
         return reasons if reasons else ["Phù hợp với tiêu chí tìm kiếm"]
     
+    def index_contractors(self, contractors: List[Dict]) -> int:
+        """
+        Add or update contractors in the registry
+        
+        Returns:
+            Registry size after indexing
+        """
+        self.registry.add(contractors)
+        return len(self.registry)
+    
+    def _candidate_rows(
+        self, 
+        registry: ContractorRegistry, 
+        project: Dict, 
+        radius_km: Optional[float]
+    ) -> np.ndarray:
+        """
+        Registry rows to score
+        
+        When the project has coordinates and a radius is given, only
+        contractors within the radius are kept (contractors without
+        coordinates are dropped). Otherwise every row is a candidate.
+        """
+        project_coords = get_coordinates(project)
+        if radius_km and project_coords:
+            return registry.within_radius(*project_coords, float(radius_km))
+        return np.arange(len(registry))
+    
+    def _project_window(self, project: Dict) -> Optional[Tuple[int, int]]:
+        """Project work window as (start_day, end_day), None if not given"""
+        start = project.get('start_date', project.get('startDate'))
+        end = project.get('end_date', project.get('endDate'))
+        if not start and not end:
+            return None
+        start_day = to_day(start or end)
+        end_day = to_day(end or start)
+        if end_day < start_day:
+            raise ValueError(f"Project window ends before it starts: {start} -> {end}")
+        return start_day, end_day
+    
     def match(
         self, 
         project: Dict, 
-        contractors: List[Dict],
-        limit: int = 10
+        contractors: Optional[List[Dict]] = None,
+        limit: int = 10,
+        radius_km: Optional[float] = None,
+        filters: Optional[Dict] = None,
+        explain: bool = True
     ) -> List[ContractorMatch]:
         """
         Find matching contractors for a project
@@ -306,10 +999,22 @@ class ContractorMatcher:
                 - requirements: List of requirements
                 - city: Project city
                 - district: Project district
+                - lat, lon: Optional project coordinates
+                - start_date, end_date: Optional work window; contractors
+                  with an overlapping booking are excluded
                 
-            contractors: List of contractor profiles
+            contractors: List of contractor profiles (None = use registry)
             limit: Maximum number of results
+            radius_km: Only score contractors within this distance
+                (requires project coordinates; 0 < radius_km <= MAX_RADIUS_KM)
+            filters: Hard constraints applied before text scoring
+                (see ContractorRegistry.filter_mask)
+            explain: Generate reasons for the returned matches
+                (False leaves reasons empty, for callers needing only ids/scores)
             
+        Raises:
+            ValueError: On an invalid radius or project window
+        
         Returns:
             List of ContractorMatch sorted by score
         """
@@ -320,24 +1025,37 @@ class ContractorMatcher:
             ' '.join(project.get('requirements', []))
         ])
         
-        results = []
+        if radius_km is None:
+            radius_km = project.get('radius_km', project.get('radiusKm'))
+        radius_km = parse_radius_km(radius_km)
         
-        for contractor in contractors:
-            # Prepare contractor text
-            skills = contractor.get('skills', [])
-            if isinstance(skills, str):
-                skills = [skills]
-            
-            contractor_text = ' '.join([
-                ' '.join(skills),
-                contractor.get('bio', ''),
-                contractor.get('specialties', '')
-            ])
-            
+        registry = self.registry if contractors is None else self._list_registry(contractors)
+        
+        # Cheap stages first: radius retrieval, hard filters, profile scores
+        rows = self._candidate_rows(registry, project, radius_km)
+        rows = rows[registry.filter_mask(rows, filters)]
+        window = self._project_window(project)
+        if window:
+            rows = rows[~registry.busy_mask(*window)[rows]]
+        profile_scores = self._calculate_profile_scores(registry.columns, rows)
+        location_scores = self._calculate_location_scores(registry.columns, rows, project)
+        
+        text_sims = None
+        if registry.text_index is not None:
+            text_sims = registry.text_index.similarities(project_text, rows).tolist()
+        
+        scored = []
+        
+        for i, (row, profile_score, location_score) in enumerate(
+            zip(rows.tolist(), profile_scores.tolist(), location_scores.tolist())
+        ):
             # Calculate scores
-            text_sim = self._calculate_text_similarity(project_text, contractor_text)
-            profile_score = self._calculate_profile_score(contractor)
-            location_score = self._calculate_location_score(contractor, project)
+            if text_sims is not None:
+                text_sim = text_sims[i]
+            else:
+                text_sim = self._calculate_text_similarity(
+                    project_text, get_contractor_text(registry.contractors[row])
+                )
             
             # Calculate final score
             final_score = (
@@ -346,32 +1064,46 @@ class ContractorMatcher:
                 self.WEIGHTS['location_score'] * location_score
             )
             
-            # Generate reasons
-            reasons = self._generate_reasons(text_sim, profile_score, location_score, contractor)
+            scored.append((round(final_score, 3), row, text_sim, profile_score, location_score))
+        
+        # Sort by score descending
+        scored.sort(key=lambda x: x[0], reverse=True)
+        
+        # Build results (and explanations) only for the returned top-k
+        results = []
+        for score, row, text_sim, profile_score, location_score in scored[:limit]:
+            contractor = registry.contractors[row]
+            
+            reasons = []
+            if explain:
+                reasons = self._generate_reasons(text_sim, profile_score, location_score, contractor)
             
             results.append(ContractorMatch(
                 contractor_id=contractor.get('id', contractor.get('contractor_id', '')),
                 display_name=contractor.get('display_name', contractor.get('displayName', 'Unknown')),
-                score=round(final_score, 3),
+                score=score,
                 text_similarity=round(text_sim, 3),
                 profile_score=round(profile_score, 3),
                 location_score=round(location_score, 3),
                 reasons=reasons
             ))
         
-        # Sort by score descending
-        results.sort(key=lambda x: x.score, reverse=True)
-        
-        return results[:limit]
+        return results
 
 
 # Flask Blueprint for integration
-def create_contractor_blueprint():
+def create_contractor_blueprint(text_mode: str = None):
     """Create Flask Blueprint for contractor matching"""
     from flask import Blueprint, request, jsonify
+    import os
     
     bp = Blueprint('contractors', __name__, url_prefix='/contractors')
-    matcher = ContractorMatcher()
+    
+    # Get text mode from environment if not provided
+    if not text_mode:
+        text_mode = os.environ.get('CONTRACTOR_TEXT_MODE', 'pairwise')
+    
+    matcher = ContractorMatcher(text_mode)
     
     @bp.route('/match', methods=['POST'])
     def match_contractors():
@@ -381,6 +1113,9 @@ def create_contractor_blueprint():
         project = data.get('project', {})
         contractors = data.get('contractors', [])
         limit = data.get('limit', 10)
+        radius_km = data.get('radiusKm')
+        filters = data.get('filters')
+        explain = data.get('explain', True)
         
         if not project:
             return jsonify({
@@ -388,19 +1123,26 @@ def create_contractor_blueprint():
                 "error": "Missing 'project' data"
             }), 400
         
-        if not contractors:
+        if not contractors and not len(matcher.registry):
             return jsonify({
                 "success": False,
                 "error": "Missing 'contractors' list"
             }), 400
         
-        results = matcher.match(project, contractors, limit)
+        # Fall back to the indexed registry when no list is sent
+        try:
+            results = matcher.match(project, contractors or None, limit, radius_km, filters, explain)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
         return jsonify({
             "success": True,
             "data": {
                 "projectTitle": project.get('title', ''),
-                "totalContractors": len(contractors),
+                "totalContractors": len(contractors) if contractors else len(matcher.registry),
                 "matchedCount": len(results),
                 "recommendations": [
                     {
@@ -410,13 +1152,82 @@ def create_contractor_blueprint():
                         "textSimilarity": r.text_similarity,
                         "profileScore": r.profile_score,
                         "locationScore": r.location_score,
-                        "reasons": r.reasons
+                        **({"reasons": r.reasons} if explain else {})
                     }
                     for r in results
                 ]
             }
         })
     
+    @bp.route('/index', methods=['POST'])
+    def index_contractors():
+        """Add or update contractors in the in-memory registry"""
+        data = request.get_json() or {}
+        contractors = data.get('contractors', [])
+        
+        if not contractors:
+            return jsonify({
+                "success": False,
+                "error": "Missing 'contractors' list"
+            }), 400
+        
+        try:
+            total = matcher.index_contractors(contractors)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        return jsonify({
+            "success": True,
+            "message": f"Indexed {len(contractors)} contractors",
+            "totalContractors": total
+        })
+    
+    @bp.route('/bookings', methods=['POST'])
+    def add_bookings():
+        """Add booked intervals to registered contractors"""
+        data = request.get_json() or {}
+        bookings = data.get('bookings', [])
+        
+        if not bookings:
+            return jsonify({
+                "success": False,
+                "error": "Missing 'bookings' list"
+            }), 400
+        
+        # Group by contractor: [{contractorId, start, end}, ...]
+        by_contractor = {}
+        for booking in bookings:
+            cid = booking.get('contractorId', booking.get('contractor_id'))
+            by_contractor.setdefault(cid, []).append(booking)
+        
+        unknown = [cid for cid in by_contractor if cid not in matcher.registry.positions]
+        if unknown:
+            return jsonify({
+                "success": False,
+                "error": f"Unknown contractors: {unknown}"
+            }), 404
+        
+        try:
+            # Validate every calendar before changing any of them
+            for items in by_contractor.values():
+                parse_bookings(items)
+            for cid, items in by_contractor.items():
+                matcher.registry.add_bookings(cid, items)
+        except ValueError as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        return jsonify({
+            "success": True,
+            "message": f"Added {len(bookings)} bookings",
+            "contractors": len(by_contractor)
+        })
+    
     # Legacy endpoint for compatibility
     @bp.route('/predict', methods=['POST'])
     def predict():
@@ -427,8 +1238,8 @@ def create_contractor_blueprint():
 
 
 # Alias for app.py compatibility
-def create_matching_blueprint():
-    return create_contractor_blueprint()
+def create_matching_blueprint(text_mode: str = None):
+    return create_contractor_blueprint(text_mode)
 
 
 if __name__ == "__main__":
@@ -495,3 +1306,25 @@ if __name__ == "__main__":
         print(f"   Text: {result.text_similarity:.0%} | Profile: {result.profile_score:.0%} | Location: {result.location_score:.0%}")
         print(f"   Reasons: {', '.join(result.reasons)}")
         print()
+    
+    print("=== Geo Radius Test (registry, 30km) ===\n")
+    coordinates = {"C001": (10.957, 106.843), "C002": (10.733, 106.722), "C003": (10.944, 106.876)}
+    for contractor in test_contractors:
+        contractor["lat"], contractor["lon"] = coordinates[contractor["id"]]
+    matcher.index_contractors(test_contractors)
+    
+    geo_project = {**test_project, "lat": 10.955, "lon": 106.844}
+    for result in matcher.match(geo_project, radius_km=30):
+        print(f"{result.display_name} (Score: {result.score:.0%}, Location: {result.location_score:.0%})")
+    
+    print("\n=== Hashing Text Mode Test ===\n")
+    hashing_matcher = ContractorMatcher(text_mode='hashing')
+    hashing_matcher.index_contractors(test_contractors)
+    for result in hashing_matcher.match(test_project):
+        print(f"{result.display_name} (Score: {result.score:.0%}, Text: {result.text_similarity:.0%})")
+    
+    print("\n=== Availability Test (C001 booked 2026-03-01 -> 2026-03-15) ===\n")
+    hashing_matcher.registry.add_bookings("C001", [{"start": "2026-03-01", "end": "2026-03-15"}])
+    window_project = {**test_project, "startDate": "2026-03-10", "endDate": "2026-04-10"}
+    for result in hashing_matcher.match(window_project):
+        print(f"{result.display_name} (Score: {result.score:.0%})")
@@ -5,14 +5,37 @@ Multi-factor price optimization for VLXD (Building Materials)
 
 API Endpoints:
     POST /pricing/recommend - Get price recommendation for a product
-    POST /pricing/batch-update - Batch price recommendations
+    POST /pricing/batch-update - Batch price recommendations (changedOnly: incremental)
+    POST /pricing/simulate - What-if demand/revenue/profit curves over a price grid
+    POST /pricing/optimize - Portfolio optimization with category margin targets
+    POST /pricing/competitors - Ingest scraped competitor price observations
+    GET /pricing/competitors/<product_id> - Time-decayed competitor price summary
+    GET /pricing/decisions - Logged batch recommendations by product/date range
 """
 
+import os
+import json
 import math
-from datetime import datetime
+import threading
+from datetime import date, datetime
 from typing import Dict, List, Optional
 from dataclasses import dataclass
 
+import numpy as np
+
+from competitor_prices import CompetitorPriceIndex
+from price_decision_log import PriceDecisionLog, to_records
+from service_clock import now, resolve_as_of
+
+# Upper bound on products × grid points per /pricing/simulate request
+MAX_SIMULATION_POINTS = 2_000_000
+
+# Upper bound on Monte Carlo samples per product (monteCarlo option)
+MAX_MONTE_CARLO_SAMPLES = 10_000
+
+# Artifact written by train_elasticity.py
+ELASTICITY_ARTIFACT_TYPE = 'elasticity'
+
 
 @dataclass
 class PriceRecommendation:
@@ -27,6 +50,134 @@ class PriceRecommendation:
     constraints: Dict
 
 
+class PriceBatchResult:
+    """
+    Array-backed sequence of price recommendations
+    
+    Holds the recommend_columns() arrays. Indexing/iterating builds
+    PriceRecommendation objects, with factor reasons, on demand only.
+    """
+    __slots__ = ('engine', 'columns', 'strategy', 'time_factor')
+    
+    def __init__(self, engine: 'DynamicPricingEngine', columns: Dict[str, np.ndarray], strategy: str, time_factor: tuple):
+        self.engine = engine
+        self.columns = columns
+        self.strategy = strategy
+        self.time_factor = time_factor
+    
+    def __len__(self) -> int:
+        return len(self.columns['recommended_price'])
+    
+    def factors(self, i: int) -> Dict:
+        """Factor multipliers with reasons for row i"""
+        c = self.columns
+        demand = self.engine._calculate_demand_factor(float(c['demand_index'][i]))
+        inventory = self.engine._calculate_inventory_factor(
+            float(c['current_stock'][i]), float(c['avg_daily_sales'][i])
+        )
+        competitor = self.engine._calculate_competitor_factor(
+            float(c['current_price'][i]), float(c['competitor_avg_price'][i]), self.strategy
+        )
+        return {
+            'demand': {'value': demand[0], 'reason': demand[1]},
+            'inventory': {'value': inventory[0], 'reason': inventory[1]},
+            'competitor': {'value': competitor[0], 'reason': competitor[1]},
+            'time': {'value': self.time_factor[0], 'reason': self.time_factor[1]},
+            'combined': float(c['combined'][i])
+        }
+    
+    def __getitem__(self, i: int) -> PriceRecommendation:
+        c = self.columns
+        return PriceRecommendation(
+            product_id=c['product_id'][i],
+            product_name=c['product_name'][i],
+            current_price=c['current_price'][i].item(),
+            recommended_price=int(c['recommended_price'][i]),
+            price_change_percent=float(c['price_change_percent'][i]),
+            factors=self.factors(i),
+            projections={
+                'expectedDemand': float(c['expected_demand'][i]),
+                'expectedRevenue': int(c['expected_revenue'][i]),
+                'expectedProfit': int(c['expected_profit'][i]),
+                'confidence': float(c['confidence'][i])
+            },
+            constraints={
+                'marginAchieved': float(c['margin_achieved'][i]),
+                'withinPriceBounds': bool(c['within_price_bounds'][i]),
+                'minPriceApplied': bool(c['min_price_applied'][i])
+            }
+        )
+    
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+
+class RepricingCache:
+    """
+    Last pricing inputs and recommended price per product
+    
+    Inputs are rows of a float matrix (NaN = not provided) indexed by a
+    product_id -> row dict, like the churn feature store, so a batch is
+    diffed against them with one vectorized comparison. A different
+    context (constraints, seasonality multiplier) marks every row changed.
+    """
+    
+    INPUT_FIELDS = (
+        'base_price', 'cost', 'demand_index', 'current_stock',
+        'avg_daily_sales', 'competitor_avg_price', 'elasticity'
+    )
+    
+    def __init__(self, initial_capacity: int = 1024):
+        self.positions = {}  # product_id -> row
+        self.inputs = np.full((initial_capacity, len(self.INPUT_FIELDS)), np.nan)
+        self.recommended = np.full(initial_capacity, -1, dtype=np.int64)
+        self.context = None
+        self._lock = threading.RLock()
+    
+    def __len__(self) -> int:
+        return len(self.positions)
+    
+    def _grow(self, needed: int):
+        capacity = len(self.recommended)
+        while capacity < needed:
+            capacity *= 2
+        if capacity > len(self.recommended):
+            grow = capacity - len(self.recommended)
+            self.inputs = np.vstack([self.inputs, np.full((grow, len(self.INPUT_FIELDS)), np.nan)])
+            self.recommended = np.concatenate([self.recommended, np.full(grow, -1, dtype=np.int64)])
+    
+    def changed(self, product_ids, inputs: np.ndarray, context) -> np.ndarray:
+        """Mask of products that are new or whose inputs differ from the stored row"""
+        with self._lock:
+            n = len(product_ids)
+            if context != self.context:
+                return np.ones(n, dtype=bool)
+            rows = np.array([self.positions.get(p, -1) for p in product_ids], dtype=np.int64)
+            known = rows >= 0
+            old, new = self.inputs[rows[known]], inputs[known]
+            same = (old == new) | (np.isnan(old) & np.isnan(new))
+            changed = ~known
+            changed[known] = ~same.all(axis=1)
+            return changed
+    
+    def update(self, product_ids, inputs: np.ndarray, recommended: np.ndarray, context) -> np.ndarray:
+        """Store inputs and results; returns the previous recommended prices (-1: none)"""
+        with self._lock:
+            rows = np.empty(len(product_ids), dtype=np.int64)
+            for i, product_id in enumerate(product_ids):
+                row = self.positions.get(product_id)
+                if row is None:
+                    row = self.positions[product_id] = len(self.positions)
+                rows[i] = row
+            self._grow(len(self.positions))
+            
+            previous = self.recommended[rows].copy()
+            self.inputs[rows] = inputs
+            self.recommended[rows] = recommended
+            self.context = context
+            return previous
+
+
 class DynamicPricingEngine:
     """
     Dynamic Pricing using multi-factor optimization
@@ -68,8 +219,83 @@ class DynamicPricingEngine:
         'default': 1.0
     }
     
-    def __init__(self):
-        self.today = datetime.now()
+    # Columnar lookup tables for the _calculate_*_factor ladders
+    # (same thresholds as the scalar code)
+    DEMAND_BINS = [0.5, 0.8, 1.2, 1.5]           # right-closed: index <= bin
+    DEMAND_MULTIPLIERS = [0.90, 0.95, 1.00, 1.08, 1.15]
+    
+    # Defaults used by recommend_price() for missing product fields
+    # (None: cost -> 70% of base price, competitor price -> base price)
+    PRODUCT_DEFAULTS = {
+        'product_id': 'unknown',
+        'product_name': 'Unknown Product',
+        'category': 'default',
+        'base_price': 0,
+        'cost': None,
+        'current_stock': 100,
+        'avg_daily_sales': 5,
+        'demand_index': 1.0,
+        'competitor_avg_price': None
+    }
+    TEXT_FIELDS = ('product_id', 'product_name', 'category')
+    
+    def __init__(
+        self,
+        elasticity_path: Optional[str] = None,
+        competitor_index: Optional[CompetitorPriceIndex] = None
+    ):
+        """
+        Args:
+            elasticity_path: Artifact from train_elasticity.py; fitted
+                category/product elasticities override ELASTICITY_BY_CATEGORY
+            competitor_index: Fills competitor_avg_price for products
+                that do not carry one
+        """
+        self.category_elasticity = dict(self.ELASTICITY_BY_CATEGORY)
+        self.product_elasticity = {}
+        self.product_elasticity_error = {}
+        self.elasticity_trained_at = None
+        self.competitor_index = competitor_index
+        self.repricing_cache = RepricingCache()
+        if elasticity_path:
+            self.load_elasticities(elasticity_path)
+    
+    def load_elasticities(self, path):
+        """
+        Load fitted elasticities
+        
+        Raises:
+            ValueError: If the file is not an elasticity artifact
+        """
+        with open(path, encoding='utf-8') as f:
+            artifact = json.load(f)
+        if not isinstance(artifact, dict) or artifact.get('type') != ELASTICITY_ARTIFACT_TYPE:
+            raise ValueError(f"Not an elasticity artifact: {path}")
+        
+        self.category_elasticity = {
+            **self.ELASTICITY_BY_CATEGORY,
+            **{c: float(fit['elasticity']) for c, fit in artifact.get('categories', {}).items()}
+        }
+        self.product_elasticity = {
+            str(pid): float(fit['elasticity']) for pid, fit in artifact.get('products', {}).items()
+        }
+        self.product_elasticity_error = {
+            str(pid): float(fit['standardError']) for pid, fit in artifact.get('products', {}).items()
+            if fit.get('standardError') is not None
+        }
+        self.elasticity_trained_at = artifact.get('trainedAt')
+    
+    def elasticity_for(self, product_id, category: str) -> float:
+        """Fitted product elasticity, else category, else 1.0"""
+        elasticity = self.product_elasticity.get(str(product_id))
+        if elasticity is None:
+            elasticity = self.category_elasticity.get(category, 1.0)
+        return elasticity
+    
+    @property
+    def today(self) -> datetime:
+        """Current reference time (shared cached clock)"""
+        return now()
     
     def _calculate_demand_factor(self, demand_index: float) -> tuple:
         """
@@ -229,7 +455,8 @@ class DynamicPricingEngine:
     def recommend_price(
         self, 
         product: Dict,
-        constraints: Dict = None
+        constraints: Dict = None,
+        as_of: datetime = None
     ) -> PriceRecommendation:
         """
         Get price recommendation for a product
@@ -245,11 +472,13 @@ class DynamicPricingEngine:
                 - avg_daily_sales: Average daily sales
                 - demand_index: current/avg demand ratio
                 - competitor_avg_price: Competitor average price
+                  (default: competitor index average, else base_price)
                 
             constraints: Optional constraints override
                 - min_margin: Minimum profit margin
                 - max_price_change: Max change from base
                 - competitor_match: Whether to match competitors
+            as_of: Reference date for seasonality (default: now)
                 
         Returns:
             PriceRecommendation with optimal price and analysis
@@ -257,6 +486,11 @@ class DynamicPricingEngine:
         # Merge constraints
         constraints = {**self.DEFAULT_CONSTRAINTS, **(constraints or {})}
         
+        if product.get('competitor_avg_price') is None and self.competitor_index is not None:
+            indexed = self.competitor_index.average(product.get('product_id'), as_of)
+            if indexed is not None:
+                product = {**product, 'competitor_avg_price': indexed}
+        
         product_id = product.get('product_id', 'unknown')
         product_name = product.get('product_name', 'Unknown Product')
         base_price = product.get('base_price', 0)
@@ -279,7 +513,7 @@ class DynamicPricingEngine:
             'MATCH' if constraints.get('competitor_match') else 'PREMIUM'
         )
         
-        time_multiplier, time_reason = self._calculate_time_factor()
+        time_multiplier, time_reason = self._calculate_time_factor(resolve_as_of(as_of))
         
         # Calculate combined multiplier
         combined_multiplier = (
@@ -314,7 +548,7 @@ class DynamicPricingEngine:
         margin_achieved = (final_price - cost) / final_price if final_price > 0 else 0
         
         # Projections (simplified)
-        elasticity = self.ELASTICITY_BY_CATEGORY.get(category, 1.0)
+        elasticity = self.elasticity_for(product_id, category)
         
         # Estimated demand change: ΔQ/Q = -ε × ΔP/P
         demand_change = -elasticity * price_change_pct
@@ -360,19 +594,443 @@ class DynamicPricingEngine:
     def batch_recommend(
         self, 
         products: List[Dict],
-        constraints: Dict = None
-    ) -> List[PriceRecommendation]:
-        """Get price recommendations for multiple products"""
-        return [self.recommend_price(p, constraints) for p in products]
+        constraints: Dict = None,
+        as_of: datetime = None
+    ) -> PriceBatchResult:
+        """
+        Get price recommendations for multiple products
+        
+        Scored in one recommend_columns() pass; the result behaves like a
+        list of PriceRecommendation (built, with reasons, on access).
+        """
+        constraints = {**self.DEFAULT_CONSTRAINTS, **(constraints or {})}
+        as_of = resolve_as_of(as_of)
+        return PriceBatchResult(
+            self,
+            self.recommend_columns(products, constraints, as_of),
+            'MATCH' if constraints.get('competitor_match') else 'PREMIUM',
+            self._calculate_time_factor(as_of)
+        )
+    
+    def recommend_changed(
+        self,
+        products: List[Dict],
+        constraints: Dict = None,
+        as_of: datetime = None
+    ) -> Dict:
+        """
+        Incremental batch_recommend(): reprice only products whose inputs moved
+        
+        Inputs (RepricingCache.INPUT_FIELDS, competitor price after the
+        index fill) are diffed against the previous call; only changed rows
+        go through recommend_columns(), and only those whose recommended
+        price differs from the stored one are returned.
+        
+        Returns:
+            result (PriceBatchResult of changed recommendations), index
+            (their positions in `products`), previous_price (-1: new
+            product), total and recomputed counts
+        """
+        constraints = {**self.DEFAULT_CONSTRAINTS, **(constraints or {})}
+        as_of = resolve_as_of(as_of)
+        time_factor = self._calculate_time_factor(as_of)
+        
+        columns = self.columns_from_records(products)
+        product_ids = columns['product_id'].astype(str)
+        columns['competitor_avg_price'] = self._indexed_competitor_prices(
+            product_ids, columns['competitor_avg_price'], as_of
+        )
+        inputs = np.column_stack(
+            [columns[field] for field in RepricingCache.INPUT_FIELDS[:-1]] +
+            [self.category_elasticities(columns['category'], product_ids)]
+        )
+        context = (json.dumps(constraints, sort_keys=True, default=str), time_factor[0])
+        
+        recompute = np.flatnonzero(self.repricing_cache.changed(product_ids.tolist(), inputs, context))
+        recomputed = self.recommend_columns(
+            {field: values[recompute] for field, values in columns.items()}, constraints, as_of
+        )
+        previous = self.repricing_cache.update(
+            product_ids[recompute].tolist(), inputs[recompute], recomputed['recommended_price'], context
+        )
+        
+        moved = np.flatnonzero(recomputed['recommended_price'] != previous)
+        return {
+            'result': PriceBatchResult(
+                self,
+                {field: values[moved] for field, values in recomputed.items()},
+                'MATCH' if constraints.get('competitor_match') else 'PREMIUM',
+                time_factor
+            ),
+            'index': recompute[moved],
+            'previous_price': previous[moved],
+            'total': len(products),
+            'recomputed': len(recompute)
+        }
+    
+    def category_elasticities(self, categories, product_ids=None) -> np.ndarray:
+        """Vectorized elasticity_for() over category (and product id) columns"""
+        names, codes = np.unique(np.asarray(categories, dtype=object).astype(str), return_inverse=True)
+        elasticity = np.array([self.category_elasticity.get(c, 1.0) for c in names])[codes.reshape(-1)]
+        if self.product_elasticity and product_ids is not None:
+            ids, codes = np.unique(np.asarray(product_ids, dtype=object).astype(str), return_inverse=True)
+            fitted = np.array([self.product_elasticity.get(i, np.nan) for i in ids])[codes.reshape(-1)]
+            elasticity = np.where(np.isnan(fitted), elasticity, fitted)
+        return elasticity
+    
+    def simulate_grid(
+        self,
+        products,
+        min_change: float = -0.25,
+        max_change: float = 0.25,
+        step: float = 0.01,
+        max_points: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        What-if curves over a grid of candidate prices
+        
+        Every product is evaluated at base_price × (1 + change) for each
+        change in [min_change, max_change] (inclusive, `step` apart) with
+        the recommend_price() projection: demand = avg_daily_sales ×
+        (1 - ε × change). One broadcast over (products × grid).
+        
+        Raises:
+            ValueError: On an empty or inverted range, a non-positive step,
+                or more than max_points products × grid points
+        
+        Returns:
+            changes (k,), product_id/current_price/min_price (n,) and
+            price/demand/revenue/profit (n, k)
+        """
+        if step <= 0 or min_change > max_change or min_change <= -1:
+            raise ValueError("Need -1 < minChange <= maxChange and step > 0")
+        
+        data = self.columns_from_records(products) if isinstance(products, list) else products
+        n = len(next(iter(data.values()))) if data else 0
+        
+        # Integer step count so ±25% in 1% steps is exactly 51 points, sized
+        # against max_points before anything that large is allocated
+        steps = (max_change - min_change) / step
+        count = int(math.floor(steps + 1e-9)) + 1 if math.isfinite(steps) else None
+        if count is None or (max_points is not None and n * count > max_points):
+            raise ValueError(f"Grid too large (max {max_points} product-price points)")
+        
+        def column(field, default):
+            values = np.asarray(data[field], dtype=np.float64) if field in data else np.full(n, np.nan)
+            return np.where(np.isnan(values), default, values)
+        
+        base = column('base_price', 0.0)
+        cost = column('cost', base * 0.7)
+        sales = column('avg_daily_sales', 5.0)
+        categories = data['category'] if 'category' in data else np.full(n, 'default', dtype=object)
+        product_ids = np.asarray(data['product_id'], dtype=object) if 'product_id' in data else np.full(n, 'unknown', dtype=object)
+        elasticity = self.category_elasticities(categories, product_ids)
+        
+        changes = min_change + step * np.arange(count)
+        changes = changes[changes <= max_change + step * 1e-9]
+        
+        price = base[:, None] * (1 + changes)
+        demand = sales[:, None] * (1 - elasticity[:, None] * changes)
+        return {
+            'changes': changes,
+            'product_id': product_ids,
+            'current_price': base,
+            'min_price': cost * (1 + self.DEFAULT_CONSTRAINTS['min_margin']),
+            'price': price,
+            'demand': demand,
+            'revenue': price * demand,
+            'profit': (price - cost[:, None]) * demand
+        }
+    
+    def project_uncertainty(
+        self,
+        columns: Dict[str, np.ndarray],
+        samples: int = 1000,
+        seed: Optional[int] = None,
+        demand_cv: float = 0.25,
+        elasticity_cv: float = 0.25,
+        percentiles=(5, 50, 95),
+        chunk_points: int = MAX_SIMULATION_POINTS
+    ) -> Dict[str, np.ndarray]:
+        """
+        Monte Carlo revenue/profit projections for recommend_columns() output
+        
+        Per (product, sample): base demand avg_daily_sales × lognormal noise
+        (mean 1, coefficient of variation demand_cv), elasticity ~
+        Normal(ε, σ) with σ the fitted standard error when the artifact has
+        one, else elasticity_cv × ε (clipped at 0). Demand at the
+        recommended price follows the recommend_price() projection. All
+        samples of a product chunk are one (products × samples) array;
+        chunks keep memory under chunk_points values per array.
+        
+        Args:
+            columns: recommend_columns() result
+            seed: RNG seed (same seed and inputs -> same percentiles)
+        
+        Raises:
+            ValueError: On samples outside 1..MAX_MONTE_CARLO_SAMPLES,
+                negative CVs or percentiles outside 0..100
+        
+        Returns:
+            percentiles (q,), demand/revenue/profit (n, q) and
+            revenue_mean/profit_mean (n,)
+        """
+        q = np.asarray(percentiles, dtype=np.float64)
+        if not 1 <= samples <= MAX_MONTE_CARLO_SAMPLES:
+            raise ValueError(f"samples must be between 1 and {MAX_MONTE_CARLO_SAMPLES}")
+        if demand_cv < 0 or elasticity_cv < 0 or q.size == 0 or q.min() < 0 or q.max() > 100:
+            raise ValueError("CVs must be >= 0 and percentiles within 0..100")
+        
+        price = columns['recommended_price'].astype(np.float64)
+        base = columns['current_price']
+        cost = columns['cost']
+        sales = columns['avg_daily_sales']
+        elasticity = columns['elasticity']
+        change = np.where(base > 0, (price - base) / np.where(base > 0, base, 1), 0.0)
+        fitted_error = np.array([self.product_elasticity_error.get(str(p), np.nan) for p in columns['product_id']])
+        elasticity_sd = np.where(np.isnan(fitted_error), elasticity_cv * elasticity, fitted_error)
+        
+        # Lognormal with mean 1 and the requested coefficient of variation
+        sigma = math.sqrt(math.log1p(demand_cv ** 2))
+        
+        n = len(price)
+        rng = np.random.default_rng(seed)
+        result = {
+            'percentiles': q,
+            'demand': np.empty((n, q.size)),
+            'revenue': np.empty((n, q.size)),
+            'profit': np.empty((n, q.size)),
+            'revenue_mean': np.empty(n),
+            'profit_mean': np.empty(n)
+        }
+        step = max(1, chunk_points // samples)
+        for start in range(0, n, step):
+            rows = slice(start, min(start + step, n))
+            size = rows.stop - rows.start
+            
+            sampled_elasticity = elasticity[rows, None] + elasticity_sd[rows, None] * rng.standard_normal((size, samples))
+            np.maximum(sampled_elasticity, 0, out=sampled_elasticity)
+            demand = np.exp(sigma * rng.standard_normal((size, samples)) - sigma * sigma / 2)
+            demand *= sales[rows, None]
+            demand *= np.maximum(1 - sampled_elasticity * change[rows, None], 0)
+            
+            revenue = demand * price[rows, None]
+            profit = demand * (price - cost)[rows, None]
+            result['demand'][rows] = np.percentile(demand, q, axis=1).T
+            result['revenue'][rows] = np.percentile(revenue, q, axis=1).T
+            result['profit'][rows] = np.percentile(profit, q, axis=1).T
+            result['revenue_mean'][rows] = revenue.mean(axis=1)
+            result['profit_mean'][rows] = profit.mean(axis=1)
+        
+        return result
+    
+    def columns_from_records(self, products: List[Dict]) -> Dict[str, np.ndarray]:
+        """Turn product dicts into columns (numeric: NaN where missing/None)"""
+        columns = {}
+        for field, default in self.PRODUCT_DEFAULTS.items():
+            values = [p.get(field) for p in products]
+            if field in self.TEXT_FIELDS:
+                columns[field] = np.array([default if v is None else v for v in values], dtype=object)
+            else:
+                columns[field] = np.array([np.nan if v is None else v for v in values], dtype=np.float64)
+        return columns
+    
+    def _indexed_competitor_prices(self, product_ids, competitor_prices: np.ndarray, as_of) -> np.ndarray:
+        """Fill missing (NaN) competitor prices from the competitor index"""
+        if self.competitor_index is None or not np.isnan(competitor_prices).any():
+            return competitor_prices
+        indexed = self.competitor_index.averages(np.asarray(product_ids).tolist(), as_of)
+        return np.where(np.isnan(competitor_prices), indexed, competitor_prices)
+    
+    def recommend_columns(
+        self,
+        data,
+        constraints: Dict = None,
+        as_of: datetime = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Catalog-wide repricing in one vectorized pass
+        
+        Every factor is computed with np.digitize/np.select over the same
+        thresholds as the scalar code, so prices, projections and flags are
+        identical to recommend_price(). No reason strings are built; see
+        PriceBatchResult.factors() for those.
+        
+        Args:
+            data: List of product dicts, DataFrame or dict of columns keyed
+                like recommend_price()'s product
+            constraints: Optional constraints override
+            as_of: Reference date for seasonality (default: now)
+        
+        Returns:
+            Dictionary of arrays: product_id, product_name, current_price,
+            recommended_price, price_change_percent, the factor multipliers,
+            projections and constraint flags
+        """
+        constraints = {**self.DEFAULT_CONSTRAINTS, **(constraints or {})}
+        if isinstance(data, list):
+            data = self.columns_from_records(data)
+        elif hasattr(data, 'to_dict') and hasattr(data, 'columns'):
+            data = {c: data[c].to_numpy() for c in data.columns}
+        
+        n = len(next(iter(data.values()))) if data else 0
+        
+        def column(field):
+            if field not in data:
+                return np.full(n, np.nan)
+            return np.asarray(data[field], dtype=np.float64)
+        
+        def provided(values):
+            # recommend_price() counts a field only if present and truthy
+            return ~np.isnan(values) & (values != 0)
+        
+        def filled(values, default):
+            return np.where(np.isnan(values), default, values)
+        
+        def text(field):
+            if field not in data:
+                return np.full(n, self.PRODUCT_DEFAULTS[field], dtype=object)
+            return np.asarray(data[field], dtype=object)
+        
+        raw_demand = column('demand_index')
+        raw_stock = column('current_stock')
+        raw_sales = column('avg_daily_sales')
+        raw_competitor = self._indexed_competitor_prices(
+            text('product_id'), column('competitor_avg_price'), as_of
+        )
+        
+        base_price = filled(column('base_price'), 0.0)
+        cost = filled(column('cost'), base_price * 0.7)
+        demand_index = filled(raw_demand, 1.0)
+        current_stock = filled(raw_stock, 100.0)
+        avg_daily_sales = filled(raw_sales, 5.0)
+        competitor_price = filled(raw_competitor, base_price)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            # Demand
+            demand = np.take(self.DEMAND_MULTIPLIERS, np.digitize(demand_index, self.DEMAND_BINS, right=True))
+            
+            # Inventory (days of stock; 999 without sales)
+            days = np.where(avg_daily_sales > 0, current_stock / avg_daily_sales, 999.0)
+            inventory = np.select([days < 7, days > 60, days > 45], [1.10, 0.92, 0.96], 1.00)
+            
+            # Competitor
+            target = 1.00 if constraints.get('competitor_match') else 1.10
+            adjustment = np.clip(target / (base_price / competitor_price), 0.85, 1.15)
+            competitor = np.where(competitor_price <= 0, 1.00, adjustment)
+            
+            time_multiplier = self._calculate_time_factor(resolve_as_of(as_of))[0]
+            combined = demand * inventory * competitor * time_multiplier
+            optimal_price = base_price * combined
+            
+            # Constraints
+            min_price = cost * (1 + constraints.get('min_margin', 0.15))
+            max_change = constraints.get('max_price_change', 0.25)
+            max_price = base_price * (1 + max_change)
+            min_price_by_change = base_price * (1 - max_change)
+            
+            final_price = np.maximum(min_price, np.minimum(optimal_price, max_price))
+            final_price = np.maximum(final_price, min_price_by_change)
+            final_price = np.round(final_price / 1000) * 1000
+            
+            price_change = np.where(base_price > 0, (final_price - base_price) / base_price, 0.0)
+            margin = np.where(final_price > 0, (final_price - cost) / final_price, 0.0)
+        
+        # Projections
+        elasticity = self.category_elasticities(text('category'), text('product_id'))
+        expected_demand = avg_daily_sales * (1 + -elasticity * price_change)
+        
+        data_points = (
+            provided(raw_demand).astype(int) + provided(raw_stock) +
+            provided(raw_competitor) + provided(raw_sales)
+        )
+        
+        # Python round() (not np.round) to match recommend_price() to the last digit
+        def rounded(values, digits):
+            return np.array([round(v, digits) for v in values.tolist()])
+        
+        return {
+            'product_id': text('product_id'),
+            'product_name': text('product_name'),
+            'current_price': base_price,
+            'cost': cost,
+            'recommended_price': final_price.astype(np.int64),
+            'price_change_percent': rounded(price_change * 100, 1),
+            'demand_index': demand_index,
+            'current_stock': current_stock,
+            'avg_daily_sales': avg_daily_sales,
+            'competitor_avg_price': competitor_price,
+            'demand': demand,
+            'inventory': inventory,
+            'competitor': competitor,
+            'combined': rounded(combined, 3),
+            'elasticity': elasticity,
+            'expected_demand': rounded(expected_demand, 1),
+            'expected_revenue': np.round(final_price * expected_demand),
+            'expected_profit': np.round((final_price - cost) * expected_demand),
+            'confidence': rounded(0.5 + data_points * 0.1, 2),
+            'margin_achieved': rounded(margin, 3),
+            'within_price_bounds': (min_price_by_change <= final_price) & (final_price <= max_price),
+            'min_price_applied': final_price == min_price
+        }
 
 
 # Flask Blueprint for integration
 def create_pricing_blueprint():
-    """Create Flask Blueprint for dynamic pricing"""
+    """
+    Create Flask Blueprint for dynamic pricing
+    
+    Fitted elasticities are loaded from PRICING_ELASTICITY_PATH when set;
+    competitor observations persist to COMPETITOR_PRICES_LOG when set.
+    Batch recommendations are logged under PRICING_DECISION_LOG_DIR
+    (default: ./decision_log).
+    """
     from flask import Blueprint, request, jsonify
     
     bp = Blueprint('pricing', __name__, url_prefix='/pricing')
-    engine = DynamicPricingEngine()
+    competitors = CompetitorPriceIndex(log_path=os.environ.get('COMPETITOR_PRICES_LOG') or None)
+    engine = DynamicPricingEngine(competitor_index=competitors)
+    decisions = PriceDecisionLog(os.environ.get('PRICING_DECISION_LOG_DIR') or None)
+    elasticity_path = os.environ.get('PRICING_ELASTICITY_PATH')
+    if elasticity_path:
+        try:
+            engine.load_elasticities(elasticity_path)
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            print(f"⚠️ Elasticities not loaded ({e}). Using category defaults.")
+    
+    def monte_carlo_options(data):
+        """project_uncertainty() kwargs from a monteCarlo body field (true or object), or None"""
+        options = data.get('monteCarlo')
+        if not options:
+            return None
+        options = options if isinstance(options, dict) else {}
+        return {
+            'samples': int(options.get('samples', 1000)),
+            'seed': None if options.get('seed') is None else int(options['seed']),
+            'demand_cv': float(options.get('demandCv', 0.25)),
+            'elasticity_cv': float(options.get('elasticityCv', 0.25)),
+            'percentiles': [float(v) for v in options.get('percentiles', [5, 50, 95])]
+        }
+    
+    def uncertainty_rows(projection):
+        """Per-product {demand, revenue, profit: {pXX: value}, means} dicts"""
+        labels = [f"p{v:g}" for v in projection['percentiles'].tolist()]
+        demand = np.round(projection['demand'], 1).tolist()
+        revenue = np.round(projection['revenue']).astype(np.int64).tolist()
+        profit = np.round(projection['profit']).astype(np.int64).tolist()
+        return [
+            {
+                "demand": dict(zip(labels, d)),
+                "revenue": dict(zip(labels, r)),
+                "profit": dict(zip(labels, p)),
+                "meanRevenue": round(mr),
+                "meanProfit": round(mp)
+            }
+            for d, r, p, mr, mp in zip(
+                demand, revenue, profit,
+                projection['revenue_mean'].tolist(), projection['profit_mean'].tolist()
+            )
+        ]
     
     @bp.route('/recommend', methods=['POST'])
     def recommend():
@@ -395,25 +1053,53 @@ def create_pricing_blueprint():
             'current_stock': data.get('currentStock') or data.get('current_stock', 100),
             'avg_daily_sales': data.get('avgDailySales') or data.get('avg_daily_sales', 5),
             'demand_index': data.get('demandIndex') or data.get('demand_index', 1.0),
-            'competitor_avg_price': data.get('competitorPrice') or data.get('competitor_avg_price', 0)
+            'competitor_avg_price': data.get('competitorPrice') or data.get('competitor_avg_price')
         }
         
         constraints = data.get('constraints', {})
         
-        result = engine.recommend_price(product, constraints)
+        try:
+            as_of = resolve_as_of(data.get('asOf'))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid asOf date"
+            }), 400
+        
+        if product['competitor_avg_price'] is None:
+            product['competitor_avg_price'] = competitors.average(product['product_id'], as_of) or 0
+        
+        try:
+            monte_carlo = monte_carlo_options(data)
+            result = engine.recommend_price(product, constraints, as_of)
+            uncertainty = None
+            if monte_carlo:
+                projection = engine.project_uncertainty(
+                    engine.recommend_columns([product], constraints, as_of), **monte_carlo
+                )
+                uncertainty = uncertainty_rows(projection)[0]
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        response = {
+            "productId": result.product_id,
+            "productName": result.product_name,
+            "currentPrice": result.current_price,
+            "recommendedPrice": result.recommended_price,
+            "priceChange": f"{result.price_change_percent:+.1f}%",
+            "factors": result.factors,
+            "projections": result.projections,
+            "constraints": result.constraints
+        }
+        if uncertainty is not None:
+            response["uncertainty"] = uncertainty
         
         return jsonify({
             "success": True,
-            "data": {
-                "productId": result.product_id,
-                "productName": result.product_name,
-                "currentPrice": result.current_price,
-                "recommendedPrice": result.recommended_price,
-                "priceChange": f"{result.price_change_percent:+.1f}%",
-                "factors": result.factors,
-                "projections": result.projections,
-                "constraints": result.constraints
-            }
+            "data": response
         })
     
     @bp.route('/batch-update', methods=['POST'])
@@ -429,27 +1115,319 @@ def create_pricing_blueprint():
                 "error": "Missing products array"
             }), 400
         
-        results = engine.batch_recommend(products, constraints)
+        try:
+            as_of = resolve_as_of(data.get('asOf'))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid asOf date"
+            }), 400
+        
+        if data.get('changedOnly'):
+            # Only products whose inputs moved since the last changedOnly
+            # batch are repriced; only changed prices are returned
+            incremental = engine.recommend_changed(products, constraints, as_of)
+            results, positions = incremental['result'], incremental['index'].tolist()
+        else:
+            results, positions = engine.batch_recommend(products, constraints, as_of), range(len(products))
+        columns = results.columns
+        change = columns['price_change_percent']
+        # Queued only; written to the decision log by a background thread
+        decisions.append(columns, as_of, results.time_factor[0])
+        
+        recommendations = [
+            {
+                "productId": product_id,
+                "currentPrice": current,
+                "recommendedPrice": recommended,
+                "priceChange": f"{pct:+.1f}%",
+                "confidence": confidence
+            }
+            for product_id, current, recommended, pct, confidence in zip(
+                columns['product_id'].tolist(),
+                [products[i].get('base_price', 0) for i in positions],
+                columns['recommended_price'].tolist(),
+                change.tolist(),
+                columns['confidence'].tolist()
+            )
+        ]
+        if data.get('includeReasons'):
+            # Reason strings are only formatted when asked for
+            for i, recommendation in enumerate(recommendations):
+                recommendation["factors"] = results.factors(i)
+        try:
+            monte_carlo = monte_carlo_options(data)
+            if monte_carlo:
+                projection = engine.project_uncertainty(columns, **monte_carlo)
+                for recommendation, uncertainty in zip(recommendations, uncertainty_rows(projection)):
+                    recommendation["uncertainty"] = uncertainty
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        summary = {
+            "total": len(results),
+            "increases": int(np.count_nonzero(change > 0)),
+            "decreases": int(np.count_nonzero(change < 0)),
+            "unchanged": int(np.count_nonzero(change == 0))
+        }
+        if data.get('changedOnly'):
+            for recommendation, previous in zip(recommendations, incremental['previous_price'].tolist()):
+                recommendation["previousRecommendedPrice"] = previous if previous >= 0 else None
+            summary = {
+                **summary,
+                "total": incremental['total'],
+                "recomputed": incremental['recomputed'],
+                "changed": len(results)
+            }
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "recommendations": recommendations,
+                "summary": summary
+            }
+        })
+    
+    @bp.route('/simulate', methods=['POST'])
+    def simulate():
+        """Demand/revenue/profit curves over a grid of candidate prices"""
+        data = request.get_json() or {}
+        products = data.get('products') or ([data] if data.get('product_id') or data.get('productId') else [])
+        
+        if not products:
+            return jsonify({
+                "success": False,
+                "error": "Missing products array"
+            }), 400
+        
+        products = [
+            {
+                'product_id': p.get('productId') or p.get('product_id'),
+                'base_price': p.get('basePrice') or p.get('base_price') or p.get('currentPrice', 0),
+                'cost': p.get('cost'),
+                'category': p.get('category', 'default'),
+                'avg_daily_sales': p.get('avgDailySales') or p.get('avg_daily_sales')
+            }
+            for p in products
+        ]
+        
+        try:
+            grid = engine.simulate_grid(
+                products,
+                float(data.get('minChange', -0.25)),
+                float(data.get('maxChange', 0.25)),
+                float(data.get('step', 0.01)),
+                MAX_SIMULATION_POINTS
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
         
+        revenue, profit = grid['revenue'], grid['profit']
+        best_revenue = revenue.argmax(axis=1)
+        best_profit = profit.argmax(axis=1)
+        changes = grid['changes']
         return jsonify({
             "success": True,
             "data": {
-                "recommendations": [
+                "changes": np.round(changes * 100, 2).tolist(),
+                "products": [
                     {
-                        "productId": r.product_id,
-                        "currentPrice": r.current_price,
-                        "recommendedPrice": r.recommended_price,
-                        "priceChange": f"{r.price_change_percent:+.1f}%",
-                        "confidence": r.projections['confidence']
+                        "productId": product_id,
+                        "currentPrice": current,
+                        "minPrice": min_price,
+                        "prices": prices,
+                        "demand": demand,
+                        "revenue": rev,
+                        "profit": prof,
+                        "bestRevenueChange": round(float(changes[r]) * 100, 2),
+                        "bestProfitChange": round(float(changes[p]) * 100, 2)
                     }
-                    for r in results
+                    for product_id, current, min_price, prices, demand, rev, prof, r, p in zip(
+                        grid['product_id'].tolist(),
+                        grid['current_price'].tolist(),
+                        np.round(grid['min_price']).tolist(),
+                        np.round(grid['price']).tolist(),
+                        np.round(grid['demand'], 2).tolist(),
+                        np.round(revenue).tolist(),
+                        np.round(profit).tolist(),
+                        best_revenue.tolist(),
+                        best_profit.tolist()
+                    )
+                ]
+            }
+        })
+    
+    @bp.route('/optimize', methods=['POST'])
+    def optimize():
+        """Portfolio price optimization with category margin targets"""
+        from portfolio_optimizer import PortfolioOptimizer
+        
+        data = request.get_json() or {}
+        products = data.get('products', [])
+        
+        if not products:
+            return jsonify({
+                "success": False,
+                "error": "Missing products array"
+            }), 400
+        
+        try:
+            result = PortfolioOptimizer(engine).optimize(
+                products,
+                objective=data.get('objective', 'revenue'),
+                category_min_margin=data.get('categoryMinMargin'),
+                min_revenue=data.get('minRevenue'),
+                constraints=data.get('constraints')
+            )
+        except (TypeError, ValueError) as e:
+            return jsonify({
+                "success": False,
+                "error": str(e)
+            }), 400
+        
+        columns = result['products']
+        totals = result['totals']
+        return jsonify({
+            "success": True,
+            "data": {
+                "objective": result['objective'],
+                "prices": [
+                    {
+                        "productId": product_id,
+                        "currentPrice": current,
+                        "optimalPrice": price,
+                        "priceChange": f"{change:+.1f}%",
+                        "expectedDemand": demand,
+                        "atBound": at_bound
+                    }
+                    for product_id, current, price, change, demand, at_bound in zip(
+                        columns['product_id'].tolist(),
+                        columns['current_price'].tolist(),
+                        columns['optimal_price'].tolist(),
+                        columns['price_change_percent'].tolist(),
+                        columns['expected_demand'].tolist(),
+                        columns['at_bound'].tolist()
+                    )
                 ],
-                "summary": {
-                    "total": len(results),
-                    "increases": sum(1 for r in results if r.price_change_percent > 0),
-                    "decreases": sum(1 for r in results if r.price_change_percent < 0),
-                    "unchanged": sum(1 for r in results if r.price_change_percent == 0)
-                }
+                "categories": [
+                    {
+                        "category": c['category'],
+                        "products": c['products'],
+                        "minMargin": c['min_margin'],
+                        "margin": c['margin'],
+                        "baselineMargin": c['baseline_margin'],
+                        "revenue": c['revenue'],
+                        "baselineRevenue": c['baseline_revenue'],
+                        "profit": c['profit'],
+                        "baselineProfit": c['baseline_profit'],
+                        "binding": c['binding'],
+                        "feasible": c['feasible']
+                    }
+                    for c in result['categories']
+                ],
+                "totals": {
+                    "revenue": totals['revenue'],
+                    "baselineRevenue": totals['baseline_revenue'],
+                    "profit": totals['profit'],
+                    "baselineProfit": totals['baseline_profit'],
+                    "minRevenue": totals['min_revenue'],
+                    "revenueFeasible": totals['revenue_feasible']
+                },
+                "iterations": result['iterations'],
+                "seconds": result['seconds']
+            }
+        })
+    
+    @bp.route('/competitors', methods=['POST'])
+    def ingest_competitor_prices():
+        """Ingest competitor prices (JSON {"observations": [...]} or an NDJSON stream)"""
+        if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+            # Malformed lines are counted as invalid, not a 500 halfway through
+            stats = competitors.ingest_ndjson(request.stream)
+            if not any(stats.values()):
+                return jsonify({
+                    "success": False,
+                    "error": "Missing observations"
+                }), 400
+        else:
+            data = request.get_json() or {}
+            observations = data if isinstance(data, list) else data.get('observations', [])
+            if not observations:
+                return jsonify({
+                    "success": False,
+                    "error": "Missing observations array"
+                }), 400
+            stats = competitors.ingest(observations)
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "ingested": stats['ingested'],
+                "dropped": stats['dropped'],
+                "invalid": stats['invalid'],
+                "evicted": competitors.evict_stale(),
+                "products": len(competitors)
+            }
+        })
+    
+    @bp.route('/competitors/<product_id>', methods=['GET'])
+    def get_competitor_prices(product_id):
+        """Time-decayed competitor price summary for one product"""
+        try:
+            as_of = resolve_as_of(request.args.get('asOf'))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid asOf date"
+            }), 400
+        
+        summary = competitors.get(product_id, as_of)
+        if summary is None:
+            return jsonify({
+                "success": False,
+                "error": f"No recent competitor prices for {product_id}"
+            }), 404
+        
+        return jsonify({
+            "success": True,
+            "data": {
+                "productId": product_id,
+                "averagePrice": round(summary['average'], 2),
+                "minPrice": summary['min'],
+                "maxPrice": summary['max'],
+                "observations": summary['observations'],
+                "lastObservedAt": date.fromordinal(summary['lastObservedDay']).isoformat(),
+                "halfLifeDays": competitors.half_life,
+                "maxAgeDays": competitors.window
+            }
+        })
+    
+    @bp.route('/decisions', methods=['GET'])
+    def get_decisions():
+        """Logged batch recommendations, newest first"""
+        product_ids = [p for p in request.args.get('productId', '').split(',') if p] or None
+        try:
+            start = resolve_as_of(request.args['from']) if request.args.get('from') else None
+            end = resolve_as_of(request.args['to']) if request.args.get('to') else None
+            limit = int(request.args.get('limit', 100))
+        except ValueError:
+            return jsonify({
+                "success": False,
+                "error": "Invalid from/to date or limit"
+            }), 400
+        
+        result = decisions.query(product_ids, start, end, limit=limit)
+        return jsonify({
+            "success": True,
+            "data": {
+                "decisions": to_records(result),
+                "segments": len(decisions.manifest())
             }
         })
     
@@ -459,7 +1437,9 @@ def create_pricing_blueprint():
         return jsonify({
             "success": True,
             "data": {
-                "elasticityByCategory": DynamicPricingEngine.ELASTICITY_BY_CATEGORY,
+                "elasticityByCategory": engine.category_elasticity,
+                "productsEstimated": len(engine.product_elasticity),
+                "trainedAt": engine.elasticity_trained_at,
                 "interpretation": {
                     "< 1.0": "Inelastic - increase price to increase revenue",
                     "= 1.0": "Unit elastic - revenue unchanged with price change",
@@ -0,0 +1,347 @@
+#!/usr/bin/env python3
+"""
+Portfolio Price Optimization
+Category-constrained revenue/profit maximization over a whole catalog
+
+Demand follows the DynamicPricingEngine projection model:
+
+    q_i(p) = q0_i × (1 - ε_i × (p - p0_i) / p0_i) = a_i - b_i × p
+
+with ε from the engine (fitted artifact or ELASTICITY_BY_CATEGORY). Revenue p×q and profit (p - c)×q are
+concave quadratics in p, and so is each product's margin surplus
+((1 - m_c)×p - c)×q, so "revenue-weighted margin of category c ≥ m_c" is a
+convex constraint. The Lagrangian is separable: for fixed multipliers each
+product's optimum is a closed-form root clipped to its price bounds, and the
+multipliers (one per constrained category, plus one for an optional
+portfolio revenue floor) are found by vectorized bisection on the dual.
+
+Usage:
+    python portfolio_optimizer.py --synthetic 5000 --objective profit --margin xi_mang=0.18
+"""
+
+import time
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from dynamic_pricing import DynamicPricingEngine
+
+# Multipliers above this mean the constraint cannot be met within bounds
+MAX_MULTIPLIER = 1e6
+
+
+class PortfolioOptimizer:
+    """Lagrangian price optimizer over DynamicPricingEngine products"""
+    
+    OBJECTIVES = ('revenue', 'profit')
+    
+    def __init__(self, engine: Optional[DynamicPricingEngine] = None, tolerance: float = 1e-7, max_iter: int = 60):
+        self.engine = engine or DynamicPricingEngine()
+        self.tolerance = tolerance
+        self.max_iter = max_iter
+    
+    def _inputs(self, products, constraints: Dict) -> Dict[str, np.ndarray]:
+        """Demand line, bounds and category codes for every product"""
+        engine = self.engine
+        data = engine.columns_from_records(products) if isinstance(products, list) else products
+        n = len(next(iter(data.values()))) if data else 0
+        
+        def column(field, default):
+            if field not in data:
+                return np.broadcast_to(np.asarray(default, dtype=np.float64), (n,)).copy()
+            values = np.asarray(data[field], dtype=np.float64)
+            return np.where(np.isnan(values), default, values)
+        
+        def text(field):
+            if field not in data:
+                return np.full(n, engine.PRODUCT_DEFAULTS[field], dtype=object)
+            return np.asarray(data[field], dtype=object)
+        
+        # Missing fields -> recommend_price() defaults
+        base = column('base_price', 0.0)
+        cost = column('cost', base * 0.7)
+        q0 = column('avg_daily_sales', 5.0)
+        
+        categories, codes = np.unique(text('category').astype(str), return_inverse=True)
+        elasticity = engine.category_elasticities(text('category'), text('product_id'))
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            a = q0 * (1 + elasticity)
+            b = np.where(base > 0, q0 * elasticity / base, 0.0)
+            
+            # Same bounds as recommend_price(); the margin floor wins over
+            # the change cap, and demand must stay non-negative
+            max_change = constraints['max_price_change']
+            lower = np.maximum(cost * (1 + constraints['min_margin']), base * (1 - max_change))
+            upper = np.minimum(base * (1 + max_change), np.where(b > 0, a / b, np.inf))
+            upper = np.maximum(upper, lower)
+        
+        return {
+            'product_id': text('product_id'),
+            'base': base,
+            'cost': cost,
+            'q0': q0,
+            'a': a,
+            'b': b,
+            'lower': lower,
+            'upper': upper,
+            'categories': categories,
+            'codes': codes.reshape(-1)
+        }
+    
+    def _prices(self, x: Dict, objective: str, margin: np.ndarray, lam: np.ndarray, mu: float) -> np.ndarray:
+        """
+        Maximizer of f + λ×g + μ×r per product, clipped to bounds
+        
+        f' = a - 2bp (+ bc for profit), g' = (1 - m)(a - 2bp) + bc,
+        r' = a - 2bp; all linear in p, so the root is closed-form.
+        """
+        a, b, c = x['a'], x['b'], x['cost']
+        m = margin[x['codes']]
+        l = lam[x['codes']]
+        
+        numerator = a + l * ((1 - m) * a + b * c) + mu * a
+        if objective == 'profit':
+            numerator = numerator + b * c
+        denominator = 2 * b * (1 + l * (1 - m) + mu)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            p = np.where(b > 0, numerator / denominator, x['upper'])
+        return np.clip(p, x['lower'], x['upper'])
+    
+    def _surplus(self, x: Dict, p: np.ndarray, margin: np.ndarray) -> np.ndarray:
+        """Per-category Σ((1 - m)p - c)q: ≥ 0 iff the category margin target holds"""
+        q = x['a'] - x['b'] * p
+        m = margin[x['codes']]
+        return np.bincount(x['codes'], weights=((1 - m) * p - x['cost']) * q, minlength=len(margin))
+    
+    def _solve_categories(self, x: Dict, objective: str, margin: np.ndarray, targeted: np.ndarray, mu: float):
+        """Smallest λ per targeted category whose margin constraint holds (vectorized bisection)"""
+        n_cat = len(margin)
+        zero = np.zeros(n_cat)
+        iterations = 0
+        
+        surplus = self._surplus(x, self._prices(x, objective, margin, zero, mu), margin)
+        active = targeted & (surplus < 0)
+        if not active.any():
+            return zero, np.ones(n_cat, dtype=bool), iterations
+        
+        lo = np.zeros(n_cat)
+        hi = np.where(active, 1.0, 0.0)
+        
+        # Grow the bracket until every active category is feasible at hi
+        while True:
+            surplus = self._surplus(x, self._prices(x, objective, margin, hi, mu), margin)
+            growing = active & (surplus < 0) & (hi < MAX_MULTIPLIER)
+            if not growing.any():
+                break
+            lo = np.where(growing, hi, lo)
+            hi = np.where(growing, hi * 4, hi)
+            iterations += 1
+        feasible = ~(active & (surplus < 0))
+        
+        bracket = active & feasible
+        for _ in range(self.max_iter):
+            if not bracket.any() or np.max((hi - lo)[bracket] / (1 + hi[bracket])) < self.tolerance:
+                break
+            mid = np.where(bracket, (lo + hi) / 2, hi)
+            ok = self._surplus(x, self._prices(x, objective, margin, mid, mu), margin) >= 0
+            hi = np.where(bracket & ok, mid, hi)
+            lo = np.where(bracket & ~ok, mid, lo)
+            iterations += 1
+        
+        return hi, feasible, iterations
+    
+    def optimize(
+        self,
+        products,
+        objective: str = 'revenue',
+        category_min_margin: Optional[Dict[str, float]] = None,
+        min_revenue: Optional[float] = None,
+        constraints: Optional[Dict] = None
+    ) -> Dict:
+        """
+        Optimize prices for a catalog
+        
+        Args:
+            products: List of product dicts (as for recommend_price()) or a
+                dict of columns
+            objective: 'revenue' or 'profit' (expected per day)
+            category_min_margin: Minimum revenue-weighted margin per
+                category, e.g. {'xi_mang': 0.18}
+            min_revenue: Optional floor on total expected daily revenue
+            constraints: Per-product bounds (min_margin, max_price_change;
+                defaults as DynamicPricingEngine.DEFAULT_CONSTRAINTS)
+        
+        Raises:
+            ValueError: On an unknown objective or margin outside [0, 1)
+        
+        Returns:
+            Per-product prices/projections, per-category summary and totals
+        """
+        if objective not in self.OBJECTIVES:
+            raise ValueError(f"objective must be one of {', '.join(self.OBJECTIVES)}")
+        category_min_margin = category_min_margin or {}
+        if any(not 0 <= m < 1 for m in category_min_margin.values()):
+            raise ValueError("Category margins must be in [0, 1)")
+        
+        start = time.perf_counter()
+        constraints = {**self.engine.DEFAULT_CONSTRAINTS, **(constraints or {})}
+        x = self._inputs(products, constraints)
+        margin = np.array([float(category_min_margin.get(c, 0.0)) for c in x['categories']])
+        targeted = np.array([c in category_min_margin for c in x['categories']], dtype=bool)
+        
+        def revenue(p):
+            return float(np.sum(p * (x['a'] - x['b'] * p)))
+        
+        mu, revenue_feasible = 0.0, True
+        lam, feasible, iterations = self._solve_categories(x, objective, margin, targeted, mu)
+        if min_revenue is not None and revenue(self._prices(x, objective, margin, lam, mu)) < min_revenue:
+            # Outer bisection on the revenue multiplier, re-solving categories
+            lo, hi = 0.0, 1.0
+            while hi < MAX_MULTIPLIER:
+                lam, feasible, n = self._solve_categories(x, objective, margin, targeted, hi)
+                iterations += n + 1
+                if revenue(self._prices(x, objective, margin, lam, hi)) >= min_revenue:
+                    break
+                lo, hi = hi, hi * 4
+            revenue_feasible = hi < MAX_MULTIPLIER
+            for _ in range(self.max_iter if revenue_feasible else 0):
+                if (hi - lo) / (1 + hi) < self.tolerance:
+                    break
+                mid = (lo + hi) / 2
+                lam_mid, _, n = self._solve_categories(x, objective, margin, targeted, mid)
+                iterations += n + 1
+                if revenue(self._prices(x, objective, margin, lam_mid, mid)) >= min_revenue:
+                    hi = mid
+                else:
+                    lo = mid
+            mu = hi
+            lam, feasible, n = self._solve_categories(x, objective, margin, targeted, mu)
+            iterations += n
+        
+        price = self._prices(x, objective, margin, lam, mu)
+        base, cost = x['base'], x['cost']
+        demand = x['a'] - x['b'] * price
+        base_demand = x['q0']
+        
+        def by_category(values):
+            return np.bincount(x['codes'], weights=values, minlength=len(margin))
+        
+        count = np.bincount(x['codes'], minlength=len(margin))
+        cat_revenue = by_category(price * demand)
+        cat_profit = by_category((price - cost) * demand)
+        base_revenue = by_category(base * base_demand)
+        base_profit = by_category((base - cost) * base_demand)
+        
+        with np.errstate(divide='ignore', invalid='ignore'):
+            change = np.where(base > 0, (price - base) / base * 100, 0.0)
+            cat_margin = np.where(cat_revenue > 0, cat_profit / cat_revenue, 0.0)
+            base_margin = np.where(base_revenue > 0, base_profit / base_revenue, 0.0)
+        
+        return {
+            'objective': objective,
+            'products': {
+                'product_id': x['product_id'],
+                'current_price': base,
+                'optimal_price': np.round(price, 2),
+                'price_change_percent': np.round(change, 2),
+                'expected_demand': np.round(demand, 3),
+                'expected_revenue': np.round(price * demand, 2),
+                'expected_profit': np.round((price - cost) * demand, 2),
+                'at_bound': (price <= x['lower']) | (price >= x['upper'])
+            },
+            'categories': [
+                {
+                    'category': str(category),
+                    'products': int(count[i]),
+                    'min_margin': float(margin[i]) if targeted[i] else None,
+                    'margin': round(float(cat_margin[i]), 4),
+                    'baseline_margin': round(float(base_margin[i]), 4),
+                    'revenue': round(float(cat_revenue[i]), 2),
+                    'baseline_revenue': round(float(base_revenue[i]), 2),
+                    'profit': round(float(cat_profit[i]), 2),
+                    'baseline_profit': round(float(base_profit[i]), 2),
+                    'multiplier': float(lam[i]),
+                    'binding': bool(lam[i] > 0),
+                    'feasible': bool(feasible[i])
+                }
+                for i, category in enumerate(x['categories'])
+            ],
+            'totals': {
+                'revenue': round(float(cat_revenue.sum()), 2),
+                'baseline_revenue': round(float(base_revenue.sum()), 2),
+                'profit': round(float(cat_profit.sum()), 2),
+                'baseline_profit': round(float(base_profit.sum()), 2),
+                'min_revenue': min_revenue,
+                'revenue_multiplier': mu,
+                'revenue_feasible': revenue_feasible
+            },
+            'iterations': iterations,
+            'seconds': round(time.perf_counter() - start, 4)
+        }
+
+
+def synthetic_catalog(n: int, seed: int = 0) -> List[Dict]:
+    """Demo products across the engine's categories"""
+    rng = np.random.default_rng(seed)
+    categories = list(DynamicPricingEngine.ELASTICITY_BY_CATEGORY)
+    base = np.round(rng.lognormal(11, 1, n), -2)
+    return [
+        {
+            'product_id': f'P{i:06d}',
+            'category': categories[c],
+            'base_price': float(base[i]),
+            'cost': float(np.round(base[i] * u, -2)),
+            'avg_daily_sales': float(s)
+        }
+        for i, (c, u, s) in enumerate(zip(
+            rng.integers(0, len(categories), n),
+            rng.uniform(0.6, 0.9, n),
+            rng.gamma(2, 5, n)
+        ))
+    ]
+
+
+def main():
+    """Optimizer CLI"""
+    import argparse
+    import json
+    
+    parser = argparse.ArgumentParser(description="Portfolio Price Optimization")
+    parser.add_argument("data", nargs="?", help="JSON file with a products array")
+    parser.add_argument("--synthetic", type=int, help="Optimize N synthetic products instead")
+    parser.add_argument("--objective", choices=PortfolioOptimizer.OBJECTIVES, default="revenue")
+    parser.add_argument("--margin", action="append", default=[], help="category=min_margin (repeatable)")
+    parser.add_argument("--min-revenue", type=float)
+    parser.add_argument("--max-price-change", type=float, default=0.25)
+    
+    args = parser.parse_args()
+    
+    if args.synthetic:
+        products = synthetic_catalog(args.synthetic)
+    elif args.data:
+        with open(args.data, encoding='utf-8') as f:
+            products = json.load(f)
+        products = products.get('products', []) if isinstance(products, dict) else products
+    else:
+        parser.error("data file or --synthetic is required")
+    
+    margins = {}
+    for item in args.margin:
+        category, _, value = item.partition('=')
+        margins[category] = float(value)
+    
+    result = PortfolioOptimizer().optimize(
+        products, args.objective, margins, args.min_revenue,
+        {'max_price_change': args.max_price_change}
+    )
+    print(json.dumps({
+        'categories': result['categories'],
+        'totals': result['totals'],
+        'iterations': result['iterations'],
+        'seconds': result['seconds']
+    }, indent=2, ensure_ascii=False))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,319 @@
+#!/usr/bin/env python3
+"""
+Price Decision Log
+Append-only columnar log of pricing recommendations for audits and backtests
+
+Every /pricing/batch-update result is appended as columns (inputs, factor
+multipliers, final price, projections, timestamps). The request thread
+only enqueues the arrays; a background thread concatenates them into
+compressed .npz segments of up to segment_rows rows, each sorted by
+product id, and records per-segment min/max of decision time and product
+id in manifest.json. Queries skip segments whose ranges cannot match and
+binary-search product ids inside the rest.
+
+Several processes (gunicorn workers) may share one directory: segment
+numbers are allocated and the manifest rewritten under an exclusive
+flock on manifest.lock.
+
+Usage:
+    python price_decision_log.py segments
+    python price_decision_log.py query --product SP001 --from 2025-01-01 --to 2025-02-01
+"""
+
+import atexit
+import json
+import os
+import queue
+import threading
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None  # Windows: no cross-process lock, single writer only
+
+from service_clock import now, resolve_as_of
+
+DECISION_LOG_DIR = Path(__file__).parent / "decision_log"
+MANIFEST = 'manifest.json'
+MANIFEST_LOCK = 'manifest.lock'
+
+# recommend_columns() fields kept per decision
+LOGGED_FIELDS = (
+    'product_id', 'current_price', 'cost', 'demand_index', 'current_stock',
+    'avg_daily_sales', 'competitor_avg_price', 'elasticity', 'demand',
+    'inventory', 'competitor', 'combined', 'recommended_price',
+    'price_change_percent', 'expected_revenue', 'expected_profit', 'confidence'
+)
+TIME_FIELDS = ('decided_at', 'as_of')
+
+
+def to_millis(value) -> int:
+    """Datetime-like value -> epoch milliseconds (naive wall-clock time)"""
+    return int(np.datetime64(resolve_as_of(value), 'ms').astype(np.int64))
+
+
+class PriceDecisionLog:
+    """Directory of segment_<n>.npz decision segments plus manifest.json"""
+    
+    def __init__(self, directory=None, segment_rows: int = 50000, flush_interval: float = 5.0):
+        self.directory = Path(directory or DECISION_LOG_DIR)
+        self.segment_rows = segment_rows
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue()
+        self._pending = []
+        self._lock = threading.Lock()
+        self._thread = None
+        self._closed = False
+    
+    def _manifest_path(self) -> Path:
+        return self.directory / MANIFEST
+    
+    @contextmanager
+    def _manifest_lock(self):
+        """Exclusive lock shared by every process writing to this directory"""
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / MANIFEST_LOCK, 'a') as f:
+            if fcntl is not None:
+                fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(f, fcntl.LOCK_UN)
+    
+    def manifest(self) -> List[Dict]:
+        """Segment metadata, oldest first"""
+        path = self._manifest_path()
+        if not path.exists():
+            return []
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)['segments']
+    
+    def append(
+        self,
+        columns: Dict[str, np.ndarray],
+        as_of=None,
+        time_multiplier: float = 1.0,
+        decided_at=None
+    ) -> int:
+        """
+        Queue one batch of recommendations (returns immediately)
+        
+        Args:
+            columns: recommend_columns() result (arrays are not copied and
+                must not be modified afterwards)
+            as_of: Reference date the batch was priced for
+            time_multiplier: Seasonality factor applied to the batch
+        
+        Returns:
+            Rows queued
+        """
+        n = len(columns['recommended_price'])
+        if not n or self._closed:
+            return 0
+        batch = {field: columns[field] for field in LOGGED_FIELDS}
+        batch['time'] = np.full(n, time_multiplier)
+        batch['decided_at'] = np.full(n, to_millis(decided_at), dtype=np.int64)
+        batch['as_of'] = np.full(n, to_millis(as_of), dtype=np.int64)
+        
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='price-decision-log', daemon=True)
+                    self._thread.start()
+                    atexit.register(self.close)
+        self._queue.put(batch)
+        return n
+    
+    def _run(self):
+        pending_rows = 0
+        while not self._closed:
+            try:
+                batch = self._queue.get(timeout=self.flush_interval)
+            except queue.Empty:
+                self.flush()
+                pending_rows = 0
+                continue
+            with self._lock:
+                self._pending.append(batch)
+            pending_rows += len(batch['decided_at'])
+            if pending_rows >= self.segment_rows:
+                self.flush()
+                pending_rows = 0
+    
+    def flush(self) -> Optional[Dict]:
+        """Write everything queued so far as one segment; returns its metadata"""
+        with self._lock:
+            while True:
+                try:
+                    self._pending.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not self._pending:
+                return None
+            batches, self._pending = self._pending, []
+            
+            columns = {
+                field: np.concatenate([np.asarray(b[field]) for b in batches])
+                for field in batches[0]
+            }
+            columns['product_id'] = columns['product_id'].astype(str)
+            order = np.argsort(columns['product_id'], kind='stable')
+            columns = {field: values[order] for field, values in columns.items()}
+            return self._write_segment(columns)
+    
+    def _write_segment(self, columns: Dict[str, np.ndarray]) -> Dict:
+        decided = columns['decided_at']
+        meta = {
+            'rows': int(len(decided)),
+            'minDecidedAt': int(decided.min()),
+            'maxDecidedAt': int(decided.max()),
+            'minProductId': str(columns['product_id'][0]),
+            'maxProductId': str(columns['product_id'][-1]),
+            'createdAt': now().isoformat(timespec='seconds')
+        }
+        
+        # Compress outside the lock under a name no other writer can pick
+        self.directory.mkdir(parents=True, exist_ok=True)
+        tmp = self.directory / f"segment_{uuid.uuid4().hex}.tmp.npz"
+        np.savez_compressed(tmp, **columns)
+        
+        with self._manifest_lock():
+            # Re-read under the lock: other processes may have appended
+            segments = self.manifest()
+            index = segments[-1]['index'] + 1 if segments else 0
+            meta = {'index': index, 'file': f"segment_{index:08d}.npz", **meta}
+            os.replace(tmp, self.directory / meta['file'])
+            
+            # Segment first, then the manifest: a crash in between only
+            # leaves an unlisted file behind
+            manifest = self._manifest_path()
+            with open(manifest.with_suffix('.tmp'), 'w', encoding='utf-8') as f:
+                json.dump({'segments': segments + [meta]}, f, ensure_ascii=False)
+            os.replace(manifest.with_suffix('.tmp'), manifest)
+        return meta
+    
+    def close(self):
+        """Stop the writer thread and flush what is queued"""
+        self._closed = True
+        if self._thread is not None:
+            self._thread.join(self.flush_interval + 1)
+        self.flush()
+    
+    def segments(self, product_id=None, start=None, end=None) -> List[Dict]:
+        """Segments whose product/time ranges may contain matching rows"""
+        low = None if start is None else to_millis(start)
+        high = None if end is None else to_millis(end)
+        key = None if product_id is None else str(product_id)
+        return [
+            s for s in self.manifest()
+            if (low is None or s['maxDecidedAt'] >= low)
+            and (high is None or s['minDecidedAt'] < high)
+            and (key is None or s['minProductId'] <= key <= s['maxProductId'])
+        ]
+    
+    def query(
+        self,
+        product_ids: Optional[Iterable] = None,
+        start=None,
+        end=None,
+        fields: Optional[Iterable[str]] = None,
+        limit: Optional[int] = None
+    ) -> Dict[str, np.ndarray]:
+        """
+        Logged decisions by product and/or decision time range [start, end)
+        
+        Queued decisions are flushed first so results are up to date.
+        
+        Returns:
+            Columns (decided_at/as_of as datetime64[ms]), ordered by
+            decision time, newest first
+        """
+        self.flush()
+        keys = None if product_ids is None else np.unique(np.asarray(list(product_ids), dtype=str))
+        low = None if start is None else to_millis(start)
+        high = None if end is None else to_millis(end)
+        wanted = list(fields) if fields else list(LOGGED_FIELDS) + ['time'] + list(TIME_FIELDS)
+        
+        parts = []
+        for segment in self.segments(start=start, end=end):
+            if keys is not None and not (
+                (keys >= segment['minProductId']) & (keys <= segment['maxProductId'])
+            ).any():
+                continue
+            with np.load(self.directory / segment['file']) as data:
+                ids = data['product_id']
+                if keys is None:
+                    rows = np.arange(len(ids))
+                else:
+                    # Rows are sorted by product id: one slice per key
+                    left = np.searchsorted(ids, keys, side='left')
+                    right = np.searchsorted(ids, keys, side='right')
+                    rows = np.concatenate([np.arange(a, b) for a, b in zip(left, right)] or [np.array([], dtype=np.int64)])
+                decided = data['decided_at'][rows]
+                mask = np.ones(len(rows), dtype=bool)
+                if low is not None:
+                    mask &= decided >= low
+                if high is not None:
+                    mask &= decided < high
+                rows = rows[mask]
+                if len(rows):
+                    parts.append({field: data[field][rows] for field in set(wanted) | {'decided_at'}})
+        
+        if not parts:
+            return {field: np.array([]) for field in wanted}
+        columns = {field: np.concatenate([p[field] for p in parts]) for field in parts[0]}
+        order = np.argsort(-columns['decided_at'], kind='stable')
+        if limit is not None:
+            order = order[:limit]
+        result = {field: columns[field][order] for field in wanted}
+        for field in TIME_FIELDS:
+            if field in result:
+                result[field] = result[field].astype('datetime64[ms]')
+        return result
+
+
+def to_records(columns: Dict[str, np.ndarray]) -> List[Dict]:
+    """query() columns -> list of camelCase dicts (for JSON responses)"""
+    def camel(name):
+        head, *rest = name.split('_')
+        return head + ''.join(part.title() for part in rest)
+    
+    lists = {
+        camel(field): (
+            [str(v) for v in values] if values.dtype.kind == 'M' else values.tolist()
+        )
+        for field, values in columns.items()
+    }
+    n = len(next(iter(lists.values()))) if lists else 0
+    return [{field: values[i] for field, values in lists.items()} for i in range(n)]
+
+
+if __name__ == "__main__":
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Price Decision Log")
+    parser.add_argument('--dir', default=None, help="Log directory (default: ./decision_log)")
+    sub = parser.add_subparsers(dest='command', required=True)
+    sub.add_parser('segments', help="List segments")
+    query_parser = sub.add_parser('query', help="Decisions by product/date range")
+    query_parser.add_argument('--product', action='append', help="Product id (repeatable)")
+    query_parser.add_argument('--from', dest='start', default=None)
+    query_parser.add_argument('--to', dest='end', default=None)
+    query_parser.add_argument('--limit', type=int, default=20)
+    args = parser.parse_args()
+    
+    log = PriceDecisionLog(args.dir or os.environ.get('PRICING_DECISION_LOG_DIR') or None)
+    if args.command == 'segments':
+        for segment in log.manifest():
+            print(json.dumps(segment, ensure_ascii=False))
+    else:
+        result = log.query(args.product, args.start, args.end, limit=args.limit)
+        for record in to_records(result):
+            print(json.dumps(record, ensure_ascii=False))
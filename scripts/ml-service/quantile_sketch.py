@@ -0,0 +1,191 @@
+#!/usr/bin/env python3
+"""
+Streaming Quantile Sketch
+KLL sketch (Karnin, Lang, Liberty 2016) for percentile ranks over a stream
+
+Memory stays at O(k log(n/k)) items whatever the stream length. Rank
+queries go through a sorted (value, cumulative weight) view that is
+rebuilt lazily after updates, so a lookup is a binary search.
+
+A sketch saves to a small JSON file (k, n and the retained items per
+level) so a distribution fitted offline can be shipped with a model.
+"""
+
+import json
+import math
+import threading
+from pathlib import Path
+from typing import Dict, Iterable, Optional
+
+import numpy as np
+
+
+SKETCH_TYPE = 'kll'
+
+
+class KLLSketch:
+    """
+    KLL quantile sketch with batch updates
+    
+    Level h holds items of weight 2**h. When the sketch is over capacity
+    the lowest full level is sorted and every other item (random offset)
+    is promoted to the next level, halving it while keeping ranks unbiased.
+    """
+    
+    CAPACITY_DECAY = 2 / 3
+    MIN_LEVEL_CAPACITY = 2
+    
+    def __init__(self, k: int = 200, seed: Optional[int] = 0):
+        self.k = k
+        self.n = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+        self._sorted = None  # (values, cumulative weights) cache
+        self._lock = threading.Lock()
+    
+    def __len__(self) -> int:
+        return self.n
+    
+    def __getstate__(self):
+        # Locks can't be pickled (sketches are shipped to worker processes)
+        state = self.__dict__.copy()
+        del state['_lock']
+        return state
+    
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+    
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(self.MIN_LEVEL_CAPACITY, int(math.ceil(self.k * self.CAPACITY_DECAY ** depth)))
+    
+    def _compress(self):
+        while True:
+            over = [
+                h for h, items in enumerate(self.levels)
+                if len(items) >= self._capacity(h)
+            ]
+            if sum(len(items) for items in self.levels) <= sum(
+                self._capacity(h) for h in range(len(self.levels))
+            ) or not over:
+                return
+            
+            h = over[0]
+            if h + 1 == len(self.levels):
+                self.levels.append(np.empty(0))
+            
+            items = np.sort(self.levels[h])
+            # Odd item out stays behind so the promoted half has exact weight
+            keep = items[-1:] if len(items) % 2 else items[:0]
+            paired = items[:len(items) - len(keep)]
+            promoted = paired[self._rng.integers(2)::2]
+            self.levels[h] = keep
+            self.levels[h + 1] = np.concatenate([self.levels[h + 1], promoted])
+    
+    def update(self, value: float):
+        """Add a single value"""
+        self.update_batch([value])
+    
+    def update_batch(self, values: Iterable[float]):
+        """Add many values (NaN/inf are ignored)"""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        values = values[np.isfinite(values)]
+        if not len(values):
+            return
+        
+        with self._lock:
+            self.n += len(values)
+            self.levels[0] = np.concatenate([self.levels[0], values])
+            self._compress()
+            self._sorted = None
+    
+    def merge(self, other: 'KLLSketch'):
+        """Fold another sketch into this one"""
+        with self._lock:
+            while len(self.levels) < len(other.levels):
+                self.levels.append(np.empty(0))
+            for h, items in enumerate(other.levels):
+                self.levels[h] = np.concatenate([self.levels[h], items])
+            self.n += other.n
+            self._compress()
+            self._sorted = None
+    
+    def _sorted_view(self):
+        view = self._sorted
+        if view is None:
+            with self._lock:
+                values = np.concatenate(self.levels)
+                weights = np.concatenate([
+                    np.full(len(items), 2 ** h, dtype=np.float64)
+                    for h, items in enumerate(self.levels)
+                ])
+                order = np.argsort(values, kind='stable')
+                view = self._sorted = (values[order], np.cumsum(weights[order]))
+        return view
+    
+    def ranks(self, values, inclusive: bool = True) -> np.ndarray:
+        """
+        Estimated fraction of the stream <= each value (< when not
+        inclusive); 0 for an empty sketch
+        """
+        values = np.asarray(values, dtype=np.float64)
+        if not self.n:
+            return np.zeros(values.shape)
+        
+        sorted_values, cumulative = self._sorted_view()
+        idx = np.searchsorted(sorted_values, values, side='right' if inclusive else 'left')
+        below = np.where(idx > 0, cumulative[np.maximum(idx - 1, 0)], 0.0)
+        return below / cumulative[-1]
+    
+    def rank(self, value: float, inclusive: bool = True) -> float:
+        return float(self.ranks([value], inclusive)[0])
+    
+    def quantile(self, q: float) -> float:
+        """Smallest retained value whose estimated rank is >= q"""
+        if not self.n:
+            return float('nan')
+        sorted_values, cumulative = self._sorted_view()
+        idx = np.searchsorted(cumulative, q * cumulative[-1], side='left')
+        return float(sorted_values[min(idx, len(sorted_values) - 1)])
+    
+    @property
+    def size(self) -> int:
+        """Number of retained items"""
+        return sum(len(items) for items in self.levels)
+    
+    def to_dict(self) -> Dict:
+        return {
+            'type': SKETCH_TYPE,
+            'k': self.k,
+            'n': self.n,
+            'levels': [items.tolist() for items in self.levels]
+        }
+    
+    @classmethod
+    def from_dict(cls, data: Dict) -> 'KLLSketch':
+        """
+        Rebuild a sketch from to_dict() output
+        
+        Raises:
+            ValueError: If the type does not match or the level weights do
+                not add up to n
+        """
+        if data.get('type') != SKETCH_TYPE:
+            raise ValueError("Not a KLL sketch")
+        sketch = cls(int(data['k']))
+        sketch.levels = [np.asarray(items, dtype=np.float64) for items in data['levels']] or [np.empty(0)]
+        sketch.n = int(data['n'])
+        if sum(len(items) * 2 ** h for h, items in enumerate(sketch.levels)) != sketch.n:
+            raise ValueError("KLL sketch levels do not match n")
+        return sketch
+    
+    def save(self, path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(json.dumps(self.to_dict()), encoding='utf-8')
+    
+    @classmethod
+    def load(cls, path) -> 'KLLSketch':
+        """Load a sketch written by save() (ValueError if it is not one)"""
+        return cls.from_dict(json.loads(Path(path).read_text(encoding='utf-8')))
@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+"""
+Service Clock
+Shared reference time for the ML services
+
+Engines used to capture datetime.now() once at construction, so long-lived
+gunicorn workers scored against a stale date. They now ask this module for
+the current time (cached for a second, so batch loops don't hit the system
+clock per row) or use an explicit as-of date supplied by the caller.
+"""
+
+import time
+from datetime import date, datetime
+from typing import Optional, Union
+
+# How long a cached "now" is reused
+CACHE_TTL_SECONDS = 1.0
+
+_cache = {'monotonic': None, 'now': None}
+
+
+def now() -> datetime:
+    """Current local time, refreshed at most once per CACHE_TTL_SECONDS"""
+    mono = time.monotonic()
+    if _cache['now'] is None or mono - _cache['monotonic'] >= CACHE_TTL_SECONDS:
+        _cache['monotonic'] = mono
+        _cache['now'] = datetime.now()
+    return _cache['now']
+
+
+def resolve_as_of(as_of: Optional[Union[str, date, datetime]] = None) -> datetime:
+    """
+    Reference time for a request
+
+    Args:
+        as_of: datetime, date or ISO string (timezone is dropped, keeping
+            the wall-clock time); None or '' means now()
+
+    Returns:
+        Naive datetime
+
+    Raises:
+        ValueError: If as_of is a string that is not a valid ISO date
+    """
+    if as_of is None or as_of == '':
+        return now()
+    if isinstance(as_of, datetime):
+        return as_of.replace(tzinfo=None)
+    if isinstance(as_of, date):
+        return datetime(as_of.year, as_of.month, as_of.day)
+    return datetime.fromisoformat(str(as_of).replace('Z', '+00:00')).replace(tzinfo=None)
@@ -0,0 +1,70 @@
+"""Parallel at-risk scans must match the streaming scan"""
+
+import pytest
+
+import churn_batch
+from churn_batch import parallel_scan_at_risk
+from churn_prediction import ChurnPredictor
+from quantile_sketch import KLLSketch
+from train_churn_model import synthetic_dataset
+
+AS_OF = '2025-06-30'
+
+
+@pytest.fixture(scope='module')
+def customers():
+    return synthetic_dataset(3000, AS_OF, seed=7).drop(columns=['churned']).to_dict('records')
+
+
+@pytest.fixture
+def predictor():
+    sketch = KLLSketch()
+    sketch.update_batch(synthetic_dataset(1000, AS_OF, seed=1)['total_spent_12m'])
+    return ChurnPredictor(sketch)
+
+
+def summarize(result):
+    columns = result['customers'].to_columns()
+    return result['population'], result['summary'], columns['customerId'], columns['churnProbability']
+
+
+@pytest.fixture
+def shared_pool(monkeypatch):
+    monkeypatch.setattr(churn_batch, 'MIN_PARALLEL_ROWS', 0)
+    monkeypatch.setattr(churn_batch, 'MAX_WORKERS', 2)
+    churn_batch.shutdown_pool()
+    yield
+    churn_batch.shutdown_pool()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_parallel_matches_serial_scan(customers, predictor, shared_pool, workers):
+    serial = predictor.scan_at_risk(customers, 0.5, 40, chunk_size=1000, as_of=AS_OF)
+    parallel = parallel_scan_at_risk(predictor, customers, 0.5, 40, 700, workers, AS_OF)
+    
+    assert summarize(parallel) == summarize(serial)
+    assert serial['population']['at_risk'] > 40
+
+
+def test_scans_leave_spend_sketch_unchanged(customers, predictor):
+    n = len(predictor.spend_sketch)
+    predictor.scan_at_risk(customers, as_of=AS_OF)
+    parallel_scan_at_risk(predictor, customers, workers=1, as_of=AS_OF)
+    
+    assert len(predictor.spend_sketch) == n
+
+
+def test_scans_reuse_one_clamped_pool(customers, predictor, shared_pool):
+    serial = predictor.scan_at_risk(customers, 0.5, 40, chunk_size=1000, as_of=AS_OF)
+    first = parallel_scan_at_risk(predictor, customers, 0.5, 40, 500, 500, AS_OF)
+    pool = churn_batch._pool
+    second = parallel_scan_at_risk(predictor, customers, 0.5, 40, 900, 2, AS_OF)
+    
+    assert pool is not None and churn_batch._pool is pool
+    assert summarize(first) == summarize(second) == summarize(serial)
+
+
+@pytest.mark.parametrize('workers, chunk_size', [(0, 1000), (-2, 1000), (2, 0)])
+def test_parallel_scan_rejects_non_positive_arguments(customers, predictor, workers, chunk_size):
+    with pytest.raises(ValueError):
+        parallel_scan_at_risk(predictor, customers, chunk_size=chunk_size, workers=workers, as_of=AS_OF)
@@ -0,0 +1,106 @@
+"""datetime64 date columns score like the equivalent ISO strings"""
+
+import numpy as np
+import pandas as pd
+
+from churn_batch import encode_columns, parallel_scan_at_risk
+from churn_prediction import ChurnPredictor, parse_iso_datetime, parse_last_order_dates
+from churn_segments import tenure_buckets
+
+AS_OF = '2025-06-30'
+ISO_DATES = ['2025-06-01', '2025-03-15T08:30:00', None, '2024-07-04', '2025-06-29T23:59:59']
+
+
+def frame(dates):
+    n = len(dates)
+    return pd.DataFrame({
+        'customer_id': [f'C{i}' for i in range(n)],
+        'last_order_date': dates,
+        'orders_12m': np.arange(n),
+        'total_spent_12m': np.linspace(1e6, 5e7, n),
+        'recent_3m_spent': np.full(n, 2e6),
+        'previous_3m_spent': np.full(n, 3e6)
+    })
+
+
+def datetime64_dates():
+    return pd.to_datetime(pd.Series(ISO_DATES), format='ISO8601').astype('datetime64[ns]')
+
+
+def test_parse_datetime64_ns_column():
+    parsed, missing, invalid = parse_last_order_dates(datetime64_dates().to_numpy())
+    expected, expected_missing, _ = parse_last_order_dates(ISO_DATES)
+    
+    np.testing.assert_array_equal(parsed, expected)
+    np.testing.assert_array_equal(missing, expected_missing)
+    assert not invalid.any()
+
+
+def test_parse_datetime64_scalars_and_nat():
+    values = [np.datetime64('2025-06-01'), np.datetime64('NaT'), pd.NaT, np.datetime64('2025-03-15T08:30', 'ns')]
+    parsed, missing, invalid = parse_last_order_dates(values)
+    
+    assert missing.tolist() == [False, True, True, False]
+    assert not invalid.any()
+    assert parsed[3] == np.datetime64('2025-03-15T08:30', 'us')
+
+
+def test_predict_columns_datetime64_matches_iso_strings():
+    predictor = ChurnPredictor()
+    expected = predictor.predict_columns(frame(ISO_DATES), AS_OF)
+    
+    for data in (frame(datetime64_dates()), {**frame(ISO_DATES).to_dict('list'), 'last_order_date': datetime64_dates().to_numpy()}):
+        scores = predictor.predict_columns(data, AS_OF)
+        np.testing.assert_array_equal(scores['days_since_last_order'], expected['days_since_last_order'])
+        np.testing.assert_array_equal(scores['churn_probability'], expected['churn_probability'])
+    
+    scalar = [predictor.predict({'last_order_date': d}, AS_OF) for d in datetime64_dates().to_numpy()]
+    assert [p.churn_probability for p in scalar] == [p.churn_probability for p in (
+        predictor.predict({'last_order_date': d}, AS_OF) for d in ISO_DATES
+    )]
+
+
+OFFSET_DATES = [
+    '2025-06-01-07:00', '2025-06-01+07:00', '2025-06-01Z',
+    '2025-06-01T23:30:00-07:00', '2025-06-01T10:00:00.250+05:30'
+]
+
+
+def test_utc_offsets_parse_the_same_in_both_paths():
+    parsed, missing, invalid = parse_last_order_dates(OFFSET_DATES)
+    
+    assert not missing.any() and not invalid.any()
+    assert parsed.tolist() == [parse_iso_datetime(d) for d in OFFSET_DATES]
+    assert parse_iso_datetime('2025-06-01-07:00') == parse_iso_datetime('2025-06-01')
+
+
+def test_date_with_offset_scores_the_same_in_predict_and_predict_columns():
+    # 03:00 on the reference day: reading '-07:00' as a time would cost a day
+    predictor = ChurnPredictor()
+    as_of = '2025-12-31T03:00'
+    days = predictor.predict_columns({'last_order_date': ['2025-06-01-07:00']}, as_of)['days_since_last_order']
+    factors = predictor.predict({'last_order_date': '2025-06-01-07:00'}, as_of).risk_factors
+    
+    assert days.tolist() == [213]
+    assert factors[0]['factor'].startswith('213 ')
+
+
+def test_encode_columns_datetime64():
+    predictor = ChurnPredictor()
+    columns = encode_columns(predictor, frame(datetime64_dates()))
+    
+    assert columns['last_order_missing'].tolist() == [d is None for d in ISO_DATES]
+    assert b'\x00' not in columns['last_order_date'].tolist()
+    
+    parallel = parallel_scan_at_risk(predictor, frame(datetime64_dates()), 0.0, 10, workers=1, as_of=AS_OF)
+    serial = predictor.scan_at_risk(frame(ISO_DATES).to_dict('records'), 0.0, 10, as_of=AS_OF)
+    assert parallel['customers'].to_columns() == serial['customers'].to_columns()
+
+
+def test_tenure_from_datetime64_first_order_date():
+    today = pd.Timestamp(AS_OF).to_pydatetime()
+    dates = datetime64_dates().to_numpy()
+    
+    labels = tenure_buckets({'first_order_date': dates}, len(dates), today)
+    assert labels.tolist() == tenure_buckets({'first_order_date': ISO_DATES}, len(dates), today).tolist()
+    assert labels[2] == 'unknown'
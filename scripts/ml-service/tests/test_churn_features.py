@@ -0,0 +1,149 @@
+"""OrderEventStore window totals against a brute-force replay, and log compaction"""
+
+import random
+from datetime import date, timedelta
+
+import pytest
+
+import churn_features
+from churn_features import OrderEventStore, WINDOW_DAYS
+
+BASE = date(2025, 1, 1)
+
+
+@pytest.fixture(scope='module')
+def events():
+    rng = random.Random(1)
+    events = [
+        {
+            'customerId': f'C{rng.randrange(60)}',
+            'orderDate': (BASE + timedelta(days=int(rng.random() ** 0.5 * 900))).isoformat(),
+            'amount': rng.randint(1, 100) * 1000
+        }
+        for _ in range(4000)
+    ]
+    # Mostly in date order, with some out-of-order neighbours
+    events.sort(key=lambda e: e['orderDate'])
+    for i in range(0, len(events) - 1, 7):
+        events[i], events[i + 1] = events[i + 1], events[i]
+    return events
+
+
+def accepted_orders(events):
+    """Orders kept by the store: not older than the window at their customer's head day"""
+    head, accepted = {}, []
+    for event in events:
+        day = date.fromisoformat(event['orderDate']).toordinal()
+        customer = event['customerId']
+        head[customer] = max(head.get(customer, day), day)
+        if head[customer] - day < WINDOW_DAYS:
+            accepted.append((customer, day, event['amount']))
+    return accepted
+
+
+def test_window_totals_match_brute_force(events):
+    store = OrderEventStore()
+    store.ingest(events[:2500])
+    store.ingest(events[2500:])
+    orders = accepted_orders(events)
+    checked = 0
+    
+    for offset in (300, 700, 899, 950, 1300):
+        day = (BASE + timedelta(days=offset)).toordinal()
+        for customer, row in store.positions.items():
+            if day < store.head[row]:
+                continue  # older order days are no longer kept
+            checked += 1
+            mine = [(d, a) for c, d, a in orders if c == customer]
+            features = store.features(customer, date.fromordinal(day).isoformat())
+            assert (
+                features['orders_12m'], features['total_spent_12m'],
+                features['recent_3m_spent'], features['previous_3m_spent']
+            ) == (
+                sum(1 for d, _ in mine if 0 <= day - d < WINDOW_DAYS),
+                sum(a for d, a in mine if 0 <= day - d < WINDOW_DAYS),
+                sum(a for d, a in mine if 0 <= day - d < 90),
+                sum(a for d, a in mine if 90 <= day - d < 180)
+            )
+    assert checked >= 100
+
+
+def test_advanced_running_totals_match_buckets(events):
+    store = OrderEventStore()
+    store.ingest(events)
+    day = (BASE + timedelta(days=950)).toordinal()
+    
+    for row in store.positions.values():
+        assert store.head[row] < day
+        store._advance(row, day)
+        orders, spent, recent, previous, _ = store._window_totals(row, day)
+        assert store.orders_12m[row] == orders
+        assert store.spent_12m[row] == pytest.approx(spent)
+        assert store.recent_spent[row] == pytest.approx(recent)
+        assert store.previous_spent[row] == pytest.approx(previous)
+
+
+def test_log_replay_skips_torn_lines(events, tmp_path):
+    log = tmp_path / 'events.ndjson'
+    store = OrderEventStore(str(log))
+    store.ingest(events[:500])
+    with open(log, 'a', encoding='utf-8') as f:
+        f.write('{"customerId": "C1", "orderDa')  # crash mid-write
+    
+    replayed = OrderEventStore(str(log))
+    assert len(replayed) == len(store)
+    for customer in store.positions:
+        assert replayed.features(customer, '2026-06-01') == store.features(customer, '2026-06-01')
+
+
+def feature_table(store, days=('2025-06-01', '2026-01-15', '2026-06-01')):
+    return {customer: [store.features(customer, day) for day in days] for customer in store.positions}
+
+
+def test_compacted_log_replays_to_the_same_state(events, tmp_path):
+    log = tmp_path / 'events.ndjson'
+    store = OrderEventStore(str(log))
+    store.ingest(events[:3000])
+    store.ingest([{'customerId': 'C1', 'type': 'review', 'hasReviews': True, 'avgRatingGiven': 4.5}])
+    
+    result = store.compact()
+    assert result == {'lines_before': 3001, 'lines_after': len(store)}
+    assert len(log.read_text(encoding='utf-8').splitlines()) == len(store)
+    
+    store.ingest(events[3000:])
+    replayed = OrderEventStore(str(log))
+    assert feature_table(replayed) == feature_table(store)
+    assert replayed.features('C1', '2026-06-01')['avg_rating_given'] == 4.5
+
+
+def test_log_is_compacted_as_it_grows(events, tmp_path, monkeypatch):
+    monkeypatch.setattr(churn_features, 'COMPACT_MIN_LINES', 500)
+    log = tmp_path / 'events.ndjson'
+    store = OrderEventStore(str(log))
+    for start in range(0, len(events), 250):
+        store.ingest(events[start:start + 250])
+    
+    assert len(log.read_text(encoding='utf-8').splitlines()) == store.log_lines <= 500
+    assert feature_table(OrderEventStore(str(log))) == feature_table(store)
+
+
+def test_snapshot_type_is_reserved_for_the_log():
+    store = OrderEventStore()
+    stats = store.ingest([{'customerId': 'A', 'type': churn_features.SNAPSHOT_TYPE, 'head': '2025-01-01', 'days': []}])
+    
+    assert stats['invalid'] == 1 and len(store) == 0
+
+
+def test_expired_order_days_are_freed(events):
+    store = OrderEventStore(initial_capacity=4)
+    store.ingest(events)
+    day = (BASE + timedelta(days=950 + WINDOW_DAYS)).toordinal()
+    for row in store.positions.values():
+        store._advance(row, day)
+    
+    assert all(not store._entries(row) for row in store.positions.values())
+    assert store.orders_12m[:len(store)].sum() == 0
+    free, entry = 0, store._free
+    while entry >= 0:
+        free, entry = free + 1, int(store.entry_next[entry])
+    assert free == len(store.entry_day)
@@ -0,0 +1,140 @@
+"""Columnar churn scoring parity and the /churn NDJSON endpoints"""
+
+import random
+from datetime import datetime, timedelta
+
+import numpy as np
+import pandas as pd
+import pytest
+from flask import Flask
+
+from churn_prediction import ChurnPredictor, create_churn_blueprint
+from quantile_sketch import KLLSketch
+
+AS_OF = '2026-01-01'
+
+
+def random_customers(n, seed=0):
+    rng = random.Random(seed)
+    customers = []
+    for i in range(n):
+        customer = {'customer_id': f'C{i}'}
+        r = rng.random()
+        if r < 0.7:
+            moment = datetime(2026, 1, 1) - timedelta(days=rng.randint(0, 400), hours=rng.randint(0, 23))
+            customer['last_order_date'] = moment.isoformat() + rng.choice(['', 'Z', '+07:00'])
+        elif r < 0.8:
+            customer['last_order_date'] = 'garbage'
+        elif r < 0.85:
+            customer['last_order_date'] = datetime(2025, 6, 1)
+        for field, value in (
+            ('orders_12m', lambda: rng.randint(0, 20)),
+            ('total_spent_12m', lambda: rng.choice([0, rng.uniform(0, 4e7)])),
+            ('recent_3m_spent', lambda: rng.uniform(0, 1e7)),
+            ('previous_3m_spent', lambda: rng.choice([0, rng.uniform(0, 1e7)])),
+            ('has_reviews', lambda: rng.random() < 0.5),
+            ('avg_rating_given', lambda: rng.choice([0, 2.5, 3.0, 3.9, 4.0, 5.0])),
+            ('complaint_ratio', lambda: rng.choice([0, 0.1, 0.2, 0.3, 0.31, 0.5]))
+        ):
+            if rng.random() < 0.85:
+                customer[field] = value()
+        customers.append(customer)
+    return customers
+
+
+def spend_sketch(n=1000):
+    sketch = KLLSketch()
+    sketch.update_batch(np.random.default_rng(3).uniform(0, 4e7, n))
+    return sketch
+
+
+@pytest.mark.parametrize('sketch', [None, spend_sketch()], ids=['ratio', 'ranks'])
+def test_predict_columns_matches_predict(sketch):
+    predictor = ChurnPredictor(sketch)
+    customers = random_customers(3000)
+    columns = predictor.predict_columns(customers, AS_OF)
+    
+    for i, customer in enumerate(customers):
+        expected = predictor.predict(dict(customer), AS_OF)
+        assert columns['churn_probability'][i] == expected.churn_probability
+        assert columns['risk_level'][i] == expected.risk_level
+        assert round(columns['monetary_risk'][i], 3) == expected.rfm_scores['monetary_risk']
+
+
+def test_predict_columns_frame_matches_records():
+    predictor = ChurnPredictor(spend_sketch())
+    customers = random_customers(500, seed=1)
+    frame = pd.DataFrame(predictor.columns_from_records(customers))
+    
+    np.testing.assert_array_equal(
+        predictor.predict_columns(frame, AS_OF)['churn_probability'],
+        predictor.predict_columns(customers, AS_OF)['churn_probability']
+    )
+
+
+def test_scoring_does_not_move_spend_sketch():
+    predictor = ChurnPredictor(spend_sketch())
+    customers = random_customers(500, seed=2)
+    before = predictor.predict_columns(customers, AS_OF)
+    predictor.scan_at_risk(customers, as_of=AS_OF)
+    predictor.predict_columns(random_customers(2000, seed=3), AS_OF)
+    
+    assert len(predictor.spend_sketch) == 1000
+    np.testing.assert_array_equal(predictor.predict_columns(customers, AS_OF)['monetary_risk'], before['monetary_risk'])
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    for name in ('CHURN_MODEL_PATH', 'CHURN_SPEND_SKETCH_PATH', 'CHURN_EVENTS_LOG'):
+        monkeypatch.delenv(name, raising=False)
+    app = Flask(__name__)
+    app.register_blueprint(create_churn_blueprint(snapshot_dir=str(tmp_path)))
+    return app.test_client()
+
+
+def post_ndjson(client, url, body):
+    return client.post(url, data=body, content_type='application/x-ndjson')
+
+
+def test_events_ndjson_counts_malformed_lines_as_invalid(client):
+    body = (
+        b'{"customerId": "A", "orderDate": "2025-12-01", "amount": 500}\n'
+        b'{bad json\n'
+        b'\xff\xfe\n'
+        b'\n'
+        b'{"customerId": "B", "orderDate": "2025-12-02", "amount": 300}\n'
+    )
+    response = post_ndjson(client, '/churn/events', body)
+    
+    assert response.status_code == 200
+    assert response.json['data'] == {'ingested': 2, 'dropped': 0, 'invalid': 2, 'customers': 2}
+
+
+def test_events_ndjson_without_events_is_rejected(client):
+    response = post_ndjson(client, '/churn/events', b'\n\n')
+    
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+
+@pytest.mark.parametrize('url', ['/churn/at-risk', '/churn/segments?by=has_reviews', '/churn/snapshots'])
+def test_scoring_ndjson_malformed_line_is_rejected(client, url):
+    response = post_ndjson(client, url, b'{"customer_id": "A"}\n{bad json\n')
+    
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+
+@pytest.mark.parametrize('url', [
+    '/churn/at-risk?chunkSize=0',
+    '/churn/at-risk?chunkSize=abc',
+    '/churn/at-risk?workers=0',
+    '/churn/segments?by=has_reviews&chunkSize=-1',
+    '/churn/snapshots?chunkSize=0'
+])
+def test_non_positive_chunk_size_or_workers_is_rejected(client, url):
+    response = post_ndjson(client, url, b'{"customer_id": "A", "last_order_date": "2025-12-01"}\n')
+    
+    assert response.status_code == 400
+    assert response.json['success'] is False
+    assert 'chunkSize' in response.json['error']
@@ -0,0 +1,71 @@
+"""Segment aggregation input normalization and limits"""
+
+import numpy as np
+import pytest
+from flask import Flask
+
+import churn_segments
+from churn_prediction import ChurnPredictor, create_churn_blueprint
+from churn_segments import aggregate_segments, factorize_segment
+
+AS_OF = '2025-06-30'
+CUSTOMERS = [
+    {'customer_id': f'C{i}', 'tier': ['gold', 'silver', None][i % 3], 'region': ['HN', 'HCM'][i % 2], 'orders_12m': i}
+    for i in range(12)
+]
+
+
+@pytest.fixture
+def client(tmp_path, monkeypatch):
+    for name in ('CHURN_MODEL_PATH', 'CHURN_SPEND_SKETCH_PATH', 'CHURN_EVENTS_LOG'):
+        monkeypatch.delenv(name, raising=False)
+    app = Flask(__name__)
+    app.register_blueprint(create_churn_blueprint(snapshot_dir=str(tmp_path)))
+    return app.test_client()
+
+
+def test_factorize_segment_labels_missing_values_unknown():
+    labels, codes = factorize_segment(['b', None, float('nan'), '', 'a', 2, 'b'], 7)
+    
+    assert labels[codes].tolist() == ['b', 'unknown', 'unknown', 'unknown', 'a', '2', 'b']
+    labels, codes = factorize_segment(np.array([1.5, np.nan, 1.5]), 3)
+    assert labels[codes].tolist() == ['1.5', 'unknown', '1.5']
+
+
+def test_json_by_string_matches_query_parameter(client):
+    body = {'customers': CUSTOMERS, 'by': 'tier, region'}
+    from_body = client.post(f'/churn/segments?asOf={AS_OF}', json=body)
+    from_query = client.post(f'/churn/segments?asOf={AS_OF}&by=tier,region', json={'customers': CUSTOMERS})
+    
+    assert from_body.status_code == 200
+    assert from_body.json == from_query.json
+    assert from_body.json['data']['by'] == ['tier', 'region']
+    assert len(from_body.json['data']['groups']) == 6
+
+
+def test_bad_by_is_rejected(client):
+    response = client.post('/churn/segments', json={'customers': CUSTOMERS, 'by': {'tier': 1}})
+    
+    assert response.status_code == 400
+    assert response.json['success'] is False
+
+
+def test_too_many_segments_is_rejected(client, monkeypatch):
+    monkeypatch.setattr(churn_segments, 'MAX_SEGMENT_GROUPS', 5)
+    response = client.post('/churn/segments?by=tier,region', json={'customers': CUSTOMERS})
+    
+    assert response.status_code == 400
+    assert 'segments' in response.json['error']
+
+
+def test_group_cap_counts_groups_across_chunks():
+    predictor = ChurnPredictor()
+    customers = [{'customer_id': f'C{i}', 'region': f'R{i}'} for i in range(30)]
+    
+    assert len(aggregate_segments(predictor, customers, ['region'], AS_OF, 7)['groups']) == 30
+    aggregator = churn_segments.SegmentAggregator(['region'], max_groups=20)
+    with pytest.raises(ValueError):
+        for start in range(0, 30, 7):
+            chunk = customers[start:start + 7]
+            aggregator.add({'region': [c['region'] for c in chunk]}, predictor.predict_columns(chunk, AS_OF), AS_OF)
+    assert len(aggregator.keys) <= 20
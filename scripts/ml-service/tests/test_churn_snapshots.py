@@ -0,0 +1,35 @@
+"""Snapshot CLI scoring"""
+
+import sys
+
+import numpy as np
+
+import churn_snapshots
+from churn_prediction import ChurnPredictor
+from quantile_sketch import KLLSketch
+from train_churn_model import synthetic_dataset
+
+AS_OF = '2025-06-30'
+
+
+def test_cli_score_ranks_against_spend_sketch(tmp_path, monkeypatch, capsys):
+    customers = synthetic_dataset(500, AS_OF, seed=5).drop(columns=['churned'])
+    customers.to_csv(tmp_path / 'customers.csv', index=False)
+    sketch = KLLSketch()
+    sketch.update_batch(synthetic_dataset(1000, AS_OF, seed=1)['total_spent_12m'])
+    sketch.save(tmp_path / 'spend_sketch.json')
+    
+    monkeypatch.setattr(sys, 'argv', [
+        'churn_snapshots.py', '--dir', str(tmp_path / 'snapshots'), 'score', str(tmp_path / 'customers.csv'),
+        '--run-id', 'r1', '--as-of', AS_OF, '--spend-sketch', str(tmp_path / 'spend_sketch.json')
+    ])
+    churn_snapshots.main()
+    capsys.readouterr()
+    
+    snapshot = churn_snapshots.SnapshotStore(tmp_path / 'snapshots').load('r1')
+    expected = ChurnPredictor(sketch).predict_columns(customers, AS_OF)
+    unranked = ChurnPredictor().predict_columns(customers, AS_OF)
+    order = np.argsort(expected['customer_id'].astype(str), kind='stable')
+    
+    np.testing.assert_allclose(snapshot['churn_probability'], expected['churn_probability'][order], rtol=1e-6)
+    assert not np.allclose(snapshot['churn_probability'], unranked['churn_probability'][order], rtol=1e-6)
@@ -0,0 +1,259 @@
+"""Contractor registry prefilters and scoring against straightforward per-row references"""
+
+import random
+
+import numpy as np
+import pytest
+
+from contractor_matching import (
+    ContractorMatcher, ContractorRegistry, HashedTfidfIndex, get_profile_features, haversine_km, normalize_skill,
+    to_day
+)
+
+SKILLS = ['sơn nhà', 'điện nước', 'xây dựng', 'ốp lát', 'chống thấm', 'mộc']
+CITIES = ['Hồ Chí Minh', 'TP.HCM', 'Hà Nội', 'Đà Nẵng', 'Cần Thơ', 'Biên Hòa', None, '', ' Huế ']
+
+
+def random_contractors(n, seed=3):
+    rng = random.Random(seed)
+    contractors = []
+    for i in range(n):
+        contractor = {
+            'id': f'K{i}',
+            'display_name': f'Thợ {i}',
+            'skills': rng.sample(SKILLS, rng.randint(0, 3)),
+            'bio': ' '.join(rng.sample(SKILLS, 3)),
+            'avg_rating': rng.choice([0, 3.5, 4.0, 4.2, 4.8]),
+            'experience_years': rng.randint(0, 25),
+            'completed_jobs': rng.randint(0, 150),
+            'is_verified': rng.random() < 0.5,
+            'city': rng.choice(CITIES),
+            'district': rng.choice(['Q1', 'Q3', 'Ba Đình', None])
+        }
+        if rng.random() < 0.6:
+            contractor['lat'], contractor['lon'] = 10.7 + rng.uniform(-1, 1), 106.6 + rng.uniform(-1, 1)
+        contractors.append(contractor)
+    return contractors
+
+
+@pytest.mark.parametrize('center, spread', [
+    ((10.78, 106.70), 2.0),    # Ho Chi Minh City
+    ((21.03, 105.85), 30.0),   # wide, across cell rows and columns
+    ((64.0, 20.0), 40.0),      # high latitude: longitude extent grows off-center
+    ((86.0, -40.0), 20.0),     # radius reaching over the pole
+    ((-12.0, 179.5), 10.0)     # across the antimeridian
+])
+def test_within_radius_matches_brute_force_haversine(center, spread):
+    rng = random.Random(7)
+    points = [
+        (max(min(center[0] + rng.uniform(-spread, spread), 90.0), -90.0),
+         (center[1] + rng.uniform(-spread, spread) + 180.0) % 360.0 - 180.0)
+        for _ in range(2000)
+    ]
+    registry = ContractorRegistry.from_contractors(
+        [{'id': f'G{i}', 'lat': lat, 'lon': lon} for i, (lat, lon) in enumerate(points)]
+    )
+    lats, lons = np.array(points).T
+    
+    for radius in (1.0, 25.0, 300.0, 2000.0):
+        expected = np.nonzero(haversine_km(*center, lats, lons) <= radius)[0]
+        assert registry.within_radius(*center, radius).tolist() == expected.tolist(), radius
+
+
+def passes_filters(contractor, filters):
+    rating, _, _, verified = get_profile_features(contractor)
+    skills = {normalize_skill(s) for s in contractor['skills']}
+    required = filters.get('requiredSkills', [])
+    required = [required] if isinstance(required, str) else required
+    return (
+        rating >= filters.get('minRating', 0)
+        and (verified or not filters.get('verifiedOnly'))
+        and all(normalize_skill(s) in skills for s in required)
+    )
+
+
+@pytest.mark.parametrize('filters', [
+    {},
+    {'minRating': 4.2},
+    {'verifiedOnly': True},
+    {'requiredSkills': 'Sơn  Nhà'},
+    {'requiredSkills': ['sơn nhà', 'mộc'], 'minRating': 4.0, 'verifiedOnly': True},
+    {'requiredSkills': ['không có']}
+])
+def test_filter_mask_matches_per_row_filters(filters):
+    contractors = random_contractors(300)
+    registry = ContractorRegistry.from_contractors(contractors)
+    rows = np.arange(0, len(contractors), 2)
+    
+    mask = registry.filter_mask(rows, filters)
+    assert mask.tolist() == [passes_filters(contractors[r], filters) for r in rows.tolist()]
+
+
+def test_vectorized_scores_match_per_row_scores():
+    matcher = ContractorMatcher('pairwise')
+    contractors = random_contractors(300)
+    registry = ContractorRegistry.from_contractors(contractors)
+    rows = np.arange(len(contractors))
+    
+    np.testing.assert_allclose(
+        matcher._calculate_profile_scores(registry.columns, rows),
+        [matcher._calculate_profile_score(c) for c in contractors]
+    )
+    for project in (
+        {'city': 'hồ chí minh', 'district': 'q1'},
+        {'city': 'Hà Nội', 'lat': 10.75, 'lon': 106.65},
+        {'city': '', 'district': None}
+    ):
+        np.testing.assert_allclose(
+            matcher._calculate_location_scores(registry.columns, rows, project),
+            [matcher._calculate_location_score(c, project) for c in contractors],
+            rtol=1e-12
+        )
+
+
+@pytest.mark.parametrize('text_mode', ['pairwise', 'hashing'])
+def test_explicit_lists_reuse_a_bounded_registry_cache(text_mode):
+    matcher = ContractorMatcher(text_mode)
+    contractors = random_contractors(50)
+    project = {'title': 'Sơn nhà', 'description': 'chống thấm', 'city': 'Hồ Chí Minh'}
+    
+    first = matcher.match(project, contractors)
+    registry = matcher._list_registry(contractors)
+    assert matcher._list_registry([dict(c) for c in contractors]) is registry
+    assert [(r.contractor_id, r.score) for r in matcher.match(project, contractors)] == [
+        (r.contractor_id, r.score) for r in first
+    ]
+    
+    changed = [dict(c) for c in contractors]
+    changed[0]['avg_rating'] = 1.0
+    assert matcher._list_registry(changed) is not registry
+    
+    for i in range(ContractorMatcher.LIST_CACHE_SIZE + 2):
+        matcher._list_registry(contractors[i:])
+    assert len(matcher._list_registries) == ContractorMatcher.LIST_CACHE_SIZE
+
+
+@pytest.mark.parametrize('text_mode', ['pairwise', 'hashing'])
+def test_lazy_reasons_match_eager_reasons(text_mode):
+    matcher = ContractorMatcher(text_mode)
+    contractors = random_contractors(120)
+    project = {'title': 'Sơn nhà', 'description': 'chống thấm ốp lát', 'city': 'Hồ Chí Minh', 'district': 'Q1'}
+    
+    everyone = matcher.match(project, contractors, limit=len(contractors))
+    eager = {
+        r.contractor_id: matcher._generate_reasons(
+            r.text_similarity, r.profile_score, r.location_score,
+            next(c for c in contractors if c['id'] == r.contractor_id)
+        )
+        for r in everyone
+    }
+    top = matcher.match(project, contractors, limit=10)
+    quiet = matcher.match(project, contractors, limit=10, explain=False)
+    
+    assert [(r.contractor_id, r.score) for r in top] == [(r.contractor_id, r.score) for r in everyone[:10]]
+    assert [r.reasons for r in top] == [eager[r.contractor_id] for r in top]
+    assert [(r.contractor_id, r.score, r.reasons) for r in quiet] == [(r.contractor_id, r.score, []) for r in top]
+
+
+def test_hashed_tfidf_matches_tfidf_vectorizer():
+    from sklearn.feature_extraction.text import TfidfVectorizer
+    from sklearn.metrics.pairwise import cosine_similarity
+    
+    rng = random.Random(5)
+    words = ' '.join(SKILLS).split() + ['nhà', 'phố', 'biệt', 'thự', 'sửa', 'chữa', 'lắp', 'đặt']
+    docs = [' '.join(rng.choices(words, k=rng.randint(3, 12))) for _ in range(80)]
+    index = HashedTfidfIndex()
+    index.update(list(range(60)), docs[:60])
+    index.update(list(range(60, 80)), docs[60:])
+    
+    # Upserts replace rows and move their terms out of the document frequencies
+    for row in (3, 41, 65):
+        docs[row] = ' '.join(rng.choices(words, k=6))
+    index.update([3, 41, 65], [docs[3], docs[41], docs[65]])
+    
+    # Queries reuse indexed texts: TfidfVectorizer drops terms outside its
+    # vocabulary, while the hashed index weights them at the maximum IDF
+    vectorizer = TfidfVectorizer(ngram_range=(1, 2)).fit(docs)
+    rows = np.arange(len(docs))
+    for query in (docs[0], docs[41], docs[65]):
+        expected = cosine_similarity(vectorizer.transform(docs), vectorizer.transform([query])).ravel()
+        np.testing.assert_allclose(index.similarities(query, rows), expected, atol=1e-9)
+
+
+def brute_force_busy(calendars, start_day, end_day):
+    return np.array([
+        any(start <= end_day and end >= start_day for start, end in calendar)
+        for calendar in calendars
+    ])
+
+
+def test_busy_mask_interval_edges():
+    day = to_day('2026-03-10')
+    bookings = {
+        'ends-on-start': [('2026-03-01', '2026-03-10')],
+        'starts-on-end': [('2026-03-20', '2026-03-25')],
+        'ends-day-before': [('2026-03-05', '2026-03-09')],
+        'starts-day-after': [('2026-03-21', '2026-03-30')],
+        'long-before': [('2025-01-01', '2026-03-12')],
+        'contains-window': [('2026-02-01', '2026-04-30')],
+        'inside-window': [('2026-03-15', None)],
+        'several': [('2026-01-01', '2026-01-02'), ('2026-06-01', '2026-06-05'), ('2026-03-18', '2026-03-19')],
+        'free': []
+    }
+    registry = ContractorRegistry()
+    registry.add([
+        {'id': cid, 'bookings': [{'start': s, 'end': e} for s, e in spans]}
+        for cid, spans in bookings.items()
+    ])
+    busy = registry.busy_mask(day, to_day('2026-03-20'))
+    
+    assert dict(zip(bookings, busy.tolist())) == {
+        'ends-on-start': True, 'starts-on-end': True,
+        'ends-day-before': False, 'starts-day-after': False,
+        'long-before': True, 'contains-window': True, 'inside-window': True,
+        'several': True, 'free': False
+    }
+    # A single-day window and a window with no bookings around it
+    assert registry.busy_mask(day, day).tolist() == [True, False, False, False, True, True, False, False, False]
+    assert not registry.busy_mask(to_day('2027-01-01'), to_day('2027-12-31')).any()
+
+
+def test_busy_mask_follows_added_and_replaced_bookings():
+    registry = ContractorRegistry()
+    registry.add([{'id': 'A'}, {'id': 'B', 'bookings': [{'start': '2026-05-01', 'end': '2026-05-31'}]}])
+    window = to_day('2026-05-10'), to_day('2026-05-12')
+    assert registry.busy_mask(*window).tolist() == [False, True]
+    
+    assert registry.add_bookings('A', [{'startDate': '2026-05-12'}]) == 1
+    assert registry.busy_mask(*window).tolist() == [True, True]
+    
+    # Upserting with a new calendar replaces it; without one keeps it
+    registry.add([{'id': 'B', 'bookings': [{'start': '2026-06-01', 'end': '2026-06-02'}]}, {'id': 'A'}])
+    assert registry.busy_mask(*window).tolist() == [True, False]
+    registry.add([{'id': 'A', 'bookings': []}])
+    assert not registry.busy_mask(*window).any()
+    with pytest.raises(KeyError):
+        registry.add_bookings('missing', [{'start': '2026-05-01'}])
+
+
+def test_busy_mask_matches_brute_force():
+    rng = random.Random(11)
+    calendars = []
+    for _ in range(300):
+        calendar = []
+        for _ in range(rng.randint(0, 4)):
+            start = rng.randint(0, 400)
+            calendar.append((start, start + int(rng.expovariate(1 / 8))))
+        calendars.append(calendar)
+    iso = lambda day: str(np.datetime64(day, 'D'))
+    registry = ContractorRegistry.from_contractors([
+        {'id': f'K{i}', 'bookings': [{'start': iso(s), 'end': iso(e)} for s, e in calendar]}
+        for i, calendar in enumerate(calendars)
+    ])
+    
+    for _ in range(200):
+        start_day = rng.randint(-20, 420)
+        end_day = start_day + rng.randint(0, 30)
+        np.testing.assert_array_equal(
+            registry.busy_mask(start_day, end_day), brute_force_busy(calendars, start_day, end_day)
+        )
@@ -0,0 +1,107 @@
+"""Columnar pricing parity and the /pricing/competitors endpoint"""
+
+import random
+import tracemalloc
+
+import pytest
+from flask import Flask
+
+from competitor_prices import CompetitorPriceIndex
+from dynamic_pricing import DynamicPricingEngine, create_pricing_blueprint
+
+CATEGORIES = ['xi_mang', 'thep', 'cat_da', 'gach_trang_tri', 'son', 'default', 'other']
+
+
+def random_products(n, seed=3):
+    rng = random.Random(seed)
+    products = []
+    for i in range(n):
+        base = rng.choice([rng.randint(1, 500) * 1000, rng.uniform(1000, 900000), 18500])
+        product = {'product_id': f'P{i}', 'product_name': f'Product {i}', 'base_price': base}
+        for field, value in (
+            ('cost', lambda: rng.choice([0, base * rng.uniform(0.4, 1.3)])),
+            ('category', lambda: rng.choice(CATEGORIES)),
+            ('current_stock', lambda: rng.choice([0, rng.randint(0, 3000)])),
+            ('avg_daily_sales', lambda: rng.choice([0, rng.uniform(0, 60), 5])),
+            ('demand_index', lambda: rng.choice([0, 0.5, 0.8, 1.2, 1.5, rng.uniform(0, 2.5)])),
+            ('competitor_avg_price', lambda: rng.choice([0, base * rng.uniform(0.7, 1.4)]))
+        ):
+            if rng.random() < 0.8:
+                product[field] = value()
+        products.append(product)
+    return products
+
+
+@pytest.mark.parametrize('constraints', [None, {'competitor_match': False, 'min_margin': 0.2, 'max_price_change': 0.1}])
+@pytest.mark.parametrize('as_of', ['2025-06-28', '2025-01-03'])
+def test_batch_recommend_matches_recommend_price(constraints, as_of):
+    engine = DynamicPricingEngine()
+    products = random_products(3000)
+    batch = engine.batch_recommend(products, constraints, as_of)
+    
+    assert len(batch) == len(products)
+    for product, recommendation in zip(products, batch):
+        assert recommendation == engine.recommend_price(product, constraints, as_of)
+
+
+def test_competitor_index_fill_matches_recommend_price():
+    index = CompetitorPriceIndex()
+    index.ingest(
+        [{'productId': f'P{i}', 'price': 1000 * (i % 40 + 5), 'observedAt': '2025-06-20'} for i in range(0, 300, 3)],
+        log=False
+    )
+    engine = DynamicPricingEngine(competitor_index=index)
+    products = [
+        {key: value for key, value in product.items() if key != 'competitor_avg_price'}
+        for product in random_products(300, seed=4)
+    ]
+    
+    batch = engine.batch_recommend(products, as_of='2025-06-28')
+    for product, recommendation in zip(products, batch):
+        assert recommendation == engine.recommend_price(product, as_of='2025-06-28')
+
+
+def test_simulate_grid_rejects_oversized_grid_before_allocating():
+    engine = DynamicPricingEngine()
+    products = random_products(10)
+    
+    tracemalloc.start()
+    try:
+        with pytest.raises(ValueError, match='Grid too large'):
+            engine.simulate_grid(products, -0.5, 0.5, 1e-8, max_points=2_000_000)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    assert peak < 1_000_000
+    
+    grid = engine.simulate_grid(products, -0.25, 0.25, 0.01, max_points=510)
+    assert grid['price'].shape == (10, 51)
+
+
+@pytest.fixture
+def client(monkeypatch):
+    for name in ('COMPETITOR_PRICES_LOG', 'PRICING_ELASTICITY_PATH', 'PRICING_DECISION_LOG_DIR'):
+        monkeypatch.delenv(name, raising=False)
+    app = Flask(__name__)
+    app.register_blueprint(create_pricing_blueprint())
+    return app.test_client()
+
+
+def post_ndjson(client, body):
+    return client.post('/pricing/competitors', data=body, content_type='application/x-ndjson')
+
+
+def test_competitors_ndjson_counts_malformed_lines_as_invalid(client):
+    response = post_ndjson(client, b'{"productId": "A", "price": 1000}\n{bad\n\xff\n{"productId": "B", "price": -5}\n')
+    
+    assert response.status_code == 200
+    assert response.json['data']['ingested'] == 1
+    assert response.json['data']['invalid'] == 3
+    assert client.get('/pricing/competitors/A').status_code == 200
+
+
+def test_competitors_ndjson_without_observations_is_rejected(client):
+    response = post_ndjson(client, b'\n')
+    
+    assert response.status_code == 400
+    assert response.json['success'] is False
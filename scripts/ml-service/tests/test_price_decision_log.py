@@ -0,0 +1,47 @@
+"""Decision log segments written by several processes into one directory"""
+
+import multiprocessing
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from dynamic_pricing import DynamicPricingEngine
+from price_decision_log import PriceDecisionLog
+
+AS_OF = '2026-10-14'
+BATCHES = 8
+
+
+def write_batches(directory, worker):
+    engine = DynamicPricingEngine()
+    log = PriceDecisionLog(directory)
+    for batch in range(BATCHES):
+        products = [
+            {'product_id': f'W{worker}-P{i:03d}', 'base_price': 100000 + 1000 * i}
+            for i in range(50)
+        ]
+        decided_at = datetime(2026, 10, 1) + timedelta(minutes=batch)
+        log.append(engine.recommend_columns(products, as_of=AS_OF), AS_OF, decided_at=decided_at)
+        log.flush()
+    log.close()
+
+
+def test_concurrent_writers_keep_every_segment(tmp_path):
+    context = multiprocessing.get_context('fork')
+    workers = [context.Process(target=write_batches, args=(tmp_path, w)) for w in range(4)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(60)
+        assert process.exitcode == 0
+    
+    log = PriceDecisionLog(tmp_path)
+    segments = log.manifest()
+    # The writer thread may fold two queued batches into one segment
+    assert [s['index'] for s in segments] == list(range(len(segments)))
+    assert sum(s['rows'] for s in segments) == 4 * BATCHES * 50
+    assert sorted(p.name for p in tmp_path.glob('segment_*.npz')) == sorted(s['file'] for s in segments)
+    
+    ids = log.query()['product_id']
+    assert len(ids) == 4 * BATCHES * 50
+    assert np.unique(ids, return_counts=True)[1].tolist() == [BATCHES] * 200
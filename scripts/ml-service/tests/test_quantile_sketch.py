@@ -0,0 +1,60 @@
+"""KLL sketch rank error and persistence"""
+
+import numpy as np
+import pytest
+
+from quantile_sketch import KLLSketch
+
+
+@pytest.fixture(scope='module')
+def stream():
+    return np.random.default_rng(0).lognormal(16, 1, 200000)
+
+
+def exact_ranks(values, probes, inclusive):
+    ordered = np.sort(values)
+    return np.searchsorted(ordered, probes, side='right' if inclusive else 'left') / len(values)
+
+
+@pytest.mark.parametrize('inclusive', [True, False])
+def test_rank_error_is_bounded(stream, inclusive):
+    sketch = KLLSketch(k=200)
+    for chunk in np.array_split(stream, 37):
+        sketch.update_batch(chunk)
+    probes = np.quantile(stream, np.linspace(0, 1, 201))
+    
+    error = np.abs(sketch.ranks(probes, inclusive) - exact_ranks(stream, probes, inclusive))
+    assert len(sketch) == len(stream)
+    assert sketch.size < 2000
+    assert error.max() < 0.02
+
+
+def test_merged_sketch_rank_error(stream):
+    left, right = KLLSketch(seed=1), KLLSketch(seed=2)
+    left.update_batch(stream[:120000])
+    right.update_batch(stream[120000:])
+    left.merge(right)
+    probes = np.quantile(stream, np.linspace(0.01, 0.99, 99))
+    
+    assert len(left) == len(stream)
+    assert np.abs(left.ranks(probes) - exact_ranks(stream, probes, True)).max() < 0.02
+
+
+def test_save_load_round_trip(stream, tmp_path):
+    sketch = KLLSketch()
+    sketch.update_batch(stream)
+    sketch.update_batch([np.nan, np.inf])  # ignored
+    sketch.save(tmp_path / 'sketch.json')
+    loaded = KLLSketch.load(tmp_path / 'sketch.json')
+    
+    probes = np.quantile(stream, np.linspace(0, 1, 51))
+    assert len(loaded) == len(stream)
+    np.testing.assert_array_equal(loaded.ranks(probes, inclusive=False), sketch.ranks(probes, inclusive=False))
+
+
+def test_load_rejects_inconsistent_sketch(tmp_path):
+    path = tmp_path / 'sketch.json'
+    path.write_text('{"type": "kll", "k": 200, "n": 5, "levels": [[1.0, 2.0]]}', encoding='utf-8')
+    
+    with pytest.raises(ValueError):
+        KLLSketch.load(path)
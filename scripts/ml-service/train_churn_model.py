@@ -0,0 +1,298 @@
+#!/usr/bin/env python3
+"""
+Churn Model Training
+Fit a regularized logistic regression on labelled RFM features and save a
+compact JSON artifact for ChurnPredictor (see churn_model.py), plus the
+total_spent_12m sketch monetary risk is ranked against (<model>.spend_sketch.json)
+
+Input is a CSV or Parquet export with the ChurnPredictor feature columns
+(customer_id, last_order_date or days_since_last_order, orders_12m,
+total_spent_12m, recent_3m_spent, previous_3m_spent, has_reviews,
+avg_rating_given, support_tickets, complaint_ratio) and a 0/1 label column.
+
+Usage:
+    python train_churn_model.py --data churn_export.csv --as-of 2025-12-31
+    python train_churn_model.py --data customers.csv --sketch-only  # Refresh spend sketch
+    python train_churn_model.py --synthetic 50000          # Demo dataset (separate artifact)
+    python train_churn_model.py --benchmark 200000         # Scoring throughput (nothing saved)
+"""
+
+import sys
+import json
+import time
+from datetime import timedelta
+from pathlib import Path
+
+# Check for required packages
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError as e:
+    print(f"❌ Missing required package: {e}")
+    print("Please install: pip install numpy pandas")
+    sys.exit(1)
+
+try:
+    from sklearn.linear_model import LogisticRegression
+    SKLEARN_AVAILABLE = True
+except ImportError:
+    SKLEARN_AVAILABLE = False
+    print("⚠️ scikit-learn not installed. Using NumPy Newton solver.")
+
+from churn_model import FEATURES, LogisticChurnModel, feature_matrix
+from churn_prediction import ChurnPredictor, spend_sketch_path
+from quantile_sketch import KLLSketch
+from service_clock import resolve_as_of
+
+# Configuration
+MODELS_DIR = Path(__file__).parent / "models"
+DEFAULT_OUTPUT = MODELS_DIR / "churn_logistic.json"
+# Demo models never land on the production artifact (CHURN_MODEL_PATH)
+SYNTHETIC_OUTPUT = MODELS_DIR / "churn_logistic_synthetic.json"
+
+
+def load_dataset(path: str) -> pd.DataFrame:
+    """Read a CSV or Parquet export"""
+    if Path(path).suffix.lower() in ('.parquet', '.pq'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def prepare_dataset(df: pd.DataFrame, label: str, as_of=None):
+    """
+    Feature matrix and labels from an export
+    
+    A days_since_last_order column (without last_order_date) is turned into
+    dates relative to as_of so the same date handling as serving applies.
+    """
+    if label not in df.columns:
+        raise ValueError(f"Missing label column: {label}")
+    
+    today = resolve_as_of(as_of)
+    df = df.copy()
+    if 'last_order_date' not in df.columns and 'days_since_last_order' in df.columns:
+        days = pd.to_numeric(df['days_since_last_order'], errors='coerce')
+        df['last_order_date'] = [
+            None if pd.isna(d) else today - timedelta(days=int(d)) for d in days
+        ]
+    df = df.drop(columns=['days_since_last_order'], errors='ignore')
+    
+    # Empty cells -> the same defaults predict() uses for missing fields
+    for field, default in ChurnPredictor.FEATURE_DEFAULTS.items():
+        if field in df.columns:
+            df[field] = df[field].astype(object).where(df[field].notna(), default)
+    
+    columns = ChurnPredictor().prepare_columns(df.drop(columns=[label]), today)
+    y = pd.to_numeric(df[label]).to_numpy(dtype=np.float64)
+    return feature_matrix(columns), y
+
+
+def fit_spend_sketch(df: pd.DataFrame) -> KLLSketch:
+    """Spend sketch over an export's total_spent_12m (missing -> 0, as in predict())"""
+    if 'total_spent_12m' not in df.columns:
+        raise ValueError("Missing column: total_spent_12m")
+    sketch = KLLSketch()
+    sketch.update_batch(pd.to_numeric(df['total_spent_12m'], errors='coerce').fillna(0).to_numpy(dtype=np.float64))
+    return sketch
+
+
+def fit_newton(X: np.ndarray, y: np.ndarray, C: float = 1.0, max_iter: int = 50, tol: float = 1e-8):
+    """L2-regularized logistic regression by Newton's method (intercept unpenalized)"""
+    n, d = X.shape
+    Xb = np.column_stack([np.ones(n), X])
+    w = np.zeros(d + 1)
+    penalty = np.full(d + 1, 1.0 / C)
+    penalty[0] = 0.0
+    
+    for _ in range(max_iter):
+        p = 1 / (1 + np.exp(-np.clip(Xb @ w, -30, 30)))
+        gradient = Xb.T @ (p - y) + penalty * w
+        hessian = (Xb * (p * (1 - p))[:, None]).T @ Xb + np.diag(penalty)
+        step = np.linalg.solve(hessian + 1e-9 * np.eye(d + 1), gradient)
+        w -= step
+        if np.max(np.abs(step)) < tol:
+            break
+    
+    return w[1:], w[0]
+
+
+def roc_auc(y: np.ndarray, scores: np.ndarray) -> float:
+    """Area under the ROC curve (Mann-Whitney U, ties averaged)"""
+    positives = y == 1
+    n_pos, n_neg = positives.sum(), (~positives).sum()
+    if not n_pos or not n_neg:
+        return float('nan')
+    ranks = pd.Series(scores).rank().to_numpy()
+    return float((ranks[positives].sum() - n_pos * (n_pos + 1) / 2) / (n_pos * n_neg))
+
+
+def log_loss(y: np.ndarray, p: np.ndarray) -> float:
+    p = np.clip(p, 1e-15, 1 - 1e-15)
+    return float(-np.mean(y * np.log(p) + (1 - y) * np.log(1 - p)))
+
+
+def train_model(X: np.ndarray, y: np.ndarray, C: float = 1.0, test_size: float = 0.2, seed: int = 42):
+    """
+    Fit on a random split and report holdout metrics
+    
+    Returns:
+        LogisticChurnModel refitted on all rows, with holdout metrics
+    """
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(y))
+    n_test = int(len(y) * test_size)
+    test, train = order[:n_test], order[n_test:]
+    
+    def fit(rows):
+        mean = X[rows].mean(axis=0)
+        scale = X[rows].std(axis=0)
+        scale[scale == 0] = 1.0
+        Z = (X[rows] - mean) / scale
+        if SKLEARN_AVAILABLE:
+            clf = LogisticRegression(C=C, max_iter=1000)
+            clf.fit(Z, y[rows])
+            coef, intercept = clf.coef_[0], clf.intercept_[0]
+        else:
+            coef, intercept = fit_newton(Z, y[rows], C)
+        return LogisticChurnModel(coef, intercept, mean, scale)
+    
+    metrics = {'rows': int(len(y)), 'positiveRate': round(float(y.mean()), 4)}
+    if n_test:
+        holdout = fit(train)
+        p = holdout.predict_proba(X[test])
+        metrics.update({
+            'holdoutRows': int(n_test),
+            'auc': round(roc_auc(y[test], p), 4),
+            'logLoss': round(log_loss(y[test], p), 4),
+            'accuracy': round(float(((p >= 0.5) == y[test]).mean()), 4)
+        })
+    
+    model = fit(np.arange(len(y)))
+    model.metrics = metrics
+    return model
+
+
+def synthetic_dataset(n: int, as_of=None, seed: int = 0) -> pd.DataFrame:
+    """Labelled demo customers whose churn depends on recency, frequency and trend"""
+    rng = np.random.default_rng(seed)
+    today = resolve_as_of(as_of)
+    
+    days = rng.gamma(1.5, 40, n).astype(int)
+    orders = rng.poisson(np.maximum(12 - days / 15, 0.5))
+    spent = orders * rng.lognormal(14.5, 0.8, n)
+    previous = spent / 4 * rng.uniform(0.5, 1.5, n)
+    recent = previous * rng.lognormal(-0.1, 0.5, n)
+    has_reviews = rng.random(n) < 0.4
+    rating = np.where(has_reviews, rng.choice([2.0, 3.0, 4.0, 5.0], n), 0)
+    complaints = rng.choice([0, 0.05, 0.2, 0.4], n, p=[0.7, 0.15, 0.1, 0.05])
+    
+    z = (
+        -2.0 + 0.025 * days - 0.15 * orders
+        - 1.2 * np.clip((recent - previous) / np.maximum(previous, 1), -1, 3)
+        - 0.4 * has_reviews + 3.0 * complaints
+    )
+    churned = rng.random(n) < 1 / (1 + np.exp(-z))
+    
+    return pd.DataFrame({
+        'customer_id': [f'C{i:06d}' for i in range(n)],
+        'last_order_date': [(today - timedelta(days=int(d))).isoformat() for d in days],
+        'orders_12m': orders,
+        'total_spent_12m': spent.round(0),
+        'recent_3m_spent': recent.round(0),
+        'previous_3m_spent': previous.round(0),
+        'has_reviews': has_reviews,
+        'avg_rating_given': rating,
+        'support_tickets': rng.poisson(0.5, n),
+        'complaint_ratio': complaints,
+        'churned': churned.astype(int)
+    })
+
+
+def benchmark(n: int, model: LogisticChurnModel, repeat: int = 3) -> dict:
+    """Batch scoring throughput (rows/s): rule-based vs trained model"""
+    df = synthetic_dataset(n).drop(columns=['churned'])
+    rules = ChurnPredictor()
+    trained = ChurnPredictor(model=model)
+    columns = rules.prepare_columns(df)
+    
+    def best(fn):
+        times = []
+        for _ in range(repeat):
+            start = time.perf_counter()
+            fn()
+            times.append(time.perf_counter() - start)
+        return round(n / min(times))
+    
+    return {
+        'rows': n,
+        'rulesPredictColumns': best(lambda: rules.predict_columns(df, update_sketch=False)),
+        'modelPredictColumns': best(lambda: trained.predict_columns(df, update_sketch=False)),
+        'prepareColumns': best(lambda: rules.prepare_columns(df)),
+        'modelInferenceOnly': best(lambda: model.predict_proba(feature_matrix(columns)))
+    }
+
+
+def main():
+    """Main training function"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Churn Model Training")
+    parser.add_argument("--data", type=str, help="CSV/Parquet export with features and labels")
+    parser.add_argument("--label", type=str, default="churned", help="Label column (1 = churned)")
+    parser.add_argument("--as-of", type=str, help="Reference date of the export (default: now)")
+    parser.add_argument("--C", type=float, default=1.0, help="Inverse L2 regularization strength")
+    parser.add_argument("--test-size", type=float, default=0.2, help="Holdout fraction")
+    parser.add_argument(
+        "--output", type=str,
+        help=f"Artifact path (default: {DEFAULT_OUTPUT.name}, {SYNTHETIC_OUTPUT.name} with --synthetic)"
+    )
+    parser.add_argument("--synthetic", type=int, help="Train on N synthetic customers")
+    parser.add_argument("--benchmark", type=int, help="Benchmark scoring on N customers")
+    parser.add_argument("--sketch-only", action="store_true", help="Only refresh the spend sketch next to --output")
+    parser.add_argument("--seed", type=int, default=42)
+    
+    args = parser.parse_args()
+    
+    print("🚀 Churn Model Training")
+    print("=" * 50)
+    
+    if args.data:
+        df = load_dataset(args.data)
+        output = args.output or DEFAULT_OUTPUT
+    elif args.synthetic or args.benchmark:
+        df = synthetic_dataset(args.synthetic or 50000, args.as_of, args.seed)
+        # --benchmark alone only measures: the throwaway model is not saved
+        output = args.output or (SYNTHETIC_OUTPUT if args.synthetic else None)
+    else:
+        parser.error("--data or --synthetic is required")
+    
+    if args.sketch_only and output is None:
+        parser.error("--sketch-only needs --data, --synthetic or --output")
+    sketch_output = output and spend_sketch_path(output)
+    if args.sketch_only:
+        sketch = fit_spend_sketch(df)
+        sketch.save(sketch_output)
+        print(f"\n📁 Spend sketch of {len(sketch)} customers saved to: {sketch_output}")
+        return
+    
+    print(f"\n📦 {len(df)} labelled customers")
+    X, y = prepare_dataset(df, args.label, args.as_of)
+    model = train_model(X, y, args.C, args.test_size, args.seed)
+    
+    print(f"  ✅ Holdout AUC: {model.metrics.get('auc')}, log loss: {model.metrics.get('logLoss')}")
+    for name, coef in zip(FEATURES, model.coef):
+        print(f"    {name:28s} {coef:+.3f}")
+    
+    if output:
+        model.save(output)
+        print(f"  📁 Model saved to: {output}")
+        fit_spend_sketch(df).save(sketch_output)
+        print(f"  📁 Spend sketch saved to: {sketch_output}")
+    
+    if args.benchmark:
+        print(f"\n⏱️ Scoring {args.benchmark} customers")
+        print(json.dumps(benchmark(args.benchmark, model), indent=2))
+
+
+if __name__ == "__main__":
+    main()
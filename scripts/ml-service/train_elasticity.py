@@ -0,0 +1,348 @@
+#!/usr/bin/env python3
+"""
+Price Elasticity Estimation
+Fit log-log price elasticities from sales history and save a JSON artifact
+loaded by DynamicPricingEngine (PRICING_ELASTICITY_PATH)
+
+Model per product i in category c (x = log price, y = log quantity):
+
+    y = α_i + β_i × x
+
+β is estimated from within-product variation (grouped sums via np.bincount)
+with ridge shrinkage toward a prior:
+
+    β_i = (Sxy_i + λ × β_c) / (Sxx_i + λ)
+    β_c = (Σ Sxy_i + λ_c × β_prior) / (Σ Sxx_i + λ_c)
+
+β_prior comes from ELASTICITY_BY_CATEGORY, so products with little price
+variation fall back to their category, and thin categories to the table.
+Categories are fitted in parallel on a process pool.
+
+Input is a CSV/Parquet export with product_id, category, price (unit
+price), quantity and optionally date (rows are then summed per product per
+day), or the MongoDB orders train_prophet.py reads.
+
+Usage:
+    python train_elasticity.py --data sales.csv
+    python train_elasticity.py --mongo --days 365
+    python train_elasticity.py --synthetic 2000
+"""
+
+import os
+import sys
+import json
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Optional
+
+# Check for required packages
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError as e:
+    print(f"❌ Missing required package: {e}")
+    print("Please install: pip install numpy pandas")
+    sys.exit(1)
+
+from dynamic_pricing import DynamicPricingEngine, ELASTICITY_ARTIFACT_TYPE
+
+# Configuration
+MODELS_DIR = Path(__file__).parent / "models"
+DEFAULT_OUTPUT = MODELS_DIR / "pricing_elasticity.json"
+MONGODB_URI = os.getenv("DATABASE_URL", "mongodb://localhost:27017/construction-materials")
+
+# Reported elasticities (absolute values) are clipped to this range
+ELASTICITY_RANGE = (0.05, 5.0)
+
+
+def load_dataset(path: str) -> pd.DataFrame:
+    """Read a CSV or Parquet export"""
+    if Path(path).suffix.lower() in ('.parquet', '.pq'):
+        return pd.read_parquet(path)
+    return pd.read_csv(path)
+
+
+def fetch_price_history(days: int = 365) -> pd.DataFrame:
+    """Daily quantity and average unit price per product from MongoDB orders"""
+    try:
+        from pymongo import MongoClient
+    except ImportError:
+        print("❌ Missing pymongo. Please install: pip install pymongo")
+        sys.exit(1)
+    
+    client = MongoClient(MONGODB_URI)
+    db = client[MONGODB_URI.split("/")[-1].split("?")[0]]
+    start_date = datetime.now() - timedelta(days=days)
+    
+    # Same order/item join as train_prophet.fetch_historical_data, for all
+    # products at once and with revenue so the unit price can be recovered
+    pipeline = [
+        {
+            "$match": {
+                "status": {"$in": ["DELIVERED", "SHIPPED", "COMPLETED"]},
+                "createdAt": {"$gte": start_date}
+            }
+        },
+        {
+            "$lookup": {
+                "from": "OrderItem",
+                "localField": "_id",
+                "foreignField": "orderId",
+                "as": "items"
+            }
+        },
+        {"$unwind": "$items"},
+        {
+            "$group": {
+                "_id": {
+                    "product": "$items.productId",
+                    "date": {"$dateToString": {"format": "%Y-%m-%d", "date": "$createdAt"}}
+                },
+                "quantity": {"$sum": "$items.quantity"},
+                "revenue": {"$sum": "$items.totalPrice"}
+            }
+        },
+        {
+            "$lookup": {
+                "from": "Product",
+                "localField": "_id.product",
+                "foreignField": "_id",
+                "as": "product"
+            }
+        },
+        {"$unwind": "$product"}
+    ]
+    
+    rows = [
+        {
+            'product_id': str(r['_id']['product']),
+            'category': str(r['product'].get('categoryId', 'default')),
+            'date': r['_id']['date'],
+            'quantity': r['quantity'],
+            'price': r['revenue'] / r['quantity'] if r['quantity'] else None
+        }
+        for r in db.Order.aggregate(pipeline)
+    ]
+    return pd.DataFrame(rows, columns=['product_id', 'category', 'date', 'quantity', 'price'])
+
+
+def prepare_observations(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Log price/quantity observations
+    
+    With a date column, rows are summed per product per day (price =
+    revenue / quantity). Rows without a positive price and quantity are
+    dropped.
+    """
+    missing = {'product_id', 'price', 'quantity'} - set(df.columns)
+    if missing:
+        raise ValueError(f"Missing columns: {', '.join(sorted(missing))}")
+    
+    df = df.copy()
+    if 'category' not in df.columns:
+        df['category'] = 'default'
+    df['category'] = df['category'].fillna('default').astype(str)
+    df['product_id'] = df['product_id'].astype(str)
+    df['price'] = pd.to_numeric(df['price'], errors='coerce')
+    df['quantity'] = pd.to_numeric(df['quantity'], errors='coerce')
+    df = df[(df['price'] > 0) & (df['quantity'] > 0)]
+    
+    if 'date' in df.columns:
+        df = df.assign(revenue=df['price'] * df['quantity'])
+        df = df.groupby(['product_id', 'category', 'date'], as_index=False)[['quantity', 'revenue']].sum()
+        df['price'] = df['revenue'] / df['quantity']
+    
+    return pd.DataFrame({
+        'product_id': df['product_id'].to_numpy(),
+        'category': df['category'].to_numpy(),
+        'x': np.log(df['price'].to_numpy(dtype=np.float64)),
+        'y': np.log(df['quantity'].to_numpy(dtype=np.float64))
+    })
+
+
+def fit_category(
+    category: str,
+    product_ids: np.ndarray,
+    x: np.ndarray,
+    y: np.ndarray,
+    prior: float,
+    shrinkage: float,
+    category_shrinkage: float
+) -> Dict:
+    """
+    Shrunk within-product slopes for one category (all products at once)
+    
+    Args:
+        prior: Prior elasticity (absolute value) for the category
+        shrinkage: λ, pseudo-observations of Σ(Δ log price)² pulling each
+            product toward the category slope
+        category_shrinkage: λ_c, the same for the category toward prior
+    """
+    products, codes = np.unique(product_ids, return_inverse=True)
+    codes = codes.reshape(-1)
+    m = len(products)
+    
+    count = np.bincount(codes, minlength=m)
+    x_mean = np.bincount(codes, weights=x, minlength=m) / count
+    y_mean = np.bincount(codes, weights=y, minlength=m) / count
+    dx = x - x_mean[codes]
+    dy = y - y_mean[codes]
+    sxx = np.bincount(codes, weights=dx * dx, minlength=m)
+    sxy = np.bincount(codes, weights=dx * dy, minlength=m)
+    
+    category_beta = (sxy.sum() - category_shrinkage * prior) / (sxx.sum() + category_shrinkage)
+    beta = (sxy + shrinkage * category_beta) / (sxx + shrinkage)
+    
+    # Residual variance per product -> standard error of the shrunk slope
+    alpha = y_mean - beta * x_mean
+    residual = y - alpha[codes] - beta[codes] * x
+    sse = np.bincount(codes, weights=residual * residual, minlength=m)
+    dof = np.maximum(count - 2, 1)
+    se = np.sqrt(sse / dof / (sxx + shrinkage))
+    
+    elasticity = np.clip(-beta, *ELASTICITY_RANGE)
+    return {
+        'category': category,
+        'elasticity': round(float(np.clip(-category_beta, *ELASTICITY_RANGE)), 4),
+        'prior': prior,
+        'products': m,
+        'observations': int(len(x)),
+        'product_results': {
+            str(pid): {
+                'elasticity': round(float(e), 4),
+                'standardError': round(float(s), 4),
+                'observations': int(n)
+            }
+            for pid, e, s, n in zip(products.tolist(), elasticity, se, count)
+        }
+    }
+
+
+def _fit_task(args):
+    return fit_category(*args)
+
+
+def estimate_elasticities(
+    observations: pd.DataFrame,
+    shrinkage: float = 1.0,
+    category_shrinkage: float = 5.0,
+    workers: Optional[int] = None
+) -> Dict:
+    """
+    Fit every category (in parallel across categories)
+    
+    Returns:
+        Artifact dict (see DynamicPricingEngine.load_elasticities())
+    """
+    priors = DynamicPricingEngine.ELASTICITY_BY_CATEGORY
+    tasks = []
+    for category, group in observations.groupby('category', sort=True):
+        tasks.append((
+            category,
+            group['product_id'].to_numpy(),
+            group['x'].to_numpy(),
+            group['y'].to_numpy(),
+            priors.get(category, priors['default']),
+            shrinkage,
+            category_shrinkage
+        ))
+    
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(tasks) < 2:
+        results = [_fit_task(task) for task in tasks]
+    else:
+        with ProcessPoolExecutor(min(workers, len(tasks))) as pool:
+            results = list(pool.map(_fit_task, tasks))
+    
+    products = {}
+    for result in results:
+        for product_id, fit in result.pop('product_results').items():
+            products[product_id] = {'category': result['category'], **fit}
+    
+    return {
+        'type': ELASTICITY_ARTIFACT_TYPE,
+        'version': 1,
+        'trainedAt': datetime.now().isoformat(timespec='seconds'),
+        'shrinkage': shrinkage,
+        'categoryShrinkage': category_shrinkage,
+        'categories': {r['category']: r for r in results},
+        'products': products
+    }
+
+
+def synthetic_sales(n_products: int, days: int = 120, seed: int = 0) -> pd.DataFrame:
+    """Daily sales whose true elasticity varies around the category table"""
+    rng = np.random.default_rng(seed)
+    categories = [c for c in DynamicPricingEngine.ELASTICITY_BY_CATEGORY if c != 'default']
+    category = rng.choice(categories, n_products)
+    truth = np.array([DynamicPricingEngine.ELASTICITY_BY_CATEGORY[c] for c in category])
+    truth = truth * rng.uniform(0.7, 1.3, n_products)
+    base = rng.lognormal(11, 1, n_products)
+    
+    product = np.repeat(np.arange(n_products), days)
+    price = base[product] * np.exp(rng.normal(0, 0.08, len(product)))
+    quantity = np.exp(3 - truth[product] * np.log(price / base[product]) + rng.normal(0, 0.2, len(product)))
+    
+    return pd.DataFrame({
+        'product_id': [f'P{i:05d}' for i in product],
+        'category': category[product],
+        'date': np.tile(pd.date_range('2025-01-01', periods=days).strftime('%Y-%m-%d'), n_products),
+        'price': price.round(0),
+        'quantity': quantity.round(2),
+        'true_elasticity': truth[product]
+    })
+
+
+def main():
+    """Main training function"""
+    import argparse
+    
+    parser = argparse.ArgumentParser(description="Price Elasticity Estimation")
+    parser.add_argument("--data", type=str, help="CSV/Parquet with product_id, category, price, quantity[, date]")
+    parser.add_argument("--mongo", action="store_true", help="Read order history from MongoDB (DATABASE_URL)")
+    parser.add_argument("--days", type=int, default=365, help="History window for --mongo")
+    parser.add_argument("--synthetic", type=int, help="Fit N synthetic products")
+    parser.add_argument("--shrinkage", type=float, default=1.0, help="Product -> category shrinkage (λ)")
+    parser.add_argument("--category-shrinkage", type=float, default=5.0, help="Category -> prior shrinkage (λ_c)")
+    parser.add_argument("--workers", type=int, default=None, help="Processes (default: all cores)")
+    parser.add_argument("--output", type=str, default=str(DEFAULT_OUTPUT), help="Artifact path")
+    
+    args = parser.parse_args()
+    
+    print("🚀 Price Elasticity Estimation")
+    print("=" * 50)
+    
+    if args.data:
+        df = load_dataset(args.data)
+    elif args.mongo:
+        df = fetch_price_history(args.days)
+    elif args.synthetic:
+        df = synthetic_sales(args.synthetic)
+    else:
+        parser.error("--data, --mongo or --synthetic is required")
+    
+    observations = prepare_observations(df)
+    print(f"\n📦 {len(observations)} observations, {observations['product_id'].nunique()} products")
+    
+    start = time.perf_counter()
+    artifact = estimate_elasticities(observations, args.shrinkage, args.category_shrinkage, args.workers)
+    print(f"  ✅ Fitted in {time.perf_counter() - start:.2f}s")
+    
+    for category, fit in artifact['categories'].items():
+        print(f"    {category:20s} ε={fit['elasticity']:.3f} (prior {fit['prior']}, {fit['products']} products)")
+    
+    if args.synthetic:
+        truth = df.groupby('product_id')['true_elasticity'].first()
+        fitted = pd.Series({pid: p['elasticity'] for pid, p in artifact['products'].items()})
+        print(f"  📏 Mean absolute error vs truth: {float((fitted - truth[fitted.index]).abs().mean()):.4f}")
+    
+    output = Path(args.output)
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(artifact, indent=2, ensure_ascii=False), encoding='utf-8')
+    print(f"  📁 Elasticities saved to: {output}")
+
+
+if __name__ == "__main__":
+    main()